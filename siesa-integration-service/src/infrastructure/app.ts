@@ -9,6 +9,7 @@ const app = new cdk.App();
 const account = process.env.CDK_DEFAULT_ACCOUNT || '224874703567';
 const region = process.env.CDK_DEFAULT_REGION || 'us-east-1';
 const environment = process.env.ENVIRONMENT || 'dev';
+const fanoutMaxConcurrency = app.node.tryGetContext('fanoutMaxConcurrency');
 
 // Create the main integration stack
 new SiesaIntegrationStack(app, `SiesaIntegrationStack-${environment}`, {
@@ -17,6 +18,7 @@ new SiesaIntegrationStack(app, `SiesaIntegrationStack-${environment}`, {
     region,
   },
   environment,
+  fanoutMaxConcurrency: fanoutMaxConcurrency !== undefined ? Number(fanoutMaxConcurrency) : undefined,
   description: 'Siesa ERP Integration Service - Multi-tenant, Multi-product (Kong RFID & WMS)',
   tags: {
     Project: 'SiesaIntegration',
@@ -15,6 +15,12 @@ import * as path from 'path';
 
 export interface SiesaIntegrationStackProps extends cdk.StackProps {
   environment: string;
+  /** Partitions transformed and loaded at once (default 10) */
+  fanoutMaxConcurrency?: number;
+  /** Extract parts (Siesa pages) per partition (default 5) */
+  fanoutPartsPerPartition?: number;
+  /** Percentage of partitions allowed to fail before the sync fails (default 0) */
+  fanoutToleratedFailurePercentage?: number;
 }
 
 export class SiesaIntegrationStack extends cdk.Stack {
@@ -22,18 +28,25 @@ export class SiesaIntegrationStack extends cdk.Stack {
   public readonly syncStateTable: dynamodb.Table;
   public readonly auditTable: dynamodb.Table;
   public readonly configBucket: s3.Bucket;
+  public readonly dataBucket: s3.Bucket;
   public readonly alertTopic: sns.Topic;
   public readonly lambdaExecutionRole: iam.Role;
   public readonly stepFunctionsRole: iam.Role;
   public readonly extractorFunction: lambda.Function;
   public readonly transformerFunction: lambda.Function;
   public readonly loaderFunction: lambda.Function;
+  public readonly syncSummaryFunction: lambda.Function;
   public readonly stateMachine: sfn.StateMachine;
   
   constructor(scope: Construct, id: string, props: SiesaIntegrationStackProps) {
     super(scope, id, props);
 
-    const { environment } = props;
+    const {
+      environment,
+      fanoutMaxConcurrency = 10,
+      fanoutPartsPerPartition = 5,
+      fanoutToleratedFailurePercentage = 0
+    } = props;
 
     // ===========================================
     // 1. DynamoDB Tables
@@ -149,6 +162,22 @@ export class SiesaIntegrationStack extends cdk.Stack {
       removalPolicy: cdk.RemovalPolicy.RETAIN
     });
 
+    // Bucket for NDJSON parts exchanged between pipeline stages
+    this.dataBucket = new s3.Bucket(this, 'DataBucket', {
+      bucketName: `siesa-integration-data-${environment}-${this.account}`,
+      encryption: s3.BucketEncryption.S3_MANAGED,
+      blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
+      lifecycleRules: [
+        {
+          id: 'ExpireSyncRuns',
+          enabled: true,
+          prefix: 'runs/',
+          expiration: cdk.Duration.days(7)
+        }
+      ],
+      removalPolicy: cdk.RemovalPolicy.RETAIN
+    });
+
     // ===========================================
     // 3. Secrets Manager for API Credentials
     // ===========================================
@@ -185,6 +214,18 @@ export class SiesaIntegrationStack extends cdk.Stack {
       }
     });
 
+    // HMAC key the pipeline Lambdas use to mark payloads they already sanitized
+    const provenanceSecret = new secretsmanager.Secret(this, 'PipelineProvenanceSecret', {
+      secretName: `siesa-integration/pipeline-provenance-${environment}`,
+      description: 'Signing key for sanitized payloads passed between pipeline stages',
+      generateSecretString: {
+        secretStringTemplate: JSON.stringify({}),
+        generateStringKey: 'signingKey',
+        passwordLength: 64,
+        excludePunctuation: true
+      }
+    });
+
     // ===========================================
     // 4. SNS Topic for Alerts
     // ===========================================
@@ -259,7 +300,9 @@ export class SiesaIntegrationStack extends cdk.Stack {
       ],
       resources: [
         this.configBucket.bucketArn,
-        `${this.configBucket.bucketArn}/*`
+        `${this.configBucket.bucketArn}/*`,
+        this.dataBucket.bucketArn,
+        `${this.dataBucket.bucketArn}/*`
       ]
     }));
 
@@ -372,6 +415,14 @@ export class SiesaIntegrationStack extends cdk.Stack {
       removalPolicy: cdk.RemovalPolicy.DESTROY
     });
 
+    // Sync Summary Lambda Log Group
+    const syncSummaryLogGroup = new logs.LogGroup(this, 'SyncSummaryLogGroup', {
+      logGroupName: `/aws/lambda/siesa-integration-sync-summary-${environment}`,
+      retention: environment === 'prod' ? logs.RetentionDays.ONE_MONTH : logs.RetentionDays.ONE_WEEK,
+      encryptionKey: logsKmsKey,
+      removalPolicy: cdk.RemovalPolicy.DESTROY
+    });
+
     // Step Functions Log Group
     const stepFunctionsLogGroup = new logs.LogGroup(this, 'StepFunctionsLogGroup', {
       logGroupName: `/aws/stepfunctions/siesa-integration-workflow-${environment}`,
@@ -405,6 +456,19 @@ export class SiesaIntegrationStack extends cdk.Stack {
         CONFIG_TABLE: this.configTable.tableName,
         SYNC_STATE_TABLE: this.syncStateTable.tableName,
         AUDIT_TABLE: this.auditTable.tableName,
+        SIESA_PAGE_CONCURRENCY: '4',
+        CONFIG_CACHE_TTL_SECONDS: '60',
+        SECRET_CACHE_TTL_SECONDS: '300',
+        RATE_LIMIT_TABLE: this.syncStateTable.tableName,
+        SIESA_RATE_LIMIT_PER_MINUTE: '100',
+        EXTRACT_OUTPUT_MODE: 's3',
+        FANOUT_ENABLED: 'true',
+        FANOUT_PARTS_PER_PARTITION: String(fanoutPartsPerPartition),
+        PIPELINE_BUCKET: this.dataBucket.bucketName,
+        PROVENANCE_SECRET_ARN: provenanceSecret.secretArn,
+        METRICS_MODE: 'emf',
+        TIMING_ENABLED: 'true',
+        LOG_FORMAT: 'json',
         ENVIRONMENT: environment,
         LOG_LEVEL: 'INFO'
       },
@@ -423,6 +487,12 @@ export class SiesaIntegrationStack extends cdk.Stack {
       memorySize: 256,
       environment: {
         CONFIG_BUCKET: this.configBucket.bucketName,
+        MAPPINGS_CACHE_TTL_SECONDS: '300',
+        PIPELINE_BUCKET: this.dataBucket.bucketName,
+        PROVENANCE_SECRET_ARN: provenanceSecret.secretArn,
+        METRICS_MODE: 'emf',
+        TIMING_ENABLED: 'true',
+        LOG_FORMAT: 'json',
         ENVIRONMENT: environment,
         LOG_LEVEL: 'INFO'
       },
@@ -444,6 +514,21 @@ export class SiesaIntegrationStack extends cdk.Stack {
         SYNC_STATE_TABLE: this.syncStateTable.tableName,
         AUDIT_TABLE: this.auditTable.tableName,
         BATCH_SIZE: '100',
+        CONFIG_CACHE_TTL_SECONDS: '60',
+        SECRET_CACHE_TTL_SECONDS: '300',
+        BATCH_CONCURRENCY: '4',
+        ADAPTIVE_BATCH_SIZE: 'true',
+        BATCH_SIZE_MIN: '10',
+        BATCH_SIZE_MAX: '1000',
+        BATCH_TARGET_LATENCY_MS: '10000',
+        BISECT_MAX_CALLS: '16',
+        RATE_LIMIT_TABLE: this.syncStateTable.tableName,
+        API_RATE_LIMIT_PER_MINUTE: '50',
+        PIPELINE_BUCKET: this.dataBucket.bucketName,
+        PROVENANCE_SECRET_ARN: provenanceSecret.secretArn,
+        METRICS_MODE: 'emf',
+        TIMING_ENABLED: 'true',
+        LOG_FORMAT: 'json',
         ENVIRONMENT: environment,
         LOG_LEVEL: 'INFO'
       },
@@ -451,6 +536,27 @@ export class SiesaIntegrationStack extends cdk.Stack {
       description: 'Loads transformed data to product APIs (Kong/WMS) using adapter pattern'
     });
 
+    // Sync Summary Lambda Function (merges the partition results of a sync)
+    this.syncSummaryFunction = new lambda.Function(this, 'SyncSummaryFunction', {
+      functionName: `siesa-integration-sync-summary-${environment}`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'handler.merge_results_handler',
+      code: lambda.Code.fromAsset(path.join(__dirname, '../../../src/lambdas/loader')),
+      role: this.lambdaExecutionRole,
+      timeout: cdk.Duration.minutes(2),
+      memorySize: 256,
+      environment: {
+        CONFIG_TABLE: this.configTable.tableName,
+        SYNC_STATE_TABLE: this.syncStateTable.tableName,
+        PIPELINE_BUCKET: this.dataBucket.bucketName,
+        LOG_FORMAT: 'json',
+        ENVIRONMENT: environment,
+        LOG_LEVEL: 'INFO'
+      },
+      logGroup: syncSummaryLogGroup,
+      description: 'Merges per-partition load results into one sync summary'
+    });
+
     // ===========================================
     // 9. Step Functions State Machine
     // ===========================================
@@ -458,7 +564,13 @@ export class SiesaIntegrationStack extends cdk.Stack {
     // Define tasks for each Lambda function
     const extractTask = new tasks.LambdaInvoke(this, 'ExtractFromSiesa', {
       lambdaFunction: this.extractorFunction,
-      outputPath: '$.Payload',
+      // The extractor returns {statusCode, body}; continue with the parsed body.
+      // With FANOUT_ENABLED it raises on failure instead, so the task fails and
+      // the Catch below runs before the Map state reads $.partitions
+      resultSelector: {
+        'body.$': 'States.StringToJson($.Payload.body)'
+      },
+      outputPath: '$.body',
       retryOnServiceExceptions: true,
       payload: sfn.TaskInput.fromObject({
         'client_id.$': '$.client_id',
@@ -478,6 +590,38 @@ export class SiesaIntegrationStack extends cdk.Stack {
       retryOnServiceExceptions: true
     });
 
+    // Transform and load each extract partition in its own child execution.
+    // Partitions are read from the S3 file the extractor wrote and results are
+    // written back to S3, so neither is bounded by the state payload size.
+    const partitionMap = new sfn.DistributedMap(this, 'TransformAndLoadPartitions', {
+      maxConcurrency: fanoutMaxConcurrency,
+      itemReader: new sfn.S3JsonItemReader({
+        bucket: this.dataBucket,
+        key: sfn.JsonPath.stringAt('$.partitions.key')
+      }),
+      resultWriter: new sfn.ResultWriter({
+        bucket: this.dataBucket,
+        prefix: 'map-results'
+      }),
+      toleratedFailurePercentage: fanoutToleratedFailurePercentage,
+      resultPath: '$.map_results'
+    });
+
+    // Merge the partition results into one sync summary for LogSuccess
+    const mergeTask = new tasks.LambdaInvoke(this, 'MergePartitionResults', {
+      lambdaFunction: this.syncSummaryFunction,
+      outputPath: '$.Payload',
+      retryOnServiceExceptions: true,
+      payload: sfn.TaskInput.fromObject({
+        'client_id.$': '$.client_id',
+        'product_type.$': '$.product_type',
+        'sync_type.$': '$.sync_type',
+        'extraction_timestamp.$': '$.extraction_timestamp',
+        'sync_id.$': '$$.Execution.Name',
+        'map_results.$': '$.map_results.ResultWriterDetails'
+      })
+    });
+
     // Define DynamoDB update task for success
     const logSuccessTask = new tasks.DynamoPutItem(this, 'LogSuccess', {
       table: this.syncStateTable,
@@ -527,6 +671,7 @@ export class SiesaIntegrationStack extends cdk.Stack {
     extractTask.addRetry(retryConfig);
     transformTask.addRetry(retryConfig);
     loadTask.addRetry(retryConfig);
+    mergeTask.addRetry(retryConfig);
 
     // Define error handling
     const failureChain = notifyFailureTask.next(logFailureTask);
@@ -535,18 +680,22 @@ export class SiesaIntegrationStack extends cdk.Stack {
       resultPath: '$.error'
     });
     
-    transformTask.addCatch(failureChain, {
+    partitionMap.addCatch(failureChain, {
       resultPath: '$.error'
     });
     
-    loadTask.addCatch(failureChain, {
+    mergeTask.addCatch(failureChain, {
       resultPath: '$.error'
     });
 
+    // Each partition is transformed and loaded inside the Map (failures are
+    // retried there and surface as a failed Map run)
+    partitionMap.itemProcessor(transformTask.next(loadTask));
+
     // Define the workflow chain
     const definition = extractTask
-      .next(transformTask)
-      .next(loadTask)
+      .next(partitionMap)
+      .next(mergeTask)
       .next(logSuccessTask);
 
     // Create the state machine
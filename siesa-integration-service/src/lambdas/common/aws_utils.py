@@ -2,14 +2,26 @@
 Common AWS utilities for Lambda functions
 """
 
+import copy
 import json
 import logging
+import os
 from typing import Dict, Any
 import boto3
 from botocore.exceptions import ClientError
 
+from common.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
+# Warm-invocation caches for secrets and config items (a TTL of 0 disables them)
+SECRET_CACHE_TTL_SECONDS = int(os.environ.get('SECRET_CACHE_TTL_SECONDS', '0'))
+CONFIG_CACHE_TTL_SECONDS = int(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '0'))
+CACHE_MAX_SIZE = int(os.environ.get('CACHE_MAX_SIZE', '128'))
+
+_secret_cache = TTLCache(max_size=CACHE_MAX_SIZE, ttl_seconds=SECRET_CACHE_TTL_SECONDS)
+_item_cache = TTLCache(max_size=CACHE_MAX_SIZE, ttl_seconds=CONFIG_CACHE_TTL_SECONDS)
+
 # AWS clients (initialized once per Lambda container)
 _dynamodb = None
 _secrets_manager = None
@@ -40,12 +52,37 @@ def get_s3_client():
     return _s3
 
 
-def get_secret(secret_id: str) -> Dict[str, Any]:
+def _item_cache_key(table_name: str, key: Dict[str, Any]):
+    return table_name, tuple(sorted(key.items()))
+
+
+def invalidate_secret(secret_id: str) -> None:
+    """Drop a cached secret (e.g. after the credentials were rejected)"""
+    _secret_cache.invalidate(secret_id)
+
+
+def invalidate_dynamodb_item(table_name: str, key: Dict[str, Any]) -> None:
+    """Drop a cached DynamoDB item (e.g. after updating it)"""
+    _item_cache.invalidate(_item_cache_key(table_name, key))
+
+
+def clear_caches() -> None:
+    """Drop every cached secret and item"""
+    _secret_cache.clear()
+    _item_cache.clear()
+
+
+def get_secret(secret_id: str, client=None, use_cache: bool = True) -> Dict[str, Any]:
     """
     Retrieve secret from AWS Secrets Manager
     
+    Secrets are cached for SECRET_CACHE_TTL_SECONDS across warm invocations;
+    each caller gets its own copy.
+    
     Args:
         secret_id: Secret ARN or name
+        client: Secrets Manager client (defaults to the shared one)
+        use_cache: Whether to serve and store the secret from the cache
     
     Returns:
         Secret value as dict
@@ -53,15 +90,23 @@ def get_secret(secret_id: str) -> Dict[str, Any]:
     Raises:
         ClientError: If secret retrieval fails
     """
+    if use_cache:
+        cached = _secret_cache.get(secret_id)
+        if cached is not None:
+            return copy.deepcopy(cached)
+    
     try:
-        client = get_secrets_manager_client()
+        client = client or get_secrets_manager_client()
         response = client.get_secret_value(SecretId=secret_id)
         
         secret_string = response.get('SecretString')
         if not secret_string:
             raise ValueError(f"Secret has no string value: {secret_id}")
         
-        return json.loads(secret_string)
+        secret = json.loads(secret_string)
+        if use_cache:
+            _secret_cache.set(secret_id, copy.deepcopy(secret))
+        return secret
         
     except ClientError as e:
         error_code = e.response['Error']['Code']
@@ -72,13 +117,17 @@ def get_secret(secret_id: str) -> Dict[str, Any]:
         raise
 
 
-def get_dynamodb_item(table_name: str, key: Dict[str, Any]) -> Dict[str, Any]:
+def get_dynamodb_item(table_name: str, key: Dict[str, Any], dynamodb_resource=None,
+                      use_cache: bool = False) -> Dict[str, Any]:
     """
     Get item from DynamoDB table
     
     Args:
         table_name: DynamoDB table name
         key: Primary key dict
+        dynamodb_resource: DynamoDB resource (defaults to the shared one)
+        use_cache: Whether to serve and store the item from the config
+            cache (CONFIG_CACHE_TTL_SECONDS); each caller gets its own copy
     
     Returns:
         Item dict
@@ -87,8 +136,14 @@ def get_dynamodb_item(table_name: str, key: Dict[str, Any]) -> Dict[str, Any]:
         ValueError: If item not found
         ClientError: If DynamoDB operation fails
     """
+    cache_key = _item_cache_key(table_name, key)
+    if use_cache:
+        cached = _item_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+    
     try:
-        dynamodb = get_dynamodb_resource()
+        dynamodb = dynamodb_resource or get_dynamodb_resource()
         table = dynamodb.Table(table_name)
         
         response = table.get_item(Key=key)
@@ -96,7 +151,10 @@ def get_dynamodb_item(table_name: str, key: Dict[str, Any]) -> Dict[str, Any]:
         if 'Item' not in response:
             raise ValueError(f"Item not found in {table_name}: {key}")
         
-        return response['Item']
+        item = response['Item']
+        if use_cache:
+            _item_cache.set(cache_key, copy.deepcopy(item))
+        return item
         
     except ClientError as e:
         error_code = e.response['Error']['Code']
@@ -164,6 +222,7 @@ def update_dynamodb_item(table_name: str, key: Dict[str, Any], updates: Dict[str
             ExpressionAttributeNames=expr_attr_names,
             ExpressionAttributeValues=expr_attr_values
         )
+        invalidate_dynamodb_item(table_name, key)
         
     except ClientError as e:
         error_code = e.response['Error']['Code']
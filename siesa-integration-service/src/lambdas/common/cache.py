@@ -0,0 +1,149 @@
+"""
+In-process TTL cache
+Keeps values (client configs, secrets) across warm Lambda invocations with a
+time-to-live, a size bound with LRU eviction and explicit invalidation
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after a TTL
+
+    A TTL of 0 or less disables the cache: lookups always miss and nothing
+    is stored. Safe to share between threads.
+    """
+
+    def __init__(self, max_size: int = 128, ttl_seconds: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Entries kept before the least recently used is evicted
+            ttl_seconds: Seconds an entry stays valid
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether entries are stored at all"""
+        return self.ttl_seconds > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a live entry
+
+        Args:
+            key: Cache key
+            default: Returned when the key is missing or expired
+
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if self._clock() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store an entry
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl_seconds: Override of the cache TTL for this entry
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Get an entry, loading and storing it on a miss
+
+        The loader runs outside the lock, so concurrent misses may each load;
+        a loader that raises stores nothing.
+
+        Args:
+            key: Cache key
+            loader: Called with no arguments to produce the value
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Drop one entry
+
+        Args:
+            key: Cache key
+
+        Returns:
+            True if an entry was dropped
+        """
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Cache counters
+
+        Returns:
+            Dict with size, hits, misses and evictions
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
@@ -1,7 +1,11 @@
+import logging
+import threading
 import time
 from enum import Enum
 from functools import wraps
 
+logger = logging.getLogger(__name__)
+
 
 class CircuitState(Enum):
     CLOSED = "closed"
@@ -10,40 +14,153 @@ class CircuitState(Enum):
 
 
 class CircuitBreaker:
-    def __init__(self, failure_threshold=5, recovery_timeout=60):
+    def __init__(self, failure_threshold=5, recovery_timeout=60, half_open_max_calls=1,
+                 name=None, on_state_change=None):
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
+        # Trial calls let through at once while half-open
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.name = name
+        # Called as on_state_change(breaker, old_state, new_state), outside the lock
+        self.on_state_change = on_state_change
         self.failure_count = 0
         self.last_failure_time = None
         self.state = CircuitState.CLOSED
+        # Guards state so concurrent workers share one breaker
+        self._lock = threading.Lock()
+        self._probes_in_flight = 0
+
+    def _transition(self, new_state, transitions):
+        # Caller holds the lock; listeners are notified once it is released
+        if self.state != new_state:
+            transitions.append((self.state, new_state))
+            self.state = new_state
+
+    def _notify(self, transitions):
+        changes = transitions[:]
+        transitions.clear()
+        if not self.on_state_change:
+            return
+        for old_state, new_state in changes:
+            try:
+                self.on_state_change(self, old_state, new_state)
+            except Exception as e:
+                logger.warning(f"Circuit breaker state listener failed: {type(e).__name__}")
 
     def call(self, func, *args, **kwargs):
-        if self.state == CircuitState.OPEN:
-            if time.time() - self.last_failure_time >= self.recovery_timeout:
-                self.state = CircuitState.HALF_OPEN
-            else:
-                raise Exception("Circuit breaker is OPEN")
+        transitions = []
+        try:
+            with self._lock:
+                if self.state == CircuitState.OPEN:
+                    if time.time() - self.last_failure_time >= self.recovery_timeout:
+                        self._transition(CircuitState.HALF_OPEN, transitions)
+                        self._probes_in_flight = 0
+                    else:
+                        raise Exception("Circuit breaker is OPEN")
+
+                # Only a few trial calls go through while half-open
+                probe = self.state == CircuitState.HALF_OPEN
+                if probe:
+                    if self._probes_in_flight >= self.half_open_max_calls:
+                        raise Exception("Circuit breaker is HALF_OPEN")
+                    self._probes_in_flight += 1
+        finally:
+            self._notify(transitions)
 
         try:
             result = func(*args, **kwargs)
-            if self.state == CircuitState.HALF_OPEN:
-                self.state = CircuitState.CLOSED
-                self.failure_count = 0
-            return result
-        except Exception as e:
-            self.failure_count += 1
-            self.last_failure_time = time.time()
-            if self.failure_count >= self.failure_threshold:
-                self.state = CircuitState.OPEN
+        except Exception:
+            with self._lock:
+                self.failure_count += 1
+                self.last_failure_time = time.time()
+                if probe:
+                    self._probes_in_flight -= 1
+                # A failed probe reopens the circuit straight away
+                if probe or self.failure_count >= self.failure_threshold:
+                    self._transition(CircuitState.OPEN, transitions)
+            self._notify(transitions)
             raise
 
+        if probe:
+            with self._lock:
+                self._probes_in_flight -= 1
+                self._transition(CircuitState.CLOSED, transitions)
+                self.failure_count = 0
+            self._notify(transitions)
+        return result
+
+
+# Breakers for keyed callers, one per (tenant, endpoint, operation)
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def _publish_state_change(tenant_id, operation):
+    def publish(breaker, old_state, new_state):
+        logger.warning(f"Circuit breaker {breaker.name}: {old_state.name} -> {new_state.name}")
+        from common.metrics import get_metrics_publisher
+        get_metrics_publisher().put_circuit_breaker_state(tenant_id, operation, new_state.name)
+    return publish
+
+
+def get_circuit_breaker(tenant_id, endpoint, operation, failure_threshold=5, recovery_timeout=60):
+    """
+    Get the breaker for one tenant's calls to one endpoint
+
+    Breakers are created on first use and live for the container, so a
+    failing tenant or endpoint opens only its own circuit. State changes
+    are published as CircuitBreakerState metrics.
+
+    Args:
+        tenant_id: Tenant identifier
+        endpoint: API base URL
+        operation: Guarded operation (method name)
+        failure_threshold: Failures before the circuit opens
+        recovery_timeout: Seconds before a trial call is let through
+
+    Returns:
+        CircuitBreaker
+    """
+    key = (tenant_id, endpoint, operation)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold,
+                recovery_timeout,
+                name=f"{operation}[{tenant_id}@{endpoint}]",
+                on_state_change=_publish_state_change(tenant_id, operation)
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def client_key(client, *args, **kwargs):
+    """Breaker key for API client methods: the client's (tenant_id, base_url)"""
+    return client.tenant_id, client.base_url
+
+
+def circuit_breaker(failure_threshold=5, recovery_timeout=60, key=None):
+    """
+    Guard a function with a circuit breaker
 
-def circuit_breaker(failure_threshold=5, recovery_timeout=60):
-    cb = CircuitBreaker(failure_threshold, recovery_timeout)
+    Args:
+        failure_threshold: Failures before the circuit opens
+        recovery_timeout: Seconds before a trial call is let through
+        key: Optional callable given the call's arguments and returning
+            (tenant_id, endpoint); each distinct key gets its own breaker.
+            Without it one breaker is shared by every caller.
+    """
+    cb = CircuitBreaker(failure_threshold, recovery_timeout) if key is None else None
 
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            return cb.call(func, *args, **kwargs)
+            breaker = cb
+            if breaker is None:
+                tenant_id, endpoint = key(*args, **kwargs)
+                breaker = get_circuit_breaker(tenant_id, endpoint, func.__name__,
+                                              failure_threshold, recovery_timeout)
+            return breaker.call(func, *args, **kwargs)
         return wrapper
     return decorator
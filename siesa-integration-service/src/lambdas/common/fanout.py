@@ -0,0 +1,245 @@
+"""
+Partitioned fan-out
+Splits an extract manifest into partitions that the state machine's
+Distributed Map transforms and loads in parallel, and merges the
+per-partition load results into one sync summary
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from common.aws_utils import get_s3_client
+from common.logging_utils import get_structured_logger
+from common.provenance import sign_payload
+
+logger = get_structured_logger(__name__)
+
+# Extract parts (Siesa pages) transformed and loaded by one Map iteration
+FANOUT_PARTS_PER_PARTITION = int(os.environ.get('FANOUT_PARTS_PER_PARTITION', '1'))
+
+# Failed records kept in the merged summary (matches the loader response)
+MAX_FAILED_RECORDS = 10
+
+# Extract output carried into every partition item
+_ITEM_FIELDS = ('client_id', 'product_type', 'sync_type', 'extraction_timestamp')
+
+# Load results summed into the sync summary
+_COUNT_FIELDS = ('records_processed', 'records_success', 'records_failed', 'records_skipped')
+
+
+def partition_manifest(manifest: Dict[str, Any], parts_per_partition: int = FANOUT_PARTS_PER_PARTITION) -> List[Dict[str, Any]]:
+    """
+    Split a part manifest into smaller manifests over consecutive parts
+
+    Args:
+        manifest: Manifest produced by PartWriter.manifest()
+        parts_per_partition: Parts in each partition
+
+    Returns:
+        Manifests in part order, each with a 'partition' entry holding its
+        index, the number of partitions and the offset of its first record
+    """
+    parts = manifest.get('parts', [])
+    size = max(1, int(parts_per_partition))
+    groups = [parts[start:start + size] for start in range(0, len(parts), size)]
+
+    partitions = []
+    offset = 0
+    for index, group in enumerate(groups):
+        count = sum(part['count'] for part in group)
+        partitions.append({
+            **manifest,
+            'parts': group,
+            'total_count': count,
+            'partition': {'index': index, 'count': len(groups), 'offset': offset}
+        })
+        offset += count
+    return partitions
+
+
+def partition_items(extract_output: Dict[str, Any],
+                    parts_per_partition: int = FANOUT_PARTS_PER_PARTITION) -> List[Dict[str, Any]]:
+    """
+    Build the Map items for an extract run
+
+    Each item is a transformer event for one partition: the extract output
+    with products_manifest narrowed to the partition's parts and re-signed,
+    so partitions keep skipping the second sanitization pass.
+
+    Args:
+        extract_output: Extractor response data holding products_manifest
+        parts_per_partition: Parts in each partition
+
+    Returns:
+        Transformer events, one per partition
+    """
+    items = []
+    for manifest in partition_manifest(extract_output['products_manifest'], parts_per_partition):
+        item = {field: extract_output.get(field) for field in _ITEM_FIELDS}
+        item['partition'] = manifest.pop('partition')
+        item['products_manifest'] = manifest
+        items.append(sign_payload(item, 'products_manifest', stage='extract'))
+    return items
+
+
+def write_partition_items(items: List[Dict[str, Any]], bucket: str, prefix: str, s3_client=None) -> Dict[str, Any]:
+    """
+    Store Map items as a JSON array for the Distributed Map item reader
+
+    Items are read from S3 rather than the state payload, so the number of
+    partitions is not bounded by the Step Functions payload size.
+
+    Args:
+        items: Partition items
+        bucket: S3 bucket
+        prefix: Key prefix of the run
+
+    Returns:
+        Reference with bucket, key and count of the items
+    """
+    key = f"{prefix.rstrip('/')}/partitions.json"
+    (s3_client or get_s3_client()).put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(items, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        ContentType='application/json'
+    )
+    return {'bucket': bucket, 'key': key, 'count': len(items)}
+
+
+def read_map_results(bucket: str, manifest_key: str, s3_client=None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Read the results a Distributed Map wrote with its result writer
+
+    Args:
+        bucket: Bucket the results were written to
+        manifest_key: Key of the result writer's manifest.json
+
+    Returns:
+        Tuple of (outputs of succeeded iterations, failed iterations as
+        {partition, error, cause})
+    """
+    s3 = s3_client or get_s3_client()
+
+    def read_json(key: str) -> Any:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+    result_files = read_json(manifest_key).get('ResultFiles', {})
+    outputs = []
+    failures = []
+
+    for result_file in result_files.get('SUCCEEDED', []):
+        for execution in read_json(result_file['Key']):
+            outputs.append(json.loads(execution['Output']))
+
+    for status in ('FAILED', 'PENDING'):
+        for result_file in result_files.get(status, []):
+            for execution in read_json(result_file['Key']):
+                item = json.loads(execution.get('Input') or '{}')
+                failures.append({
+                    'partition': (item.get('partition') or {}).get('index'),
+                    'error': execution.get('Error', status),
+                    'cause': execution.get('Cause', '')
+                })
+
+    return outputs, failures
+
+
+def merge_results(results: Iterable[Dict[str, Any]], failures: Iterable[Dict[str, Any]] = (),
+                  sync_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Merge per-partition load results into one sync summary
+
+    Args:
+        results: Loader responses of the partitions
+        failures: Partitions that did not complete (see read_map_results)
+        sync_id: Sync identifier (generated when not given)
+
+    Returns:
+        Summary in the loader response format, plus partition counts
+    """
+    results = sorted(results, key=lambda result: (result.get('partition') or {}).get('index', 0))
+    failures = list(failures)
+    first = results[0] if results else {}
+
+    summary: Dict[str, Any] = {
+        'client_id': first.get('client_id'),
+        'product_type': first.get('product_type'),
+        'sync_id': sync_id or f"sync-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+    }
+    for field in _COUNT_FIELDS:
+        summary[field] = sum(result.get(field, 0) for result in results)
+
+    if summary['records_failed'] == 0 and not failures:
+        summary['status'] = 'success'
+    elif summary['records_success'] > 0:
+        summary['status'] = 'partial'
+    else:
+        summary['status'] = 'failed'
+
+    failed_records = []
+    for result in results:
+        failed_records.extend(result.get('failed_records', []))
+    summary['failed_records'] = failed_records[:MAX_FAILED_RECORDS]
+
+    # Partitions run concurrently, so the sync ends with the last of them
+    summary['extraction_timestamp'] = first.get('extraction_timestamp')
+    for field in ('transformation_timestamp', 'load_timestamp'):
+        timestamps = [result[field] for result in results if result.get(field)]
+        summary[field] = max(timestamps) if timestamps else datetime.now(timezone.utc).isoformat()
+    summary['duration_seconds'] = max((result.get('duration_seconds', 0) for result in results), default=0)
+
+    summary['partitions'] = {
+        'total': len(results) + len(failures),
+        'succeeded': len(results),
+        'failed': len(failures)
+    }
+    if failures:
+        summary['failed_partitions'] = failures[:MAX_FAILED_RECORDS]
+
+    return summary
+
+
+def run_fanout(extract_output: Dict[str, Any],
+               transform: Callable[[Dict[str, Any]], Dict[str, Any]],
+               load: Callable[[Dict[str, Any]], Dict[str, Any]],
+               max_concurrency: int = 4,
+               parts_per_partition: int = FANOUT_PARTS_PER_PARTITION,
+               sync_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the fan-out in process, as the state machine's Distributed Map does
+
+    Partitions are transformed and loaded on a thread pool; a partition that
+    raises is reported as failed instead of stopping the others.
+
+    Args:
+        extract_output: Extractor response data holding products_manifest
+        transform: Transformer entry point (event -> response)
+        load: Loader entry point (event -> response)
+        max_concurrency: Partitions processed at once
+        parts_per_partition: Parts in each partition
+        sync_id: Sync identifier
+
+    Returns:
+        Merged sync summary
+    """
+    items = partition_items(extract_output, parts_per_partition)
+
+    def run_partition(item: Dict[str, Any]) -> Dict[str, Any]:
+        return load(transform(item))
+
+    results = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = [(item, executor.submit(run_partition, item)) for item in items]
+        for item, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error("Partition failed", partition=item['partition']['index'], error=str(e))
+                failures.append({'partition': item['partition']['index'], 'error': type(e).__name__, 'cause': str(e)})
+
+    return merge_results(results, failures, sync_id=sync_id)
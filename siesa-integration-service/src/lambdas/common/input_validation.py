@@ -5,7 +5,7 @@ Provides comprehensive input validation against SQL injection, XSS, and other at
 
 import re
 import html
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Union
 from decimal import Decimal, InvalidOperation
 
 
@@ -102,6 +102,41 @@ XSS_PATTERNS = [
     re.compile(r'<!ENTITY[\s\S]*?>', re.IGNORECASE),
 ]
 
+# Cheap pre-screen for the full pattern battery. Every match of
+# SQL_INJECTION_PATTERN or XSS_PATTERNS contains one of these characters or
+# keywords (same flags, so case folding agrees): a string without any of
+# them cannot match and skips the battery.
+SUSPICIOUS_PATTERN = re.compile(
+    r"[<>=:;#(@]|--|/\*|\*/|\|\||0x|"
+    r"UN\s*ION|SEL\s*ECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|SCRIPT|"
+    r"CONCAT|SLEEP|BENCHMARK|WAITFOR",
+    re.IGNORECASE
+)
+
+# SUSPICIOUS_PATTERN split for ASCII text, where case-insensitive matching
+# is the same as matching the lowercased text; case-sensitive scans are
+# several times faster
+SUSPICIOUS_CHARS_PATTERN = re.compile(r"[<>=:;#(@]|--|/\*|\*/|\|\||0[xX]")
+SUSPICIOUS_KEYWORDS_PATTERN = re.compile(
+    r"un\s*ion|sel\s*ect|insert|update|delete|drop|create|alter|exec|script|"
+    r"concat|sleep|benchmark|waitfor"
+)
+
+# SUSPICIOUS_CHARS_PATTERN and SUSPICIOUS_KEYWORDS_PATTERN as literals, for
+# the long ASCII blocks sanitize_string_batch screens: substring checks scan
+# text many times faster than the regex alternations. Keywords are looked up
+# with whitespace (what \s matches in ASCII) deleted, which finds 'un ion'
+# and 'sel ect'; joining text across deleted whitespace can only add matches.
+SUSPICIOUS_CHARS = '<>=:;#(@'
+SUSPICIOUS_SEQUENCES = ('--', '/*', '*/', '||')
+SUSPICIOUS_KEYWORDS = (
+    'union', 'select', 'insert', 'update', 'delete', 'drop', 'create', 'alter', 'exec', 'script',
+    'concat', 'sleep', 'benchmark', 'waitfor'
+)
+_DELETE_SUSPICIOUS_CHARS = str.maketrans('', '', SUSPICIOUS_CHARS)
+_DELETE_SEQUENCE_CHARS = str.maketrans('', '', '-/*|')
+_DELETE_WHITESPACE = str.maketrans('', '', '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ')
+
 # Path traversal pattern
 PATH_TRAVERSAL_PATTERN = re.compile(r'\.\.[/\\]')
 
@@ -115,12 +150,22 @@ COMMAND_INJECTION_PATTERN = re.compile(
 # Log injection pattern - detects newlines and control characters
 LOG_INJECTION_PATTERN = re.compile(r'[\n\r\t\x00-\x1f\x7f]')
 
+# Strings screened together by sanitize_string_batch
+SANITIZE_BLOCK_SIZE = 256
+
 
 class ValidationError(Exception):
     """Custom exception for validation errors"""
     pass
 
 
+def _is_suspicious(value: str) -> bool:
+    """Pre-screen: False means value cannot match any SQL injection or XSS pattern"""
+    if value.isascii():
+        return bool(SUSPICIOUS_CHARS_PATTERN.search(value) or SUSPICIOUS_KEYWORDS_PATTERN.search(value.lower()))
+    return SUSPICIOUS_PATTERN.search(value) is not None
+
+
 def sanitize_string(value: str, max_length: int = 1000) -> str:
     """
     Sanitize a string value with comprehensive XSS protection
@@ -142,19 +187,113 @@ def sanitize_string(value: str, max_length: int = 1000) -> str:
     if len(value) > max_length:
         raise ValidationError(f"String too long: {len(value)} > {max_length}")
     
-    # Check for SQL injection
-    if SQL_INJECTION_PATTERN.search(value):
-        raise ValidationError("Potential SQL injection detected")
-    
-    # Check for XSS - test against all patterns
-    for pattern in XSS_PATTERNS:
-        if pattern.search(value):
-            raise ValidationError("Potential XSS attack detected")
+    # Plain strings cannot match any attack pattern
+    if _is_suspicious(value):
+        # Check for SQL injection
+        if SQL_INJECTION_PATTERN.search(value):
+            raise ValidationError("Potential SQL injection detected")
+        
+        # Check for XSS - test against all patterns
+        for pattern in XSS_PATTERNS:
+            if pattern.search(value):
+                raise ValidationError("Potential XSS attack detected")
     
     # HTML escape for additional safety
     return html.escape(value, quote=True)
 
 
+def _is_suspicious_block(text: str) -> bool:
+    """_is_suspicious for long text, using the literal screen for ASCII"""
+    if not text.isascii():
+        return SUSPICIOUS_PATTERN.search(text) is not None
+    if len(text.translate(_DELETE_SUSPICIOUS_CHARS)) != len(text):
+        return True
+    # Most text has none of the sequence characters at all
+    if len(text.translate(_DELETE_SEQUENCE_CHARS)) != len(text):
+        if any(sequence in text for sequence in SUSPICIOUS_SEQUENCES):
+            return True
+    lowered = text.lower()
+    if '0x' in lowered:
+        return True
+    compact = lowered.translate(_DELETE_WHITESPACE)
+    return any(keyword in compact for keyword in SUSPICIOUS_KEYWORDS)
+
+
+def _has_attack_pattern(text: str) -> bool:
+    """Check a block of text against the SQL injection and XSS patterns"""
+    if not _is_suspicious_block(text):
+        return False
+    if SQL_INJECTION_PATTERN.search(text):
+        return True
+    return any(pattern.search(text) for pattern in XSS_PATTERNS)
+
+
+def sanitize_string_batch(values: Sequence[Any], max_length: int = 1000) -> List[Union[str, ValidationError]]:
+    """
+    Sanitize many strings, with the same result as sanitize_string on each
+    
+    Strings are screened in blocks joined by newlines. None of the attack
+    patterns is anchored, and a newline is a non-word character just like
+    the edge of a string, so any match inside one string is also a match
+    in the block: a block with no match is clean and is escaped in one go.
+    Blocks with a match are sanitized string by string to find the
+    offenders.
+    
+    Args:
+        values: Strings to sanitize
+        max_length: Maximum allowed length
+        
+    Returns:
+        For each input, the sanitized string or the ValidationError that
+        sanitize_string would raise
+    """
+    if set(map(type, values)) <= {str} and max(map(len, values), default=0) <= max_length:
+        return _sanitize_screened_blocks(list(values), max_length)
+    
+    results: List[Union[str, ValidationError]] = [None] * len(values)
+    pending = []
+    
+    for index, value in enumerate(values):
+        if not isinstance(value, str):
+            results[index] = ValidationError(f"Expected string, got {type(value).__name__}")
+        elif len(value) > max_length:
+            results[index] = ValidationError(f"String too long: {len(value)} > {max_length}")
+        else:
+            pending.append(index)
+    
+    sanitized = _sanitize_screened_blocks([values[index] for index in pending], max_length)
+    for index, result in zip(pending, sanitized):
+        results[index] = result
+    
+    return results
+
+
+def _sanitize_screened_blocks(values: List[str], max_length: int) -> List[Union[str, ValidationError]]:
+    """sanitize_string_batch for strings already checked for type and length"""
+    results: List[Union[str, ValidationError]] = []
+    
+    for start in range(0, len(values), SANITIZE_BLOCK_SIZE):
+        block = values[start:start + SANITIZE_BLOCK_SIZE]
+        
+        text = '\n'.join(block)
+        if not _has_attack_pattern(text):
+            # Escaping leaves newlines alone, so the block splits back cleanly
+            # unless a value had newlines of its own
+            escaped = html.escape(text, quote=True).split('\n')
+            if len(escaped) != len(block):
+                escaped = [html.escape(value, quote=True) for value in block]
+            results.extend(escaped)
+            continue
+        
+        for value in block:
+            try:
+                results.append(sanitize_string(value, max_length=max_length))
+            except ValidationError as e:
+                results.append(e)
+    
+    return results
+
+
 def sanitize_log_message(message: str, max_length: int = 5000) -> str:
     """
     Sanitize log messages to prevent log injection attacks
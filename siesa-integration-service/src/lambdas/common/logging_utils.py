@@ -4,8 +4,137 @@ Filters sensitive data from logs to prevent information disclosure
 """
 
 import re
+import json
 import logging
-from typing import Any
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+from common.input_validation import sanitize_log_message
+
+# Hand records to a background thread for formatting and output
+LOG_QUEUE_ENABLED = os.environ.get('LOG_QUEUE_ENABLED', 'false').lower() == 'true'
+
+# 'text' keeps the runtime's format, 'json' writes one JSON object per record
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+
+# Longest message or field value written (longer ones are truncated)
+MAX_LOG_VALUE_LENGTH = 5000
+
+# Patterns for sensitive data (group name, pattern, replacement). They are
+# compiled into one case-insensitive alternation, so a string is redacted in
+# a single scan; where patterns overlap, the leftmost match wins.
+SENSITIVE_PATTERNS = [
+    # Passwords
+    ('password', r'password["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'password=***REDACTED***'),
+    ('passwd', r'passwd["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'passwd=***REDACTED***'),
+    ('pwd', r'pwd["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'pwd=***REDACTED***'),
+    
+    # Tokens and keys
+    ('auth_token', r'auth_token["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'auth_token=***REDACTED***'),
+    ('access_token', r'access_token["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'access_token=***REDACTED***'),
+    ('token', r'token["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'token=***REDACTED***'),
+    ('api_key', r'api[_-]?key["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'api_key=***REDACTED***'),
+    
+    # AWS ARNs for secrets (before 'secret', which would match their tail)
+    ('secret_arn', r'arn:aws:secretsmanager:[^:]+:[^:]+:secret:[^"\'}\s,/]+',
+     'arn:aws:secretsmanager:REGION:ACCOUNT:secret:***REDACTED***'),
+    ('secret', r'secret["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'secret=***REDACTED***'),
+    
+    # Credentials in URLs
+    ('url_credentials', r'://[^:]+:[^@]+@', '://***REDACTED***:***REDACTED***@'),
+    
+    # Bearer tokens
+    ('bearer', r'Bearer\s+[A-Za-z0-9\-._~+/]+=*', 'Bearer ***REDACTED***'),
+    
+    # Authorization headers
+    ('authorization', r'Authorization["\']?\s*[:=]\s*["\']?[^"\'}\s,]+', 'Authorization=***REDACTED***'),
+    
+    # Email addresses (PII)
+    ('email', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '***EMAIL_REDACTED***'),
+    
+    # Credit card numbers (PII)
+    ('credit_card', r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b', '***CC_REDACTED***'),
+    
+    # SSN-like patterns (PII)
+    ('ssn', r'\b\d{3}-\d{2}-\d{4}\b', '***SSN_REDACTED***'),
+]
+
+_REDACTION_REGEX = re.compile(
+    '|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in SENSITIVE_PATTERNS),
+    re.IGNORECASE
+)
+_REPLACEMENTS = {name: replacement for name, _, replacement in SENSITIVE_PATTERNS}
+
+# Text every sensitive pattern contains; strings without any are returned
+# as they are, which is the common case and much cheaper than the full scan.
+# Keep in step with SENSITIVE_PATTERNS. ASCII text is lowercased and searched
+# case-sensitively (faster than IGNORECASE); other text may hold characters
+# that only match under IGNORECASE, so it is searched with the flag.
+_TRIGGER = r'pass|pwd|token|key|secret|bearer|authorization|@|\d{4}[\s-]?\d{4}|\d{3}-\d{2}-'
+_TRIGGER_REGEX = re.compile(_TRIGGER)
+_TRIGGER_REGEX_IGNORECASE = re.compile(_TRIGGER, re.IGNORECASE)
+
+
+def _replace(match: 're.Match') -> str:
+    return _REPLACEMENTS[match.lastgroup]
+
+
+def redact(text: str) -> str:
+    """
+    Redact sensitive data from a string in one pass
+    
+    Args:
+        text: Text to redact
+    
+    Returns:
+        Text with credentials, tokens and PII replaced
+    """
+    if text.isascii():
+        triggered = _TRIGGER_REGEX.search(text.lower())
+    else:
+        triggered = _TRIGGER_REGEX_IGNORECASE.search(text)
+    if not triggered:
+        return text
+    return _REDACTION_REGEX.sub(_replace, text)
+
+
+def _clip(text: str) -> str:
+    if len(text) > MAX_LOG_VALUE_LENGTH:
+        return text[:MAX_LOG_VALUE_LENGTH] + '...'
+    return text
+
+
+class StructuredMessage:
+    """
+    Log message with key/value fields, rendered only when the record is emitted
+    
+    JsonFormatter writes the fields as JSON keys; any other formatter gets
+    the message followed by sanitized key=value pairs.
+    """
+    
+    __slots__ = ('message', 'args', 'fields')
+    
+    def __init__(self, message: str, args: Tuple[Any, ...], fields: Dict[str, Any]):
+        self.message = message
+        self.args = args
+        self.fields = fields
+    
+    def render_message(self) -> str:
+        message = str(self.message)
+        return message % self.args if self.args else message
+    
+    def __str__(self) -> str:
+        pairs = ' '.join(
+            f"{key}={json.dumps(value, default=str, ensure_ascii=False) if isinstance(value, (dict, list, tuple)) else value}"
+            for key, value in self.fields.items()
+        )
+        return sanitize_log_message(_clip(f"{self.render_message()} {pairs}"))
+
 
 class SensitiveDataFilter(logging.Filter):
     """
@@ -13,43 +142,6 @@ class SensitiveDataFilter(logging.Filter):
     Prevents exposure of credentials, tokens, and PII in CloudWatch Logs
     """
     
-    # Patterns for sensitive data (pattern, replacement)
-    SENSITIVE_PATTERNS = [
-        # Passwords
-        (r'password["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'password=***REDACTED***'),
-        (r'passwd["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'passwd=***REDACTED***'),
-        (r'pwd["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'pwd=***REDACTED***'),
-        
-        # Tokens and keys
-        (r'token["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'token=***REDACTED***'),
-        (r'auth_token["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'auth_token=***REDACTED***'),
-        (r'access_token["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'access_token=***REDACTED***'),
-        (r'api[_-]?key["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'api_key=***REDACTED***'),
-        (r'secret["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'secret=***REDACTED***'),
-        
-        # AWS ARNs for secrets
-        (r'arn:aws:secretsmanager:[^:]+:[^:]+:secret:([^"\'}\s,/]+)', 
-         r'arn:aws:secretsmanager:REGION:ACCOUNT:secret:***REDACTED***'),
-        
-        # Credentials in URLs
-        (r'://([^:]+):([^@]+)@', r'://***REDACTED***:***REDACTED***@'),
-        
-        # Bearer tokens
-        (r'Bearer\s+([A-Za-z0-9\-._~+/]+=*)', r'Bearer ***REDACTED***'),
-        
-        # Authorization headers
-        (r'Authorization["\']?\s*[:=]\s*["\']?([^"\'}\s,]+)', r'Authorization=***REDACTED***'),
-        
-        # Email addresses (PII)
-        (r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', r'***EMAIL_REDACTED***'),
-        
-        # Credit card numbers (PII)
-        (r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b', r'***CC_REDACTED***'),
-        
-        # SSN-like patterns (PII)
-        (r'\b\d{3}-\d{2}-\d{4}\b', r'***SSN_REDACTED***'),
-    ]
-    
     def filter(self, record: logging.LogRecord) -> bool:
         """
         Filter log record to redact sensitive data
@@ -60,10 +152,22 @@ class SensitiveDataFilter(logging.Filter):
         Returns:
             True to allow the record to be logged
         """
+        # A record seen by several filters (logger and handler) is redacted once
+        if getattr(record, '_redacted', False):
+            return True
+        record._redacted = True
+        
+        # Structured records keep their fields apart from the message
+        if isinstance(record.msg, StructuredMessage):
+            record.msg = StructuredMessage(
+                redact(record.msg.message),
+                tuple(self._redact_value(arg) for arg in record.msg.args),
+                self._redact_dict(record.msg.fields)
+            )
+        
         # Redact sensitive data from message
         if isinstance(record.msg, str):
-            for pattern, replacement in self.SENSITIVE_PATTERNS:
-                record.msg = re.sub(pattern, replacement, record.msg, flags=re.IGNORECASE)
+            record.msg = redact(record.msg)
         
         # Redact sensitive data from args
         if record.args:
@@ -97,14 +201,133 @@ class SensitiveDataFilter(logging.Filter):
     def _redact_value(self, value: Any) -> Any:
         """Redact sensitive data from a single value"""
         if isinstance(value, str):
-            for pattern, replacement in self.SENSITIVE_PATTERNS:
-                value = re.sub(pattern, replacement, value, flags=re.IGNORECASE)
+            value = redact(value)
         elif isinstance(value, dict):
             value = self._redact_dict(value)
         
         return value
 
 
+# One filter instance shared by every safe logger
+_sensitive_data_filter = SensitiveDataFilter()
+
+_queue_listener: Optional[QueueListener] = None
+_queue_lock = threading.Lock()
+
+
+def _add_filter(logger: logging.Logger) -> None:
+    if not any(isinstance(f, SensitiveDataFilter) for f in logger.filters):
+        logger.addFilter(_sensitive_data_filter)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, for CloudWatch Logs Insights
+    
+    Keys: timestamp, level, logger, message, requestId (inside Lambda), the
+    record's structured fields and exception. JSON encoding escapes newlines
+    and control characters, so values cannot forge log lines.
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, StructuredMessage):
+            message = record.msg.render_message()
+            fields = record.msg.fields
+        else:
+            message = record.getMessage()
+            fields = None
+        
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': _clip(message)
+        }
+        request_id = getattr(record, 'aws_request_id', None)
+        if request_id:
+            entry['requestId'] = request_id
+        if fields:
+            for key, value in fields.items():
+                entry.setdefault(key, _clip(value) if isinstance(value, str) else value)
+        if record.exc_info:
+            entry['exception'] = _clip(self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry['exception'] = _clip(record.exc_text)
+        
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# Keyword arguments the logging module itself accepts
+_LOG_KWARGS = frozenset(('exc_info', 'stack_info', 'stacklevel', 'extra'))
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    Logger taking key/value fields
+    
+    Usage:
+        logger.info("Batch loaded", batch=3, success=100, failed=0)
+    
+    Fields are keyword arguments. Nothing is formatted or sanitized for
+    levels that are disabled, and enabled records are rendered by the
+    handler's formatter when written.
+    """
+    
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+    
+    # The level methods check the level themselves so a disabled call costs
+    # one lookup instead of the adapter's chain of delegating frames
+    def debug(self, msg: Any, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, args, kwargs)
+    
+    def info(self, msg: Any, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, args, kwargs)
+    
+    def warning(self, msg: Any, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, msg, args, kwargs)
+    
+    def error(self, msg: Any, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, msg, args, kwargs)
+    
+    def exception(self, msg: Any, *args, exc_info: Any = True, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.ERROR):
+            kwargs['exc_info'] = exc_info
+            self._log(logging.ERROR, msg, args, kwargs)
+    
+    def critical(self, msg: Any, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            self._log(logging.CRITICAL, msg, args, kwargs)
+    
+    def log(self, level: int, msg: Any, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(level):
+            self._log(level, msg, args, kwargs)
+    
+    def _log(self, level: int, msg: Any, args: Tuple, kwargs: Dict[str, Any]) -> None:
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOG_KWARGS}
+        if fields:
+            msg = StructuredMessage(msg, args, fields)
+            args = ()
+        # Report the caller, not the level method and this one
+        kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 2
+        self.logger.log(level, msg, *args, **kwargs)
+
+
+def configure_json_logging() -> None:
+    """Format the root handlers' records as JSON lines (idempotent)"""
+    handlers = list(logging.getLogger().handlers)
+    listener = _queue_listener
+    if listener is not None:
+        handlers.extend(listener.handlers)
+    for handler in handlers:
+        if not isinstance(handler, QueueHandler) and not isinstance(handler.formatter, JsonFormatter):
+            handler.setFormatter(JsonFormatter())
+
+
 def setup_secure_logging(level: int = logging.INFO) -> logging.Logger:
     """
     Configure logging with sensitive data filtering
@@ -121,26 +344,121 @@ def setup_secure_logging(level: int = logging.INFO) -> logging.Logger:
     logger.setLevel(level)
     
     # Add sensitive data filter if not already present
-    has_filter = any(isinstance(f, SensitiveDataFilter) for f in logger.filters)
-    if not has_filter:
-        logger.addFilter(SensitiveDataFilter())
+    _add_filter(logger)
     
     return logger
 
 
-def get_safe_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+def get_safe_logger(name: str, level: int = logging.INFO, use_queue: Optional[bool] = None) -> logging.Logger:
     """
     Get a logger with sensitive data filtering
     
+    Idempotent: repeated calls (or module reloads) leave the logger with a
+    single filter, the instance shared by every safe logger.
+    
     Args:
         name: Logger name
         level: Logging level
+        use_queue: Route output through a background queue
+            (defaults to LOG_QUEUE_ENABLED, see enable_queue_logging)
     
     Returns:
         Logger with sensitive data filter
     """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    logger.addFilter(SensitiveDataFilter())
+    if logger.level != level:
+        logger.setLevel(level)
+    _add_filter(logger)
+    
+    if LOG_FORMAT == 'json':
+        configure_json_logging()
+    if LOG_QUEUE_ENABLED if use_queue is None else use_queue:
+        enable_queue_logging()
     
     return logger
+
+
+def get_structured_logger(name: str, level: int = logging.INFO) -> StructuredLogger:
+    """
+    Get a safe logger that takes key/value fields (see StructuredLogger)
+    
+    Args:
+        name: Logger name
+        level: Logging level
+    
+    Returns:
+        StructuredLogger
+    """
+    return StructuredLogger(get_safe_logger(name, level))
+
+
+def enable_queue_logging() -> None:
+    """
+    Move log output off the calling thread
+    
+    The root logger's handlers are replaced by a QueueHandler and run by a
+    QueueListener thread. Records are still redacted by the logger filter
+    before they are queued. Handlers must call flush_log_queue (or be
+    decorated with flush_logs) before returning, since Lambda freezes the
+    container between invocations. Idempotent.
+    """
+    global _queue_listener
+    with _queue_lock:
+        if _queue_listener is not None:
+            return
+        
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        if not handlers:
+            return
+        
+        log_queue = queue.Queue()
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        
+        _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _queue_listener.start()
+
+
+def disable_queue_logging() -> None:
+    """Stop the queue listener and give the root logger its handlers back"""
+    global _queue_listener
+    with _queue_lock:
+        if _queue_listener is None:
+            return
+        
+        _queue_listener.stop()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, QueueHandler):
+                root.removeHandler(handler)
+        for handler in _queue_listener.handlers:
+            root.addHandler(handler)
+        _queue_listener = None
+
+
+def flush_log_queue() -> None:
+    """Wait until queued records have been written"""
+    listener = _queue_listener
+    if listener is not None:
+        listener.queue.join()
+
+
+def flush_logs(handler):
+    """
+    Flush queued log records when a Lambda handler returns or raises
+    
+    Args:
+        handler: Lambda handler function
+    
+    Returns:
+        Wrapped handler
+    """
+    @wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            flush_log_queue()
+    return wrapper
@@ -4,20 +4,61 @@ Publishes custom metrics for monitoring integration performance
 """
 
 import boto3
+import json
+import os
+import sys
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Optional
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
 import logging
 
 # Use standard logging for metrics to avoid circular dependencies
 logger = logging.getLogger(__name__)
 
+# 'direct' sends each metric as it is recorded, 'buffered' aggregates metrics and
+# sends them with PutMetricData on flush, 'emf' writes them to stdout in the
+# CloudWatch Embedded Metric Format (no API calls)
+METRICS_MODE = os.environ.get('METRICS_MODE', 'direct')
+METRICS_MODES = ('direct', 'buffered', 'emf')
+
+# Distinct metric/dimension sets buffered before an early flush
+METRICS_FLUSH_THRESHOLD = 100
+
+# PutMetricData accepts up to 1000 metrics per request
+PUT_METRIC_DATA_LIMIT = 1000
+
+# EMF accepts up to 100 values per metric and 100 metrics per document
+EMF_MAX_VALUES = 100
+EMF_MAX_METRICS = 100
+
+MetricKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
 
 class MetricsPublisher:
     """Publisher for CloudWatch custom metrics"""
     
-    def __init__(self, namespace='SiesaIntegration'):
-        self.cloudwatch = boto3.client('cloudwatch')
+    def __init__(self, namespace='SiesaIntegration', mode: Optional[str] = None,
+                 flush_threshold: int = METRICS_FLUSH_THRESHOLD):
+        """
+        Initialize publisher
+        
+        Args:
+            namespace: CloudWatch namespace
+            mode: 'direct', 'buffered' or 'emf' (defaults to METRICS_MODE)
+            flush_threshold: Buffered metric/dimension sets that trigger a flush
+        """
+        self.mode = mode or METRICS_MODE
+        if self.mode not in METRICS_MODES:
+            logger.warning(f"Unknown METRICS_MODE {self.mode}, publishing directly")
+            self.mode = 'direct'
+        self.cloudwatch = boto3.client('cloudwatch') if self.mode != 'emf' else None
         self.namespace = namespace
+        self.flush_threshold = flush_threshold
+        # (metric, unit, dimensions) -> values recorded since the last flush
+        self._buffer: Dict[MetricKey, List[float]] = {}
+        self._lock = threading.Lock()
     
     def put_metric(
         self,
@@ -35,6 +76,10 @@ class MetricsPublisher:
             unit: Unit of measurement (Count, Seconds, etc.)
             dimensions: Optional dimensions for filtering
         """
+        if self.mode != 'direct':
+            self._record(metric_name, value, unit, dimensions)
+            return
+        
         try:
             metric_data = {
                 'MetricName': metric_name,
@@ -59,6 +104,89 @@ class MetricsPublisher:
             # Don't break flow on metrics errors
             logger.warning(f"Failed to publish metric {metric_name}: {str(e)}")
     
+    def _record(self, metric_name: str, value: float, unit: str, dimensions: Optional[Dict[str, str]]):
+        """Buffer a metric value, flushing when the buffer is full"""
+        key = (metric_name, unit, tuple((name, str(v)) for name, v in (dimensions or {}).items()))
+        with self._lock:
+            values = self._buffer.setdefault(key, [])
+            values.append(value)
+            full = len(self._buffer) >= self.flush_threshold or len(values) >= EMF_MAX_VALUES
+        if full:
+            self.flush()
+    
+    def flush(self):
+        """
+        Publish buffered metrics
+        
+        Values recorded for the same metric and dimensions are sent as one
+        statistic set (buffered) or one value array (emf). A no-op in direct mode.
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+        if not buffer:
+            return
+        
+        try:
+            if self.mode == 'emf':
+                self._write_emf(buffer)
+            else:
+                self._put_statistic_sets(buffer)
+        except Exception as e:
+            # Don't break flow on metrics errors
+            logger.warning(f"Failed to flush {len(buffer)} metrics: {str(e)}")
+    
+    def _put_statistic_sets(self, buffer: Dict[MetricKey, List[float]]):
+        timestamp = datetime.utcnow()
+        metric_data = []
+        for (metric_name, unit, dimensions), values in buffer.items():
+            datum = {
+                'MetricName': metric_name,
+                'Unit': unit,
+                'Timestamp': timestamp,
+                'StatisticValues': {
+                    'SampleCount': len(values),
+                    'Sum': sum(values),
+                    'Minimum': min(values),
+                    'Maximum': max(values)
+                }
+            }
+            if dimensions:
+                datum['Dimensions'] = [{'Name': name, 'Value': value} for name, value in dimensions]
+            metric_data.append(datum)
+        
+        for start in range(0, len(metric_data), PUT_METRIC_DATA_LIMIT):
+            self.cloudwatch.put_metric_data(
+                Namespace=self.namespace,
+                MetricData=metric_data[start:start + PUT_METRIC_DATA_LIMIT]
+            )
+        logger.debug(f"Published {len(metric_data)} metrics")
+    
+    def _write_emf(self, buffer: Dict[MetricKey, List[float]]):
+        # One document per dimension set; CloudWatch Logs extracts the metrics
+        by_dimensions: Dict[Tuple[Tuple[str, str], ...], List[Tuple[str, str, List[float]]]] = {}
+        for (metric_name, unit, dimensions), values in buffer.items():
+            by_dimensions.setdefault(dimensions, []).append((metric_name, unit, values))
+        
+        timestamp = int(time.time() * 1000)
+        for dimensions, metrics in by_dimensions.items():
+            for start in range(0, len(metrics), EMF_MAX_METRICS):
+                chunk = metrics[start:start + EMF_MAX_METRICS]
+                document = {
+                    '_aws': {
+                        'Timestamp': timestamp,
+                        'CloudWatchMetrics': [{
+                            'Namespace': self.namespace,
+                            'Dimensions': [[name for name, _ in dimensions]],
+                            'Metrics': [{'Name': metric_name, 'Unit': unit} for metric_name, unit, _ in chunk]
+                        }]
+                    },
+                    **dict(dimensions)
+                }
+                for metric_name, _, values in chunk:
+                    document[metric_name] = values if len(values) > 1 else values[0]
+                sys.stdout.write(json.dumps(document, default=str) + '\n')
+        sys.stdout.flush()
+    
     def put_sync_duration(self, client_id: str, duration_seconds: float):
         """
         Publish sync duration metric
@@ -185,6 +313,74 @@ class MetricsPublisher:
             error_count,
             dimensions={'ClientId': client_id}
         )
+    
+    def put_validation_warnings(self, client_id: str, field: str, reason: str, count: int):
+        """
+        Publish per-product warnings counted for one field and reason
+
+        Args:
+            client_id: Client identifier
+            field: Canonical field
+            reason: Kind of warning (see common.warning_aggregator)
+            count: Number of warnings
+        """
+        self.put_metric(
+            'ValidationWarnings',
+            count,
+            dimensions={
+                'ClientId': client_id,
+                'Field': field,
+                'Reason': reason
+            }
+        )
+
+    def put_records_skipped(self, client_id: str, count: int):
+        """
+        Publish unchanged records skipped by an incremental sync
+        
+        Args:
+            client_id: Client identifier
+            count: Number of records skipped
+        """
+        self.put_metric(
+            'RecordsSkipped',
+            count,
+            dimensions={'ClientId': client_id}
+        )
+    
+    def put_effective_batch_size(self, client_id: str, product_type: str, batch_size: int):
+        """
+        Publish the batch size the adaptive sizer settled on
+        
+        Args:
+            client_id: Client identifier
+            product_type: Product API the batches were sent to
+            batch_size: Final batch size of the sync
+        """
+        self.put_metric(
+            'EffectiveBatchSize',
+            batch_size,
+            dimensions={
+                'ClientId': client_id,
+                'API': product_type
+            }
+        )
+    
+    def put_stage_timing(self, client_id: str, stage: str, stats: Dict[str, float]):
+        """
+        Publish the duration histogram of one pipeline stage
+        
+        Args:
+            client_id: Client identifier
+            stage: Stage name (see common.timing)
+            stats: Dict with count, sum_ms, p50_ms, p95_ms and p99_ms
+        """
+        dimensions = {'ClientId': client_id, 'Stage': stage}
+        self.put_metric('StageCalls', stats['count'], dimensions=dimensions)
+        self.put_metric('StageTime', stats['sum_ms'], unit='Milliseconds', dimensions=dimensions)
+        for percentile in ('p50', 'p95', 'p99'):
+            self.put_metric(f"StageLatency{percentile.upper()}", stats[f"{percentile}_ms"],
+                            unit='Milliseconds', dimensions=dimensions)
 
 
 # Singleton instance
@@ -202,3 +398,23 @@ def get_metrics_publisher() -> MetricsPublisher:
     if _metrics_publisher is None:
         _metrics_publisher = MetricsPublisher()
     return _metrics_publisher
+
+
+def flush_metrics(handler):
+    """
+    Flush buffered metrics when a Lambda handler returns or raises
+    
+    Args:
+        handler: Lambda handler function
+    
+    Returns:
+        Wrapped handler
+    """
+    @wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            if _metrics_publisher is not None:
+                _metrics_publisher.flush()
+    return wrapper
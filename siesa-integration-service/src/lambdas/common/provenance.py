@@ -0,0 +1,165 @@
+"""
+Pipeline payload provenance
+A stage that hands sanitized products to the next one signs them (HMAC over
+a digest of the payload), and the next stage verifies the signature instead
+of sanitizing and HTML-escaping the same data again
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from common.aws_utils import get_secret
+from common.input_validation import sanitize_dict
+from common.timing import timed
+
+logger = logging.getLogger(__name__)
+
+# Event field carrying the signed marker
+PROVENANCE_FIELD = '_provenance'
+PROVENANCE_VERSION = '1'
+
+# Secret holding the HMAC key shared by the pipeline Lambdas
+PROVENANCE_SECRET_ARN = os.environ.get('PROVENANCE_SECRET_ARN', '')
+SIGNING_KEY_FIELD = 'signingKey'
+
+_NOT_LOADED = object()
+_signing_key: Any = _NOT_LOADED
+
+
+def get_signing_key() -> Optional[bytes]:
+    """
+    Get the HMAC key (loaded once per container)
+
+    Returns:
+        Key bytes, or None if provenance is not configured or the secret
+        cannot be read (every stage then sanitizes in full)
+    """
+    global _signing_key
+    if _signing_key is _NOT_LOADED:
+        _signing_key = None
+        if PROVENANCE_SECRET_ARN:
+            try:
+                _signing_key = get_secret(PROVENANCE_SECRET_ARN)[SIGNING_KEY_FIELD].encode('utf-8')
+            except Exception as e:
+                logger.warning(f"Provenance signing disabled, key unavailable: {type(e).__name__}")
+    return _signing_key
+
+
+def payload_digest(payload: Any) -> str:
+    """
+    Digest of a payload's canonical JSON form
+
+    Args:
+        payload: Products list or part manifest
+
+    Returns:
+        SHA-256 hex digest
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _signature(key: bytes, stage: str, field: str, client_id: Any, digest: str) -> str:
+    message = '|'.join([PROVENANCE_VERSION, stage, field, str(client_id), digest])
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def sign_payload(data: Dict[str, Any], field: str, stage: str, key: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Mark data[field] as sanitized by this stage
+
+    A manifest is signed as-is: the part checksums it carries are verified
+    when the parts are read, so they cover the records in S3.
+
+    Args:
+        data: Stage output holding client_id and the payload
+        field: Payload field ('products', 'products_manifest', ...)
+        stage: Signing stage ('extract', 'transform')
+        key: HMAC key (defaults to the pipeline key)
+
+    Returns:
+        data, with the marker added when a key is available
+    """
+    key = key or get_signing_key()
+    if key is None or field not in data:
+        return data
+
+    digest = payload_digest(data[field])
+    data[PROVENANCE_FIELD] = {
+        'version': PROVENANCE_VERSION,
+        'stage': stage,
+        'field': field,
+        'digest': digest,
+        'signature': _signature(key, stage, field, data.get('client_id'), digest)
+    }
+    return data
+
+
+def verified_field(event: Dict[str, Any], stage: str, fields: Sequence[str],
+                   key: Optional[bytes] = None) -> Optional[str]:
+    """
+    Check an event's provenance marker
+
+    Args:
+        event: Raw (unsanitized) Lambda event
+        stage: Stage expected to have signed the payload
+        fields: Payload fields this stage accepts as trusted
+        key: HMAC key (defaults to the pipeline key)
+
+    Returns:
+        The signed payload field, or None if the event is unsigned or the
+        signature does not match
+    """
+    marker = event.get(PROVENANCE_FIELD)
+    key = key or get_signing_key()
+    if key is None or not isinstance(marker, dict):
+        return None
+
+    field = marker.get('field')
+    if (marker.get('version') != PROVENANCE_VERSION or marker.get('stage') != stage
+            or field not in fields or field not in event):
+        logger.warning("Ignoring provenance marker for an unexpected stage or payload")
+        return None
+
+    digest = payload_digest(event[field])
+    expected = _signature(key, stage, field, event.get('client_id'), digest)
+    if not hmac.compare_digest(expected, str(marker.get('signature', ''))):
+        logger.warning("Provenance signature mismatch; sanitizing the full event")
+        return None
+
+    return field
+
+
+@timed('sanitize')
+def sanitize_event(event: Dict[str, Any], stage: str, fields: Sequence[str],
+                   key: Optional[bytes] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Sanitize a Lambda event, skipping a payload signed by an earlier stage
+
+    Control fields (client_id, sync_type, timestamps...) are always
+    sanitized; a verified payload is passed through unchanged.
+
+    Args:
+        event: Raw Lambda event
+        stage: Stage expected to have signed the payload
+        fields: Payload fields this stage accepts as trusted
+        key: HMAC key (defaults to the pipeline key)
+
+    Returns:
+        Tuple of (sanitized event, whether the payload was trusted)
+
+    Raises:
+        ValidationError: If the event is not a dict
+    """
+    field = verified_field(event, stage, fields, key) if isinstance(event, dict) else None
+    if field is None:
+        return sanitize_dict(event), False
+
+    control = {name: value for name, value in event.items() if name not in (field, PROVENANCE_FIELD)}
+    sanitized = sanitize_dict(control)
+    sanitized[field] = event[field]
+    return sanitized, True
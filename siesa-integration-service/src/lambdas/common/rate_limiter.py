@@ -1,37 +1,254 @@
+import logging
+import os
 import time
+import threading
 from collections import deque
+from decimal import Decimal
 from functools import wraps
 
+import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
 
 class RateLimiter:
     def __init__(self, calls, period):
         self.calls = calls
         self.period = period
         self.call_times = deque()
+        # Guards call_times so concurrent workers share one window
+        self._lock = threading.Lock()
 
     def __call__(self, func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            now = time.time()
-            
-            while self.call_times and self.call_times[0] < now - self.period:
-                self.call_times.popleft()
-            
-            if len(self.call_times) >= self.calls:
-                sleep_time = self.period - (now - self.call_times[0])
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-            
-            try:
-                result = func(*args, **kwargs)
-                self.call_times.append(time.time())
-                return result
-            except Exception:
-                # Count failed calls toward rate limit
+            # Reserve a slot in the window before calling. Waiting threads queue
+            # on the lock, so concurrent callers can never overshoot the limit.
+            # Failed calls keep their slot and count toward the rate limit.
+            with self._lock:
+                now = time.time()
+                
+                while self.call_times and self.call_times[0] < now - self.period:
+                    self.call_times.popleft()
+                
+                if len(self.call_times) >= self.calls:
+                    sleep_time = self.period - (now - self.call_times[0])
+                    if sleep_time > 0:
+                        time.sleep(sleep_time)
+                    self.call_times.popleft()
+                
                 self.call_times.append(time.time())
-                raise
+            
+            return func(*args, **kwargs)
         return wrapper
 
 
 def rate_limit(calls, period):
     return RateLimiter(calls, period)
+
+
+# ============================================================================
+# Token buckets with shared state
+# ============================================================================
+
+# Sort key prefix of bucket items in the sync-state table (partition key is tenantId)
+BUCKET_KEY_PREFIX = 'RATE#'
+
+# Bucket items expire once a tenant stops calling an API for this long
+BUCKET_TTL_SECONDS = 24 * 3600
+
+# Conditional writes retried when another container updates the bucket first
+MAX_CONDITIONAL_RETRIES = 5
+
+# Table holding shared buckets ('' keeps buckets in the container's memory)
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE', '')
+
+
+def _refill(tokens, updated_at, capacity, rate, now):
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class InMemoryBucketStore:
+    """Bucket state for one container (shared by its threads)"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, tokens, capacity, rate):
+        """
+        Take tokens from a bucket
+
+        Args:
+            key: (tenant_id, api_name)
+            tokens: Tokens to take
+            capacity: Bucket capacity (burst size)
+            rate: Tokens added per second
+
+        Returns:
+            0 if the tokens were taken, else seconds until enough are available
+        """
+        with self._lock:
+            now = time.time()
+            available, updated_at = self._buckets.get(key, (capacity, now))
+            available = _refill(available, updated_at, capacity, rate, now)
+            if available >= tokens:
+                self._buckets[key] = (available - tokens, now)
+                return 0.0
+            self._buckets[key] = (available, now)
+            return (tokens - available) / rate
+
+
+class DynamoDBBucketStore:
+    """
+    Bucket state shared by every container through DynamoDB
+
+    Each take reads the bucket, refills it for the time elapsed and writes
+    it back on condition that nobody else wrote it in between, so
+    concurrent Lambdas draw from one budget.
+    """
+
+    def __init__(self, table_name, dynamodb_resource=None):
+        """
+        Initialize store
+
+        Args:
+            table_name: Sync-state table name
+            dynamodb_resource: Optional boto3 DynamoDB resource
+        """
+        self.dynamodb = dynamodb_resource or boto3.resource('dynamodb')
+        self.table = self.dynamodb.Table(table_name)
+
+    @staticmethod
+    def _key(key):
+        tenant_id, api_name = key
+        return {'tenantId': tenant_id, 'syncId': f"{BUCKET_KEY_PREFIX}{api_name}"}
+
+    def take(self, key, tokens, capacity, rate):
+        """
+        Take tokens from a bucket (same contract as InMemoryBucketStore.take)
+
+        DynamoDB errors fail open: the call is let through and the
+        container's own limits still apply.
+        """
+        item_key = self._key(key)
+        try:
+            for _ in range(MAX_CONDITIONAL_RETRIES):
+                item = self.table.get_item(Key=item_key, ConsistentRead=True).get('Item')
+                now = time.time()
+                if item:
+                    available = _refill(float(item['tokens']), float(item['updatedAt']), capacity, rate, now)
+                else:
+                    available = capacity
+                
+                if available < tokens:
+                    return (tokens - available) / rate
+                
+                condition = Attr('updatedAt').eq(item['updatedAt']) if item else Attr('syncId').not_exists()
+                try:
+                    self.table.put_item(
+                        Item={
+                            **item_key,
+                            'tokens': Decimal(str(round(available - tokens, 6))),
+                            'updatedAt': Decimal(str(round(now, 6))),
+                            'ttl': int(now) + BUCKET_TTL_SECONDS
+                        },
+                        ConditionExpression=condition
+                    )
+                    return 0.0
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+            # Lost every race: back off for about one token's worth of time
+            return 1.0 / rate
+        except ClientError as e:
+            logger.warning(f"Shared rate limit unavailable for {key[1]}: {e.response['Error']['Code']}")
+            return 0.0
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for one tenant and API
+
+    Unlike RateLimiter, the state lives in a pluggable store, so a
+    DynamoDBBucketStore gives every Lambda container one shared budget.
+    """
+
+    def __init__(self, calls, period, key, store=None):
+        """
+        Initialize bucket
+
+        Args:
+            calls: Calls allowed per period (also the burst size)
+            period: Period in seconds
+            key: (tenant_id, api_name)
+            store: Bucket store (defaults to a private in-memory store)
+
+        Raises:
+            ValueError: If calls or period is not positive
+        """
+        if calls <= 0 or period <= 0:
+            raise ValueError(f"Rate limit must allow calls over a period, got {calls} calls per {period}s")
+        self.capacity = calls
+        self.rate = calls / period
+        self.key = key
+        self.store = store or InMemoryBucketStore()
+
+    def try_acquire(self, tokens=1):
+        """Take tokens without waiting; returns whether they were taken"""
+        return self.store.take(self.key, tokens, self.capacity, self.rate) == 0
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Take tokens, waiting for the bucket to refill if needed
+
+        Args:
+            tokens: Tokens to take
+            timeout: Longest total wait in seconds (None waits as long as needed)
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            TimeoutError: If the tokens are not available within timeout
+        """
+        waited = 0.0
+        while True:
+            wait = self.store.take(self.key, tokens, self.capacity, self.rate)
+            if wait == 0:
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                raise TimeoutError(f"Rate limit for {self.key[1]} not available within {timeout}s")
+            time.sleep(wait)
+            waited += wait
+
+
+_memory_store = InMemoryBucketStore()
+_shared_store = None
+
+
+def get_token_bucket(tenant_id, api_name, calls, period=60):
+    """
+    Get the bucket limiting one tenant's calls to one API
+
+    Buckets are shared through RATE_LIMIT_TABLE when it is set, otherwise
+    by the threads of this container.
+
+    Args:
+        tenant_id: Tenant identifier (already sanitized)
+        api_name: API the calls go to ('kong', 'siesa')
+        calls: Calls allowed per period
+        period: Period in seconds
+
+    Returns:
+        TokenBucket
+    """
+    global _shared_store
+    store = _memory_store
+    if RATE_LIMIT_TABLE:
+        if _shared_store is None:
+            _shared_store = DynamoDBBucketStore(RATE_LIMIT_TABLE)
+        store = _shared_store
+    return TokenBucket(calls, period, (tenant_id, api_name), store=store)
@@ -0,0 +1,196 @@
+"""
+S3 NDJSON part storage
+Streams pipeline records to S3 as newline-delimited JSON parts so large
+catalogs never travel through the Step Functions state payload
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import uuid
+
+from common.aws_utils import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+PART_CONTENT_TYPE = 'application/x-ndjson'
+MANIFEST_VERSION = '1.0'
+
+
+class PartChecksumError(Exception):
+    """Raised when a part read from S3 does not match its manifest checksum"""
+    pass
+
+
+def new_run_prefix(client_id: str, stage: str, run_id: Optional[str] = None) -> str:
+    """
+    Build the S3 key prefix for one pipeline stage of a sync run
+
+    Args:
+        client_id: Client identifier
+        stage: Pipeline stage ('extract', 'transform')
+        run_id: Optional run identifier shared by all stages of a sync
+
+    Returns:
+        Key prefix without trailing slash
+    """
+    if not run_id:
+        run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    return f"runs/{client_id}/{run_id}/{stage}"
+
+
+def encode_records(records: Iterable[Dict[str, Any]]) -> bytes:
+    """
+    Encode records as NDJSON (one compact JSON document per line)
+
+    Args:
+        records: Records to encode
+
+    Returns:
+        NDJSON bytes
+    """
+    return b''.join(
+        json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        for record in records
+    )
+
+
+class PartWriter:
+    """Writes NDJSON parts under one prefix and builds their manifest"""
+
+    def __init__(self, bucket: str, prefix: str, s3_client=None):
+        """
+        Initialize writer
+
+        Args:
+            bucket: Destination S3 bucket
+            prefix: Key prefix for this run/stage
+            s3_client: Optional boto3 S3 client (defaults to the shared client)
+        """
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/')
+        self.s3 = s3_client or get_s3_client()
+        self.parts: List[Dict[str, Any]] = []
+
+    def write_part(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Upload one part
+
+        Args:
+            records: Records in this part (typically one Siesa page)
+
+        Returns:
+            Manifest entry for the part
+        """
+        body = encode_records(records)
+        key = f"{self.prefix}/part-{len(self.parts) + 1:05d}.ndjson"
+
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body,
+            ContentType=PART_CONTENT_TYPE
+        )
+
+        part = {
+            'key': key,
+            'count': len(records),
+            'bytes': len(body),
+            'sha256': hashlib.sha256(body).hexdigest()
+        }
+        self.parts.append(part)
+
+        logger.debug(f"Wrote part s3://{self.bucket}/{key} ({len(records)} records)")
+        return part
+
+    def manifest(self) -> Dict[str, Any]:
+        """
+        Build the manifest describing every part written so far
+
+        Returns:
+            Manifest dict (small enough for the Step Functions payload)
+        """
+        return {
+            'version': MANIFEST_VERSION,
+            'format': 'ndjson',
+            'bucket': self.bucket,
+            'prefix': self.prefix,
+            'parts': list(self.parts),
+            'total_count': sum(part['count'] for part in self.parts)
+        }
+
+
+def iter_part(bucket: str, part: Dict[str, Any], s3_client=None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the records of one part, verifying its checksum
+
+    Records are decoded line by line from the response body, so memory use
+    is bounded by a single record. The checksum is checked once the part is
+    fully read.
+
+    Args:
+        bucket: S3 bucket
+        part: Manifest entry for the part
+        s3_client: Optional boto3 S3 client
+
+    Yields:
+        Records of the part
+
+    Raises:
+        PartChecksumError: If the content does not match the manifest
+    """
+    s3 = s3_client or get_s3_client()
+    response = s3.get_object(Bucket=bucket, Key=part['key'])
+
+    digest = hashlib.sha256()
+    count = 0
+
+    for line in response['Body'].iter_lines():
+        if not line:
+            continue
+        digest.update(line + b'\n')
+        count += 1
+        yield json.loads(line)
+
+    expected = part.get('sha256')
+    if expected and digest.hexdigest() != expected:
+        raise PartChecksumError(f"Checksum mismatch for part {part['key']}")
+    if count != part.get('count', count):
+        raise PartChecksumError(f"Record count mismatch for part {part['key']}: {count} != {part['count']}")
+
+
+def iter_manifest_parts(manifest: Dict[str, Any], s3_client=None) -> Iterator[Iterator[Dict[str, Any]]]:
+    """
+    Iterate over the parts of a manifest, one record generator per part
+
+    Args:
+        manifest: Manifest produced by PartWriter.manifest()
+        s3_client: Optional boto3 S3 client
+
+    Yields:
+        Record generator for each part, in manifest order
+    """
+    for part in manifest.get('parts', []):
+        yield iter_part(manifest['bucket'], part, s3_client)
+
+
+def iter_manifest_records(manifest: Dict[str, Any], s3_client=None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every record of a manifest, in part order
+
+    Args:
+        manifest: Manifest produced by PartWriter.manifest()
+        s3_client: Optional boto3 S3 client
+
+    Yields:
+        Records
+    """
+    for records in iter_manifest_parts(manifest, s3_client):
+        yield from records
+
+
+def is_manifest(value: Any) -> bool:
+    """Check whether a payload value looks like a part manifest"""
+    return isinstance(value, dict) and 'bucket' in value and isinstance(value.get('parts'), list)
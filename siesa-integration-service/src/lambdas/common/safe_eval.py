@@ -1,17 +1,28 @@
 """
 Safe Expression Evaluator with Security Hardening
 Evaluates mathematical and logical expressions safely without using eval()
-Cross-platform compatible (Windows and Linux)
+Cross-platform compatible (Windows and Linux): the time bound is a deadline
+checked during evaluation, so no signals or threads are needed
 """
 
 import ast
 import operator
 import math
+import os
 import re
-import threading
-from typing import Any, Dict, Optional, Set
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Union
 from decimal import Decimal, InvalidOperation
 
+from common import timing
+from common.timing import timed
+
+try:
+    import numpy as np
+except ImportError:  # Packaged with the transformer; without it columns are evaluated per row
+    np = None
+
 
 class SafeEvalError(Exception):
     """Custom exception for safe evaluation errors"""
@@ -32,6 +43,42 @@ MAX_EXPRESSION_LENGTH = 10000
 # Timeout for evaluation (seconds)
 EVAL_TIMEOUT = 1
 
+# Number of compiled expressions kept in memory
+EXPRESSION_CACHE_SIZE = 256
+
+# Evaluation engines for compiled expressions ('closure' or 'interpreter')
+ENGINES = ('closure', 'interpreter')
+SAFE_EVAL_ENGINE = os.environ.get('SAFE_EVAL_ENGINE', 'closure')
+
+# Columns shorter than this are evaluated per row (array setup costs more)
+MIN_VECTOR_ROWS = 32
+
+# Integers beyond this lose precision as float64, so those rows are evaluated per row
+MAX_EXACT_FLOAT_INT = 2 ** 53
+
+# Largest integer power result allowed (bits), so one pow cannot outlive the timeout
+MAX_POW_RESULT_BITS = 4096
+
+
+def _safe_pow(base: Any, exponent: Any, modulo: Any = None) -> Any:
+    """
+    pow() with a bound on the size of integer results
+    
+    Raises:
+        SafeEvalError: If the result would exceed MAX_POW_RESULT_BITS
+    """
+    if (
+        modulo is None
+        and isinstance(base, int) and isinstance(exponent, int)
+        and exponent > 0 and abs(base) > 1
+        and base.bit_length() * exponent > MAX_POW_RESULT_BITS
+    ):
+        raise SafeEvalError(f"Exponent too large: result exceeds {MAX_POW_RESULT_BITS} bits")
+    
+    if modulo is None:
+        return pow(base, exponent)
+    return pow(base, exponent, modulo)
+
 
 # Allowed operators
 SAFE_OPERATORS = {
@@ -41,7 +88,7 @@ SAFE_OPERATORS = {
     ast.Div: operator.truediv,
     ast.FloorDiv: operator.floordiv,
     ast.Mod: operator.mod,
-    ast.Pow: operator.pow,
+    ast.Pow: _safe_pow,
     ast.USub: operator.neg,
     ast.UAdd: operator.pos,
     ast.Eq: operator.eq,
@@ -62,7 +109,7 @@ SAFE_FUNCTIONS = {
     'len': len,
     'sum': sum,
     'sqrt': math.sqrt,
-    'pow': pow,
+    'pow': _safe_pow,
     'ceil': math.ceil,
     'floor': math.floor,
 }
@@ -93,7 +140,7 @@ def _validate_ast_complexity(node: ast.AST, depth: int = 0) -> None:
         _validate_ast_complexity(child, depth + 1)
 
 
-def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
+def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0, deadline: Optional[float] = None) -> Any:
     """
     Recursively evaluate an AST node with depth tracking
     
@@ -101,17 +148,23 @@ def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
         node: AST node to evaluate
         context: Variable context for evaluation
         depth: Current recursion depth
+        deadline: Optional time.monotonic() value after which evaluation stops
         
     Returns:
         Evaluation result
         
     Raises:
         SafeEvalError: If evaluation fails or depth exceeded
+        TimeoutError: If the deadline passes
     """
     # Check depth limit
     if depth > MAX_DEPTH:
         raise SafeEvalError(f"Expression too deep: exceeds maximum depth of {MAX_DEPTH}")
     
+    # Check time limit
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError("Expression evaluation timed out")
+    
     # Numeric constants
     if isinstance(node, ast.Constant):
         if isinstance(node.value, (int, float, bool)):
@@ -133,8 +186,8 @@ def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
         if type(node.op) not in SAFE_OPERATORS:
             raise SafeEvalError(f"Unsupported operator: {type(node.op).__name__}")
         
-        left = _eval_node(node.left, context, depth + 1)
-        right = _eval_node(node.right, context, depth + 1)
+        left = _eval_node(node.left, context, depth + 1, deadline)
+        right = _eval_node(node.right, context, depth + 1, deadline)
         
         # Prevent division by zero
         if isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) and right == 0:
@@ -147,18 +200,18 @@ def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
         if type(node.op) not in SAFE_OPERATORS:
             raise SafeEvalError(f"Unsupported unary operator: {type(node.op).__name__}")
         
-        operand = _eval_node(node.operand, context, depth + 1)
+        operand = _eval_node(node.operand, context, depth + 1, deadline)
         return SAFE_OPERATORS[type(node.op)](operand)
     
     # Comparison operations
     if isinstance(node, ast.Compare):
-        left = _eval_node(node.left, context, depth + 1)
+        left = _eval_node(node.left, context, depth + 1, deadline)
         
         for op, comparator in zip(node.ops, node.comparators):
             if type(op) not in SAFE_OPERATORS:
                 raise SafeEvalError(f"Unsupported comparison: {type(op).__name__}")
             
-            right = _eval_node(comparator, context, depth + 1)
+            right = _eval_node(comparator, context, depth + 1, deadline)
             
             if not SAFE_OPERATORS[type(op)](left, right):
                 return False
@@ -172,7 +225,7 @@ def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
         if type(node.op) not in SAFE_OPERATORS:
             raise SafeEvalError(f"Unsupported boolean operator: {type(node.op).__name__}")
         
-        values = [_eval_node(value, context, depth + 1) for value in node.values]
+        values = [_eval_node(value, context, depth + 1, deadline) for value in node.values]
         
         if isinstance(node.op, ast.And):
             return all(values)
@@ -188,7 +241,7 @@ def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
         if func_name not in SAFE_FUNCTIONS:
             raise SafeEvalError(f"Function not allowed: {func_name}")
         
-        args = [_eval_node(arg, context, depth + 1) for arg in node.args]
+        args = [_eval_node(arg, context, depth + 1, deadline) for arg in node.args]
         
         try:
             return SAFE_FUNCTIONS[func_name](*args)
@@ -198,10 +251,268 @@ def _eval_node(node: ast.AST, context: Dict[str, Any], depth: int = 0) -> Any:
     raise SafeEvalError(f"Unsupported node type: {type(node).__name__}")
 
 
+def _raiser(error: Exception) -> Callable:
+    """Closure that raises a deferred evaluation error"""
+    def fail(context, deadline):
+        raise error
+    return fail
+
+
+def _check_deadline(deadline: Optional[float]) -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError("Expression evaluation timed out")
+
+
+def _compile_node(node: ast.AST) -> Callable:
+    """
+    Compile a validated AST node into a closure ``fn(context, deadline)``
+    
+    Operators and allowed functions are bound when compiling, so evaluation
+    does no type dispatch or table lookups. Anything the interpreter would
+    reject compiles to a closure raising the same error at the same point of
+    evaluation, keeping both engines observably equivalent.
+    
+    The deadline is checked before powers and function calls, the only
+    operations whose cost does not depend on the expression size.
+    
+    Args:
+        node: AST node (already checked by _validate_ast_complexity)
+        
+    Returns:
+        Evaluation closure
+    """
+    # Numeric constants
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (int, float, bool)):
+            value = node.value
+            return lambda context, deadline: value
+        return _raiser(SafeEvalError(f"Unsupported constant type: {type(node.value)}"))
+    
+    # Variables
+    if isinstance(node, ast.Name):
+        name = node.id
+        error = SafeEvalError(f"Undefined variable: {name}")
+        
+        def load(context, deadline):
+            if name in context:
+                return context[name]
+            raise error
+        return load
+    
+    # Binary operations
+    if isinstance(node, ast.BinOp):
+        op_type = type(node.op)
+        if op_type not in SAFE_OPERATORS:
+            return _raiser(SafeEvalError(f"Unsupported operator: {op_type.__name__}"))
+        
+        op = SAFE_OPERATORS[op_type]
+        left = _compile_node(node.left)
+        right = _compile_node(node.right)
+        
+        # Prevent division by zero
+        if op_type in (ast.Div, ast.FloorDiv, ast.Mod):
+            def divide(context, deadline):
+                a = left(context, deadline)
+                b = right(context, deadline)
+                if b == 0:
+                    raise SafeEvalError("Division by zero")
+                return op(a, b)
+            return divide
+        
+        if op_type is ast.Pow:
+            def power(context, deadline):
+                a = left(context, deadline)
+                b = right(context, deadline)
+                _check_deadline(deadline)
+                return op(a, b)
+            return power
+        
+        return lambda context, deadline: op(left(context, deadline), right(context, deadline))
+    
+    # Unary operations
+    if isinstance(node, ast.UnaryOp):
+        op_type = type(node.op)
+        if op_type not in SAFE_OPERATORS:
+            return _raiser(SafeEvalError(f"Unsupported unary operator: {op_type.__name__}"))
+        
+        op = SAFE_OPERATORS[op_type]
+        operand = _compile_node(node.operand)
+        return lambda context, deadline: op(operand(context, deadline))
+    
+    # Comparison operations
+    if isinstance(node, ast.Compare):
+        first = _compile_node(node.left)
+        steps = []
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in SAFE_OPERATORS:
+                steps.append((None, SafeEvalError(f"Unsupported comparison: {type(op).__name__}")))
+                break
+            steps.append((SAFE_OPERATORS[type(op)], _compile_node(comparator)))
+        
+        def compare(context, deadline):
+            left = first(context, deadline)
+            for op, comparator in steps:
+                if op is None:
+                    raise comparator
+                right = comparator(context, deadline)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return compare
+    
+    # Boolean operations (every operand is evaluated, like the interpreter)
+    if isinstance(node, ast.BoolOp):
+        values = [_compile_node(value) for value in node.values]
+        combine = all if isinstance(node.op, ast.And) else any
+        return lambda context, deadline: combine([value(context, deadline) for value in values])
+    
+    # Function calls
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            return _raiser(SafeEvalError("Only simple function calls are allowed"))
+        
+        func_name = node.func.id
+        if func_name not in SAFE_FUNCTIONS:
+            return _raiser(SafeEvalError(f"Function not allowed: {func_name}"))
+        
+        func = SAFE_FUNCTIONS[func_name]
+        args = [_compile_node(arg) for arg in node.args]
+        
+        def call(context, deadline):
+            values = [arg(context, deadline) for arg in args]
+            _check_deadline(deadline)
+            try:
+                return func(*values)
+            except Exception as e:
+                raise SafeEvalError(f"Function call failed: {str(e)}")
+        return call
+    
+    return _raiser(SafeEvalError(f"Unsupported node type: {type(node).__name__}"))
+
+
+def _needs_deadline(node: ast.AST) -> bool:
+    """Check whether a compiled expression has operations that check the deadline"""
+    return any(
+        isinstance(child, ast.Call) or (isinstance(child, ast.BinOp) and isinstance(child.op, ast.Pow))
+        for child in ast.walk(node)
+    )
+
+
+class CompiledExpression:
+    """
+    Expression parsed and validated once, evaluable many times
+    
+    Instances are immutable and safe to share between threads. Evaluation
+    runs in the calling thread with a deadline instead of a watchdog thread,
+    and integer powers are size-limited so no single operation can run much
+    past it.
+    
+    Two engines give the same results and errors:
+    - 'closure' (default): the AST is compiled into nested closures
+    - 'interpreter': the AST is walked by _eval_node on every evaluation
+    """
+    
+    __slots__ = ('expression', 'engine', '_body', '_fn', '_timed')
+    
+    def __init__(self, expression: str, engine: Optional[str] = None):
+        """
+        Parse and validate an expression
+        
+        Args:
+            expression: String expression
+            engine: 'closure' or 'interpreter' (defaults to SAFE_EVAL_ENGINE)
+            
+        Raises:
+            SafeEvalError: If the expression is too long, invalid or unsafe
+        """
+        engine = engine or SAFE_EVAL_ENGINE
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown evaluation engine: {engine}")
+        
+        # Validate expression length
+        if len(expression) > MAX_EXPRESSION_LENGTH:
+            raise SafeEvalError(
+                f"Expression too long: {len(expression)} > {MAX_EXPRESSION_LENGTH}"
+            )
+        
+        # Parse expression
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise SafeEvalError(f"Invalid expression syntax: {str(e)}")
+        
+        # Validate AST complexity and dangerous patterns
+        _validate_ast_complexity(tree.body)
+        
+        self.expression = expression
+        self.engine = engine
+        self._body = tree.body
+        if engine == 'closure':
+            self._fn = _compile_node(tree.body)
+            self._timed = _needs_deadline(tree.body)
+        else:
+            self._fn = None
+            self._timed = True
+    
+    def evaluate(self, context: Optional[Dict[str, Any]] = None, timeout: float = EVAL_TIMEOUT) -> Any:
+        """
+        Evaluate the expression
+        
+        Args:
+            context: Optional dictionary of variables
+            timeout: Time bound in seconds
+            
+        Returns:
+            Evaluation result
+            
+        Raises:
+            SafeEvalError: If evaluation fails
+            TimeoutError: If evaluation times out
+        """
+        deadline = time.monotonic() + timeout if self._timed else None
+        # Timed inline rather than with @timed: a wrapper frame costs as much
+        # as a whole closure-engine evaluation
+        start = time.perf_counter() if timing.TIMING_ENABLED else None
+        
+        try:
+            if self._fn is not None:
+                return self._fn(context or {}, deadline)
+            return _eval_node(self._body, context or {}, 0, deadline)
+        except (SafeEvalError, TimeoutError):
+            raise
+        except RecursionError:
+            raise SafeEvalError("Expression too deep")
+        except Exception as e:
+            raise SafeEvalError(f"Evaluation error: {str(e)}")
+        finally:
+            if start is not None:
+                timing.record('safe_eval', time.perf_counter() - start)
+    
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.expression!r}, engine={self.engine!r})"
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(expression: str) -> CompiledExpression:
+    """
+    Get the compiled form of an expression (LRU-cached by expression text)
+    
+    Args:
+        expression: String expression
+        
+    Returns:
+        CompiledExpression
+        
+    Raises:
+        SafeEvalError: If the expression is too long, invalid or unsafe
+    """
+    return CompiledExpression(expression)
+
+
 def safe_eval(expression: str, context: Optional[Dict[str, Any]] = None) -> Any:
     """
     Safely evaluate a mathematical/logical expression with timeout
-    Cross-platform compatible (uses threading instead of signal)
     
     Args:
         expression: String expression to evaluate
@@ -214,75 +525,29 @@ def safe_eval(expression: str, context: Optional[Dict[str, Any]] = None) -> Any:
         SafeEvalError: If evaluation fails
         TimeoutError: If evaluation times out
     """
-    if context is None:
-        context = {}
-    
-    # Validate expression length
+    # Checked before the cache so oversized expressions are never stored
     if len(expression) > MAX_EXPRESSION_LENGTH:
         raise SafeEvalError(
             f"Expression too long: {len(expression)} > {MAX_EXPRESSION_LENGTH}"
         )
     
-    # Container for result and exception
-    result_container = {'result': None, 'exception': None, 'completed': False}
-    
-    def evaluate():
-        """Inner function to run evaluation in thread"""
-        try:
-            # Parse expression
-            try:
-                tree = ast.parse(expression, mode='eval')
-            except SyntaxError as e:
-                result_container['exception'] = SafeEvalError(f"Invalid expression syntax: {str(e)}")
-                return
-            
-            # Validate AST complexity and dangerous patterns
-            _validate_ast_complexity(tree.body)
-            
-            # Evaluate
-            result_container['result'] = _eval_node(tree.body, context)
-            result_container['completed'] = True
-            
-        except SafeEvalError as e:
-            result_container['exception'] = e
-        except Exception as e:
-            result_container['exception'] = SafeEvalError(f"Evaluation error: {str(e)}")
-    
-    # Create and start evaluation thread
-    eval_thread = threading.Thread(target=evaluate)
-    eval_thread.daemon = True
-    eval_thread.start()
-    
-    # Wait for completion with timeout
-    eval_thread.join(timeout=EVAL_TIMEOUT)
-    
-    # Check if thread is still alive (timeout occurred)
-    if eval_thread.is_alive():
-        raise TimeoutError("Expression evaluation timed out")
-    
-    # Check if exception occurred
-    if result_container['exception']:
-        raise result_container['exception']
-    
-    # Return result
-    if result_container['completed']:
-        return result_container['result']
-    else:
-        raise SafeEvalError("Evaluation failed for unknown reason")
+    return compile_expression(expression).evaluate(context)
 
 
-def apply_transformation_logic(value: Any, logic: str) -> Any:
+def apply_transformation_logic(value: Any, logic: Union[str, CompiledExpression]) -> Any:
     """
     Apply transformation logic safely
     
     Args:
         value: Value to transform
-        logic: Transformation logic expression
+        logic: Transformation logic expression (text or compiled)
     
     Returns:
         Transformed value, or original value if transformation fails
     """
     try:
+        if isinstance(logic, CompiledExpression):
+            return logic.evaluate({"value": value})
         return safe_eval(logic, {"value": value})
     except (SafeEvalError, TimeoutError) as e:
         # Log warning but return original value
@@ -291,21 +556,173 @@ def apply_transformation_logic(value: Any, logic: str) -> Any:
         return value
 
 
-def evaluate_condition(value: Any, condition: str) -> bool:
+def evaluate_condition(value: Any, condition: Union[str, CompiledExpression]) -> bool:
     """
     Evaluate condition safely
     
     Args:
         value: Value to test
-        condition: Condition expression
+        condition: Condition expression (text or compiled)
     
     Returns:
         Boolean result, or False if evaluation fails
     """
     try:
-        result = safe_eval(condition, {"value": value})
+        if isinstance(condition, CompiledExpression):
+            result = condition.evaluate({"value": value})
+        else:
+            result = safe_eval(condition, {"value": value})
         return bool(result)
     except (SafeEvalError, TimeoutError) as e:
         return False
     except Exception as e:
         return False
+
+
+# Operators evaluated over whole columns; they round identically on float64 arrays
+_VECTOR_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+def _vector_kind(node: ast.AST, variable: str, variable_kind: str = 'int') -> Optional[str]:
+    """
+    Infer the scalar result type of an arithmetic-only expression
+    
+    Args:
+        node: AST node
+        variable: Name of the column variable
+        variable_kind: Type of the column values ('int' covers mixed columns)
+        
+    Returns:
+        'int' or 'float', or None if the expression is not arithmetic-only
+    """
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            return None
+        return 'float' if isinstance(node.value, float) else 'int'
+    
+    if isinstance(node, ast.Name):
+        return variable_kind if node.id == variable else None
+    
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _vector_kind(node.operand, variable, variable_kind)
+    
+    if isinstance(node, ast.BinOp) and type(node.op) in _VECTOR_OPERATORS:
+        left = _vector_kind(node.left, variable, variable_kind)
+        right = _vector_kind(node.right, variable, variable_kind)
+        if left is None or right is None:
+            return None
+        if isinstance(node.op, ast.Div) or 'float' in (left, right):
+            return 'float'
+        return 'int'
+    
+    return None
+
+
+def _eval_vector(node: ast.AST, column, variable: str, variable_kind: str, fallback) -> Any:
+    """
+    Evaluate an arithmetic-only AST node over a float64 column
+    
+    Rows where per-row evaluation could differ (division by zero, integer
+    intermediates too large for float64) are flagged in ``fallback``.
+    """
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    
+    if isinstance(node, ast.Name):
+        return column
+    
+    if isinstance(node, ast.UnaryOp):
+        operand = _eval_vector(node.operand, column, variable, variable_kind, fallback)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    
+    left = _eval_vector(node.left, column, variable, variable_kind, fallback)
+    right = _eval_vector(node.right, column, variable, variable_kind, fallback)
+    
+    if isinstance(node.op, ast.Div):
+        fallback |= np.broadcast_to(right == 0, fallback.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.divide(left, right)
+    
+    result = _VECTOR_OPERATORS[type(node.op)](left, right)
+    if _vector_kind(node, variable, variable_kind) == 'int':
+        fallback |= np.broadcast_to(np.abs(result) >= MAX_EXACT_FLOAT_INT, fallback.shape)
+    return result
+
+
+@timed('safe_eval.column')
+def evaluate_column(logic: Union[str, CompiledExpression], values: Sequence[Any],
+                    variable: str = 'value') -> List[Any]:
+    """
+    Apply transformation logic to a whole column of values
+    
+    Arithmetic-only expressions (+, -, *, / over numbers and the column
+    variable) whose result is a float are evaluated with NumPy in one pass.
+    Other expressions, non-numeric values, and rows where float64 arithmetic
+    could differ from Python's are evaluated one row at a time. Results
+    match apply_transformation_logic row by row: rows that cannot be
+    evaluated keep their original value.
+    
+    Args:
+        logic: Transformation logic expression (text or compiled)
+        values: Column of values
+        variable: Name the expression uses for the value
+    
+    Returns:
+        List of transformed values, in input order
+    """
+    try:
+        compiled = logic if isinstance(logic, CompiledExpression) else compile_expression(logic)
+    except (SafeEvalError, TypeError):
+        return list(values)
+    
+    def per_row(value: Any) -> Any:
+        try:
+            return compiled.evaluate({variable: value})
+        except (SafeEvalError, TimeoutError):
+            return value
+    
+    if (
+        np is None
+        or len(values) < MIN_VECTOR_ROWS
+        or _vector_kind(compiled._body, variable) != 'float'
+    ):
+        return [per_row(value) for value in values]
+    
+    value_types = set(map(type, values))
+    variable_kind = 'float' if value_types == {float} else 'int'
+    column = None
+    
+    if value_types <= {int, float}:
+        try:
+            column = np.array(values, dtype=np.float64)
+            # Integers past 2**53 are not exact in float64
+            fallback = np.abs(column) >= MAX_EXACT_FLOAT_INT if int in value_types else np.zeros(len(values), dtype=bool)
+        except OverflowError:
+            column = None
+    
+    if column is None:
+        numeric = np.fromiter(
+            (type(value) in (int, float) and abs(value) < MAX_EXACT_FLOAT_INT for value in values),
+            dtype=bool,
+            count=len(values)
+        )
+        column = np.fromiter(
+            (value if is_numeric else 0.0 for value, is_numeric in zip(values, numeric)),
+            dtype=np.float64,
+            count=len(values)
+        )
+        fallback = ~numeric
+    
+    with np.errstate(over='ignore', invalid='ignore'):
+        vector = _eval_vector(compiled._body, column, variable, variable_kind, fallback)
+        results = np.broadcast_to(vector, column.shape).tolist()
+    
+    for index in np.flatnonzero(fallback).tolist():
+        results[index] = per_row(values[index])
+    
+    return results
@@ -0,0 +1,279 @@
+"""
+Sync state persistence
+Stores per-tenant product content hashes and the sync high-water mark in the
+sync-state DynamoDB table so incremental syncs only load changed products
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+import boto3
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Sort key prefixes inside the sync-state table (partition key is tenantId)
+HASH_KEY_PREFIX = 'HASH#'
+STATE_KEY = 'STATE#products'
+
+# DynamoDB BatchGetItem limit
+BATCH_GET_LIMIT = 100
+
+# Hash items expire if a product is not rewritten for this long
+HASH_TTL_SECONDS = 90 * 24 * 3600
+
+MAX_UNPROCESSED_RETRIES = 5
+
+
+def product_key(product: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the identity used to track a canonical product
+
+    Args:
+        product: Product in canonical model
+
+    Returns:
+        external_id (falling back to id), or None if the product has neither
+    """
+    key = product.get('external_id') or product.get('id')
+    return str(key) if key is not None else None
+
+
+def product_hash(product: Dict[str, Any]) -> str:
+    """
+    Hash the canonical form of a product
+
+    Keys are sorted so the hash only changes when field values change.
+
+    Args:
+        product: Product in canonical model
+
+    Returns:
+        SHA-256 hex digest
+    """
+    canonical = json.dumps(product, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ProductHashStore:
+    """Reads and writes product content hashes for one tenant"""
+
+    def __init__(self, table_name: str, tenant_id: str, dynamodb_resource=None):
+        """
+        Initialize store
+
+        Args:
+            table_name: Sync-state table name
+            tenant_id: Tenant identifier (already sanitized)
+            dynamodb_resource: Optional boto3 DynamoDB resource
+        """
+        self.dynamodb = dynamodb_resource or boto3.resource('dynamodb')
+        self.table_name = table_name
+        self.table = self.dynamodb.Table(table_name)
+        self.tenant_id = tenant_id
+
+    def _key(self, external_id: str) -> Dict[str, str]:
+        return {'tenantId': self.tenant_id, 'syncId': f"{HASH_KEY_PREFIX}{external_id}"}
+
+    def get_hashes(self, external_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Get stored hashes for a set of products
+
+        Args:
+            external_ids: Product identities to look up
+
+        Returns:
+            Dict of external_id -> stored hash (missing products are omitted)
+        """
+        hashes = {}
+        ids = list(dict.fromkeys(external_ids))
+
+        for start in range(0, len(ids), BATCH_GET_LIMIT):
+            request = {
+                self.table_name: {
+                    'Keys': [self._key(external_id) for external_id in ids[start:start + BATCH_GET_LIMIT]],
+                    'ProjectionExpression': 'syncId, contentHash'
+                }
+            }
+
+            for attempt in range(MAX_UNPROCESSED_RETRIES + 1):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    hashes[item['syncId'][len(HASH_KEY_PREFIX):]] = item.get('contentHash')
+
+                request = response.get('UnprocessedKeys') or {}
+                if not request:
+                    break
+                time.sleep(0.05 * (2 ** attempt))
+            else:
+                logger.warning(f"Unprocessed hash lookups remained for tenant {self.tenant_id}; treating them as changed")
+
+        return hashes
+
+    def put_hashes(self, hashes: Dict[str, str]) -> None:
+        """
+        Store hashes for products that were loaded successfully
+
+        Args:
+            hashes: Dict of external_id -> hash
+        """
+        if not hashes:
+            return
+
+        now = datetime.now(timezone.utc)
+        ttl = int(now.timestamp()) + HASH_TTL_SECONDS
+
+        with self.table.batch_writer(overwrite_by_pkeys=['tenantId', 'syncId']) as batch:
+            for external_id, content_hash in hashes.items():
+                batch.put_item(Item={
+                    **self._key(external_id),
+                    'contentHash': content_hash,
+                    'updatedAt': now.isoformat(),
+                    'ttl': ttl
+                })
+
+    def get_high_water_mark(self) -> Optional[str]:
+        """
+        Get the extraction timestamp of the last committed sync
+
+        Returns:
+            ISO timestamp, or None if the tenant never synced
+        """
+        response = self.table.get_item(Key={'tenantId': self.tenant_id, 'syncId': STATE_KEY})
+        return response.get('Item', {}).get('highWaterMark')
+
+    def set_high_water_mark(self, timestamp: str, sync_id: str) -> None:
+        """
+        Persist the high-water mark after a sync is committed
+
+        Args:
+            timestamp: Extraction timestamp of the sync
+            sync_id: Sync identifier
+        """
+        self.table.update_item(
+            Key={'tenantId': self.tenant_id, 'syncId': STATE_KEY},
+            UpdateExpression='SET highWaterMark = :hwm, lastSyncId = :sync_id, updatedAt = :now',
+            ExpressionAttributeValues={
+                ':hwm': timestamp,
+                ':sync_id': sync_id,
+                ':now': datetime.now(timezone.utc).isoformat()
+            }
+        )
+
+
+class DeltaTracker:
+    """
+    Filters a product stream down to new or changed products
+
+    Hashes of the products that pass the filter are kept until commit(),
+    which stores them only for products that were loaded successfully.
+    """
+
+    def __init__(self, store: ProductHashStore, skip_unchanged: bool = True, chunk_size: int = BATCH_GET_LIMIT):
+        """
+        Initialize tracker
+
+        Args:
+            store: Hash store for the tenant
+            skip_unchanged: Drop products whose hash matches the stored one.
+                When False every product passes (full sync) but hashes are
+                still refreshed on commit.
+            chunk_size: Products looked up per BatchGetItem round
+        """
+        self.store = store
+        self.skip_unchanged = skip_unchanged
+        self.chunk_size = chunk_size
+        self.pending: Dict[str, str] = {}
+        self.total = 0
+        self.skipped = 0
+
+    def filter(self, products: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the products that must be sent to the product API
+
+        Args:
+            products: Canonical products (list or stream)
+
+        Yields:
+            New or changed products, in input order
+        """
+        iterator = iter(products)
+
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+
+            keyed = [(product, product_key(product)) for product in chunk]
+            stored = {}
+            if self.skip_unchanged:
+                try:
+                    stored = self.store.get_hashes(key for _, key in keyed if key is not None)
+                except ClientError as e:
+                    logger.warning(f"Hash lookup failed, loading chunk in full: {e.response['Error']['Code']}")
+
+            for product, key in keyed:
+                self.total += 1
+
+                if key is None:
+                    yield product
+                    continue
+
+                content_hash = product_hash(product)
+                if stored.get(key) == content_hash:
+                    self.skipped += 1
+                    continue
+
+                self.pending[key] = content_hash
+                yield product
+
+    def previous_high_water_mark(self) -> Optional[str]:
+        """
+        Get the boundary of the last committed sync
+
+        Failures here are logged but not raised, as the mark is only reported.
+
+        Returns:
+            Extraction timestamp of the last clean sync, or None if there was
+            none or it could not be read
+        """
+        try:
+            return self.store.get_high_water_mark()
+        except ClientError as e:
+            logger.warning(f"Failed to read the high-water mark: {e.response['Error']['Code']}")
+            return None
+
+    def commit(self, failed_keys: Iterable[str], high_water_mark: Optional[str] = None,
+               sync_id: Optional[str] = None) -> int:
+        """
+        Store hashes of successfully loaded products and advance the high-water mark
+
+        Failures here are logged but not raised: the worst outcome is that
+        the same products are sent again on the next sync.
+
+        Args:
+            failed_keys: Identities of products that failed validation or loading
+            high_water_mark: Extraction timestamp of this sync
+            sync_id: Sync identifier
+
+        Returns:
+            Number of hashes stored
+        """
+        failed: Set[str] = {str(key) for key in failed_keys if key is not None}
+        hashes = {key: value for key, value in self.pending.items() if key not in failed}
+
+        try:
+            self.store.put_hashes(hashes)
+            if high_water_mark and not failed:
+                self.store.set_high_water_mark(high_water_mark, sync_id or '')
+        except ClientError as e:
+            logger.error(f"Failed to persist sync state: {e.response['Error']['Code']}")
+            return 0
+
+        return len(hashes)
@@ -0,0 +1,189 @@
+"""
+Hot-path timing spans
+Records how long each pipeline stage takes (Siesa calls, sanitization,
+mapping, expression evaluation, Kong uploads) and summarizes the samples as
+per-stage histograms for the metrics publisher and the handler response
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+# Spans are only recorded when enabled; disabled spans cost one flag check
+TIMING_ENABLED = os.environ.get('TIMING_ENABLED', 'false').lower() == 'true'
+
+# Samples kept per stage for percentiles (count and sum stay exact beyond it)
+MAX_SAMPLES_PER_STAGE = 10000
+
+_lock = threading.Lock()
+_stages: Dict[str, '_StageStats'] = {}
+
+
+class _StageStats:
+    """Count, sum and a uniform reservoir of durations for one stage"""
+
+    __slots__ = ('count', 'total', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples: List[float] = []
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if len(self.samples) < MAX_SAMPLES_PER_STAGE:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES_PER_STAGE:
+                self.samples[slot] = seconds
+
+
+def set_timing_enabled(enabled: bool) -> None:
+    """Turn span recording on or off (TIMING_ENABLED sets the initial state)"""
+    global TIMING_ENABLED
+    TIMING_ENABLED = enabled
+
+
+def record(stage: str, seconds: float) -> None:
+    """
+    Record one duration for a stage
+
+    Args:
+        stage: Stage name ('siesa.get_products', 'transform_product', ...)
+        seconds: Duration in seconds
+    """
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = _StageStats()
+        stats.add(seconds)
+
+
+class _Span:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str):
+    """
+    Time a block of code
+
+    Usage:
+        with span('sanitize'):
+            ...
+
+    Args:
+        stage: Stage name
+
+    Returns:
+        Context manager (a shared no-op when timing is disabled)
+    """
+    return _Span(stage) if TIMING_ENABLED else _NULL_SPAN
+
+
+def timed(stage: str):
+    """
+    Time every call of a function
+
+    Args:
+        stage: Stage name
+
+    Returns:
+        Decorator
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TIMING_ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    # Nearest-rank percentile
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def timing_summary() -> Dict[str, Dict[str, Any]]:
+    """
+    Summarize the recorded spans
+
+    Returns:
+        Dict of stage -> {count, sum_ms, p50_ms, p95_ms, p99_ms}
+    """
+    with _lock:
+        stages = {stage: (stats.count, stats.total, sorted(stats.samples)) for stage, stats in _stages.items()}
+
+    return {
+        stage: {
+            'count': count,
+            'sum_ms': round(total * 1000, 3),
+            'p50_ms': round(_percentile(ordered, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(ordered, 0.99) * 1000, 3)
+        }
+        for stage, (count, total, ordered) in sorted(stages.items())
+    }
+
+
+def reset_timings() -> None:
+    """Drop recorded spans (called at the start of each invocation)"""
+    with _lock:
+        _stages.clear()
+
+
+def report_timings(metrics, client_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Publish the invocation's stage timings and reset them
+
+    Args:
+        metrics: MetricsPublisher
+        client_id: Client identifier
+
+    Returns:
+        Timing summary for the handler response, or None when timing is
+        disabled or nothing was recorded
+    """
+    if not TIMING_ENABLED:
+        return None
+
+    summary = timing_summary()
+    reset_timings()
+    for stage, stats in summary.items():
+        metrics.put_stage_timing(client_id, stage, stats)
+    return summary or None
@@ -0,0 +1,178 @@
+"""
+Warning aggregation
+Counts repeated per-product warnings (missing fields, failed conversions,
+failed validations) by field and reason. Only the first examples of each
+are logged, plus a summary every so many occurrences, so a bad mapping
+costs a few log lines instead of one per product. The full counts go to the
+handler response and metrics.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.logging_utils import StructuredLogger, get_structured_logger
+
+# Occurrences of each (field, reason) logged in full
+WARNING_EXAMPLES = int(os.environ.get('WARNING_EXAMPLES', '5'))
+
+# A summary line is logged each time a (field, reason) count crosses a multiple of this
+WARNING_SUMMARY_INTERVAL = int(os.environ.get('WARNING_SUMMARY_INTERVAL', '10000'))
+
+logger = get_structured_logger(__name__)
+
+
+class WarningAggregator:
+    """
+    Counter of warnings by (field, reason) that logs a bounded sample
+
+    Messages use %-style args and are only formatted for the occurrences
+    that are logged. Safe to share between threads.
+    """
+
+    def __init__(self, log: Optional[StructuredLogger] = None,
+                 max_examples: int = WARNING_EXAMPLES,
+                 summary_interval: int = WARNING_SUMMARY_INTERVAL):
+        """
+        Initialize aggregator
+
+        Args:
+            log: Structured logger for examples and summaries
+            max_examples: Occurrences of each (field, reason) logged in full
+            summary_interval: Occurrences between summary lines (0 disables them)
+        """
+        self.log = log or logger
+        self.max_examples = max(0, max_examples)
+        self.summary_interval = max(0, summary_interval)
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, field: str, reason: str, message: str, *args: Any, count: int = 1) -> None:
+        """
+        Count a warning, logging it if it is one of the first examples
+
+        Args:
+            field: Field the warning is about
+            reason: Kind of warning ('missing_required', 'validation', ...)
+            message: Log message, %-formatted with args when logged
+            *args: Message arguments
+            count: Occurrences being counted at once (the columnar engine
+                counts rows sharing a value together)
+        """
+        if count <= 0:
+            return
+        key = (field, reason)
+        with self._lock:
+            previous = self._counts.get(key, 0)
+            total = self._counts[key] = previous + count
+
+        if previous < self.max_examples:
+            self.log.warning(message, *args, field=field, reason=reason, occurrence=previous + 1)
+
+        interval = self.summary_interval
+        if interval and total > self.max_examples and previous // interval != total // interval:
+            self.log.warning("Repeated warning", field=field, reason=reason, count=total,
+                             logged=min(total, self.max_examples))
+
+    @property
+    def total(self) -> int:
+        """Occurrences counted since the last reset"""
+        with self._lock:
+            return sum(self._counts.values())
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Warning counts
+
+        Returns:
+            List of {field, reason, count}, most frequent first
+        """
+        with self._lock:
+            counts = list(self._counts.items())
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return [{'field': field, 'reason': reason, 'count': count} for (field, reason), count in counts]
+
+    def reset(self) -> None:
+        """Drop the counts"""
+        with self._lock:
+            self._counts.clear()
+
+    def snapshot(self) -> Dict[Tuple[str, str], int]:
+        """Copy of the counts, for restore()"""
+        with self._lock:
+            return dict(self._counts)
+
+    def restore(self, snapshot: Dict[Tuple[str, str], int]) -> None:
+        """
+        Put back counts taken with snapshot()
+
+        Used to drop the warnings of work that is about to be redone, so
+        they are not counted twice.
+        """
+        with self._lock:
+            self._counts = dict(snapshot)
+
+
+# Warnings of the current invocation
+_aggregator = WarningAggregator()
+
+
+def record_warning(field: str, reason: str, message: str, *args: Any, count: int = 1) -> None:
+    """
+    Count a warning of the current invocation (see WarningAggregator.add)
+
+    Usage:
+        record_warning('ean', 'validation', "Validation failed for %s: %s", 'ean', value)
+    """
+    _aggregator.add(field, reason, message, *args, count=count)
+
+
+def warning_summary() -> List[Dict[str, Any]]:
+    """
+    Warning counts of the current invocation
+
+    Returns:
+        List of {field, reason, count}, most frequent first
+    """
+    return _aggregator.summary()
+
+
+def reset_warnings() -> None:
+    """Drop recorded warnings (called at the start of each invocation)"""
+    _aggregator.reset()
+
+
+def snapshot_warnings() -> Dict[Tuple[str, str], int]:
+    """Copy of the current invocation's warning counts (see restore_warnings)"""
+    return _aggregator.snapshot()
+
+
+def restore_warnings(snapshot: Dict[Tuple[str, str], int]) -> None:
+    """Put back warning counts taken with snapshot_warnings"""
+    _aggregator.restore(snapshot)
+
+
+def report_warnings(metrics, client_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Publish and log the invocation's warning counts and reset them
+
+    Args:
+        metrics: MetricsPublisher
+        client_id: Client identifier
+
+    Returns:
+        Warning summary for the handler response, or None when there were no warnings
+    """
+    summary = warning_summary()
+    reset_warnings()
+    if not summary:
+        return None
+
+    for entry in summary:
+        metrics.put_validation_warnings(client_id, entry['field'], entry['reason'], entry['count'])
+    logger.warning(
+        "Warning summary",
+        total=sum(entry['count'] for entry in summary),
+        counts={f"{entry['field']}/{entry['reason']}": entry['count'] for entry in summary}
+    )
+    return summary
@@ -8,8 +8,9 @@ import json
 import os
 import logging
 import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
 import boto3
 from botocore.exceptions import ClientError
 import requests
@@ -20,13 +21,18 @@ from urllib3.util.retry import Retry
 from common.input_validation import (
     sanitize_dict, sanitize_log_message, sanitize_dynamodb_key
 )
-from common.logging_utils import get_safe_logger
-from common.circuit_breaker import circuit_breaker
-from common.rate_limiter import rate_limit
-from common.metrics import get_metrics_publisher
+from common.logging_utils import flush_logs, get_structured_logger
+from common.aws_utils import get_dynamodb_item, get_secret, invalidate_secret
+from common.circuit_breaker import circuit_breaker, client_key
+from common.rate_limiter import TokenBucket, get_token_bucket, rate_limit
+from common.metrics import flush_metrics, get_metrics_publisher
+from common.timing import report_timings, reset_timings, span, timed
+from common.s3_parts import PartWriter, new_run_prefix
+from common.provenance import PROVENANCE_FIELD, sign_payload
+from common.fanout import partition_items, write_partition_items
 
 # Configure logging
-logger = get_safe_logger(__name__)
+logger = get_structured_logger(__name__)
 
 # AWS clients
 dynamodb = boto3.resource('dynamodb')
@@ -34,16 +40,43 @@ secrets_manager = boto3.client('secretsmanager')
 
 # Environment variables
 CLIENTS_TABLE = os.environ.get('DYNAMODB_TABLE', 'clients-config-staging')
+# Number of Siesa pages fetched in parallel (1 = sequential with delay between pages)
+PAGE_CONCURRENCY = int(os.environ.get('SIESA_PAGE_CONCURRENCY', '1'))
+
+# Pagination limits
+PAGE_SIZE = 100  # Siesa max page size
+MAX_PAGES = 1000  # Safety limit to prevent infinite loops
+MAX_PAGE_CONCURRENCY = 16
+
+# Siesa calls per minute for a tenant across all extractor invocations
+# (overridable per client with siesaConfig.rateLimitPerMinute)
+SIESA_RATE_LIMIT_PER_MINUTE = int(os.environ.get('SIESA_RATE_LIMIT_PER_MINUTE', '100'))
+
+# Output mode: 'inline' returns products in the payload, 's3' streams NDJSON parts
+OUTPUT_MODE = os.environ.get('EXTRACT_OUTPUT_MODE', 'inline')
+PIPELINE_BUCKET = os.environ.get('PIPELINE_BUCKET', '')
+# In s3 mode, also split the parts into partitions for the state machine's
+# Distributed Map (see common/fanout.py)
+FANOUT_ENABLED = os.environ.get('FANOUT_ENABLED', 'false').lower() == 'true'
 
 
 class SiesaAPIClient:
     """Client for Siesa ERP API v3 (Cloud)"""
     
-    def __init__(self, base_url: str, credentials: Dict[str, str], id_compania: str, consulta_api: str):
+    def __init__(self, base_url: str, credentials: Dict[str, str], id_compania: str, consulta_api: str,
+                 max_workers: int = 1, rate_limiter: Optional[TokenBucket] = None, tenant_id: str = '',
+                 credentials_secret_arn: Optional[str] = None):
         self.base_url = base_url.rstrip('/')
         self.credentials = credentials
+        # Secret the credentials came from (dropped from the cache if Siesa rejects them)
+        self.credentials_secret_arn = credentials_secret_arn
+        # Circuit breakers are kept per tenant and base URL
+        self.tenant_id = tenant_id
         self.id_compania = id_compania
         self.consulta_api = consulta_api
+        self.max_workers = max(1, min(int(max_workers), MAX_PAGE_CONCURRENCY))
+        # Tenant-wide budget for Siesa calls (on top of this container's own limit)
+        self.rate_limiter = rate_limiter
         self.session = self._create_session()
     
     def _create_session(self) -> requests.Session:
@@ -58,7 +91,8 @@ class SiesaAPIClient:
             allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Size the connection pool so parallel page fetches don't discard connections
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=max(10, self.max_workers))
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
@@ -72,8 +106,9 @@ class SiesaAPIClient:
             "ConniToken": self.credentials.get('conniToken', '')
         }
     
-    @circuit_breaker(failure_threshold=3, recovery_timeout=30)
+    @circuit_breaker(failure_threshold=3, recovery_timeout=30, key=client_key)
     @rate_limit(calls=100, period=60)
+    @timed('siesa.get_products')
     def get_products(self, page: int = 1, page_size: int = 100) -> Dict[str, Any]:
         """
         Get products from Siesa API using ejecutarconsultaestandar
@@ -86,6 +121,9 @@ class SiesaAPIClient:
             Dict with products and pagination info
         """
         try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            
             # Siesa ejecutarconsultaestandar endpoint
             url = f"{self.base_url}/ejecutarconsultaestandar"
             
@@ -101,7 +139,7 @@ class SiesaAPIClient:
             
             headers = self._get_headers()
             
-            logger.info(f"Calling Siesa API: {url} with params: {params}")
+            logger.info("Calling Siesa API", url=url, params=params)
             
             response = self.session.get(url, headers=headers, params=params, timeout=60)
             response.raise_for_status()
@@ -133,10 +171,11 @@ class SiesaAPIClient:
             
             # Sanitize products
             sanitized_products = []
-            for product in products:
-                if isinstance(product, dict):
-                    sanitized_product = sanitize_dict(product)
-                    sanitized_products.append(sanitized_product)
+            with span('sanitize'):
+                for product in products:
+                    if isinstance(product, dict):
+                        sanitized_product = sanitize_dict(product)
+                        sanitized_products.append(sanitized_product)
             
             pagination_info = {
                 'current_page': page,
@@ -145,7 +184,7 @@ class SiesaAPIClient:
                 'has_more': len(sanitized_products) == page_size
             }
             
-            logger.info(f"Retrieved {len(sanitized_products)} products from Siesa (page {page})")
+            logger.info("Retrieved products from Siesa", page=page, count=len(sanitized_products))
             
             return {
                 'products': sanitized_products,
@@ -153,17 +192,69 @@ class SiesaAPIClient:
             }
             
         except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP error from Siesa API (page {page}): {e.response.status_code} - {sanitize_log_message(str(e))}")
+            logger.error("HTTP error from Siesa API", page=page, status_code=e.response.status_code, error=str(e))
             if e.response.status_code == 404:
                 # API or company not found
                 logger.error(f"API not found. Check idCompania ({self.id_compania}) and API name ({self.consulta_api})")
+            elif e.response.status_code in (401, 403) and self.credentials_secret_arn:
+                # The keys may have been rotated: the retry reads them again
+                invalidate_secret(self.credentials_secret_arn)
             raise
         except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed for page {page}: {sanitize_log_message(str(e))}")
+            logger.error("Request failed", page=page, error=str(e))
             raise
         except Exception as e:
             logger.error(f"Failed to get products from Siesa API: {sanitize_log_message(str(e))}")
             raise
+    
+    def get_product_pages(
+        self,
+        start_page: int,
+        page_count: int,
+        page_size: int = 100,
+        executor: Optional[Executor] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a window of consecutive product pages in parallel
+        
+        Each page goes through get_products, so rate limiting and the circuit
+        breaker apply to every request. Results are returned in page order and
+        truncated after the first short page (the last page of the catalog).
+        
+        Args:
+            start_page: First page number of the window (1-indexed)
+            page_count: Number of consecutive pages to fetch
+            page_size: Number of records per page (max 100)
+            executor: Optional executor to reuse across windows
+        
+        Returns:
+            List of get_products results, in page order
+        """
+        owns_executor = executor is None
+        if owns_executor:
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, page_count))
+        
+        futures = [
+            executor.submit(self.get_products, page=page, page_size=page_size)
+            for page in range(start_page, start_page + page_count)
+        ]
+        
+        try:
+            results = []
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                
+                if not result['pagination']['has_more']:
+                    break
+            
+            return results
+        finally:
+            # Pages past the end of the catalog are not needed
+            for future in futures:
+                future.cancel()
+            if owns_executor:
+                executor.shutdown(wait=False)
 
 
 def get_client_config(client_id: str) -> Dict[str, Any]:
@@ -180,18 +271,17 @@ def get_client_config(client_id: str) -> Dict[str, Any]:
         # Sanitize client_id to prevent NoSQL injection
         sanitized_client_id = sanitize_dynamodb_key(client_id)
         
-        table = dynamodb.Table(CLIENTS_TABLE)
-        
-        response = table.get_item(
-            Key={
-                'client_id': sanitized_client_id
-            }
-        )
-        
-        if 'Item' not in response:
-            raise ValueError(f"Client configuration not found for: {sanitize_log_message(client_id)}")
-        
-        config = response['Item']
+        # Served from the warm-invocation cache when fresh
+        try:
+            config = get_dynamodb_item(
+                CLIENTS_TABLE,
+                {'client_id': sanitized_client_id},
+                dynamodb_resource=dynamodb,
+                use_cache=True
+            )
+        except ValueError:
+            # Don't expose the table name and key in the error
+            raise ValueError(f"Client configuration not found for: {sanitize_log_message(client_id)}") from None
         
         # Check if client is enabled
         if not config.get('enabled', False):
@@ -222,13 +312,7 @@ def get_siesa_credentials(secret_arn: str) -> Dict[str, str]:
         Credentials dict with conniKey, conniToken, idCompania
     """
     try:
-        response = secrets_manager.get_secret_value(SecretId=secret_arn)
-        
-        secret_string = response.get('SecretString')
-        if not secret_string:
-            raise ValueError(f"Secret has no string value: {secret_arn}")
-        
-        credentials = json.loads(secret_string)
+        credentials = get_secret(secret_arn, client=secrets_manager)
         
         # Validate required fields
         if not credentials.get('conniKey'):
@@ -247,33 +331,37 @@ def get_siesa_credentials(secret_arn: str) -> Dict[str, str]:
         raise
 
 
-def extract_all_products(client: SiesaAPIClient, sync_type: str) -> List[Dict[str, Any]]:
+def iter_product_pages(client: SiesaAPIClient) -> Iterator[List[Dict[str, Any]]]:
     """
-    Extract all products with pagination
+    Iterate over all product pages, in page order
+    
+    Pages are fetched sequentially unless the client was created with
+    max_workers > 1, in which case windows of pages are fetched in parallel.
     
     Args:
         client: Siesa API client
-        sync_type: 'initial' or 'incremental' (currently both work the same)
     
-    Returns:
-        List of all products
+    Yields:
+        List of products for each page
     """
-    all_products = []
-    page = 1
-    page_size = 100  # Siesa max page size
+    if client.max_workers > 1:
+        yield from _iter_pages_concurrently(client, PAGE_SIZE)
+        return
     
-    logger.info(f"Starting product extraction (sync_type: {sync_type})")
+    page = 1
+    total = 0
     
     while True:
         try:
-            result = client.get_products(page=page, page_size=page_size)
+            result = client.get_products(page=page, page_size=PAGE_SIZE)
             
             products = result['products']
             pagination = result['pagination']
+            total += len(products)
             
-            all_products.extend(products)
+            logger.info("Retrieved page", page=page, count=len(products), total=total)
             
-            logger.info(f"Page {page}: Retrieved {len(products)} products. Total so far: {len(all_products)}")
+            yield products
             
             # Check if there are more pages
             if not pagination['has_more']:
@@ -283,21 +371,118 @@ def extract_all_products(client: SiesaAPIClient, sync_type: str) -> List[Dict[st
             page += 1
             
             # Safety limit to prevent infinite loops
-            if page > 1000:
-                logger.warning("Reached maximum page limit (1000). Stopping pagination.")
+            if page > MAX_PAGES:
+                logger.warning(f"Reached maximum page limit ({MAX_PAGES}). Stopping pagination.")
                 break
             
             # Small delay between pages to avoid rate limiting
             time.sleep(0.5)
                 
         except Exception as e:
-            logger.error(f"Error on page {page}: {str(e)}")
+            logger.error("Error on page", page=page, error=str(e))
             raise
+
+
+def _iter_pages_concurrently(client: SiesaAPIClient, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterate over all product pages fetching windows of client.max_workers pages in parallel
+    
+    Args:
+        client: Siesa API client
+        page_size: Number of records per page
+    
+    Yields:
+        List of products for each page, in page order
+    """
+    page = 1
+    total = 0
+    
+    with ThreadPoolExecutor(max_workers=client.max_workers) as executor:
+        while page <= MAX_PAGES:
+            window = min(client.max_workers, MAX_PAGES - page + 1)
+            
+            try:
+                results = client.get_product_pages(page, window, page_size=page_size, executor=executor)
+            except Exception as e:
+                logger.error("Error on pages", first_page=page, last_page=page + window - 1, error=str(e))
+                raise
+            
+            total += sum(len(result['products']) for result in results)
+            logger.info("Retrieved pages", first_page=page, last_page=page + len(results) - 1, total=total)
+            
+            for result in results:
+                yield result['products']
+            
+            if not results[-1]['pagination']['has_more']:
+                logger.info("No more pages available")
+                break
+            
+            page += window
+        else:
+            logger.warning(f"Reached maximum page limit ({MAX_PAGES}). Stopping pagination.")
+
+
+def extract_all_products(client: SiesaAPIClient, sync_type: str) -> List[Dict[str, Any]]:
+    """
+    Extract all products with pagination
+    
+    Args:
+        client: Siesa API client
+        sync_type: 'initial' or 'incremental' (Siesa has no modified-since filter,
+            so both extract everything; the loader skips unchanged products
+            by content hash)
+    
+    Returns:
+        List of all products
+    """
+    all_products = []
+    
+    logger.info(f"Starting product extraction (sync_type: {sync_type}, concurrency: {client.max_workers})")
+    
+    for products in iter_product_pages(client):
+        all_products.extend(products)
     
     logger.info(f"Extraction complete. Total products: {len(all_products)}")
     return all_products
 
 
+def extract_products_to_s3(
+    client: SiesaAPIClient,
+    sync_type: str,
+    bucket: str,
+    prefix: str
+) -> Dict[str, Any]:
+    """
+    Extract all products streaming each page to S3 as an NDJSON part
+    
+    Only one page is held in memory at a time.
+    
+    Args:
+        client: Siesa API client
+        sync_type: 'initial' or 'incremental' (Siesa has no modified-since filter,
+            so both extract everything; the loader skips unchanged products
+            by content hash)
+        bucket: Destination S3 bucket
+        prefix: Key prefix for the parts
+    
+    Returns:
+        Manifest with part keys, counts and checksums
+    """
+    writer = PartWriter(bucket, prefix)
+    
+    logger.info(f"Starting product extraction to s3://{bucket}/{prefix} (sync_type: {sync_type}, concurrency: {client.max_workers})")
+    
+    for products in iter_product_pages(client):
+        if products:
+            writer.write_part(products)
+    
+    manifest = writer.manifest()
+    logger.info(f"Extraction complete. Total products: {manifest['total_count']}, parts: {len(manifest['parts'])}")
+    return manifest
+
+
+@flush_logs
+@flush_metrics
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda handler for Extractor function
@@ -309,14 +494,21 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     Returns:
         Dict with extracted products and metadata
+    
+    Raises:
+        Exception: On failure in fan-out mode, so Step Functions catches it
+            instead of handing the error body to the Map state
     """
     metrics = get_metrics_publisher()
+    reset_timings()
     start_time = time.time()
     client_id = None
+    fanout = FANOUT_ENABLED
     
     try:
         # Sanitize input event
         event = sanitize_dict(event)
+        fanout = event.get('fanout', FANOUT_ENABLED)
         
         # Extract parameters from event
         client_id = event.get('client_id') or event.get('tenantId')
@@ -336,6 +528,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         credentials_secret = siesa_config.get('credentialsSecretArn')
         id_compania = siesa_config.get('idCompania', '8585')
         consulta_api = siesa_config.get('consultaAPI', 'API_v2_Items')
+        page_concurrency = int(siesa_config.get('pageConcurrency', PAGE_CONCURRENCY))
         
         if not base_url or not credentials_secret:
             raise ValueError(f"Invalid Siesa configuration for client: {sanitize_log_message(client_id)}")
@@ -346,31 +539,68 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         credentials = get_siesa_credentials(credentials_secret)
         
         # Create Siesa API client (NO authentication needed - uses ConniKey/Token)
-        siesa_client = SiesaAPIClient(base_url, credentials, id_compania, consulta_api)
-        
-        # Extract products
-        products = extract_all_products(siesa_client, sync_type)
+        siesa_client = SiesaAPIClient(
+            base_url, credentials, id_compania, consulta_api,
+            max_workers=page_concurrency,
+            tenant_id=sanitize_dynamodb_key(client_id),
+            credentials_secret_arn=credentials_secret,
+            rate_limiter=get_token_bucket(
+                sanitize_dynamodb_key(client_id),
+                'siesa',
+                calls=int(siesa_config.get('rateLimitPerMinute', SIESA_RATE_LIMIT_PER_MINUTE))
+            )
+        )
         
-        # Prepare response
-        extraction_timestamp = datetime.now(timezone.utc).isoformat()
+        output_mode = event.get('output_mode', OUTPUT_MODE)
         product_type = config.get('productType', 'kong')
         
         response_data = {
             'client_id': client_id,
             'product_type': product_type,
-            'products': products,
-            'count': len(products),
-            'sync_type': sync_type,
-            'extraction_timestamp': extraction_timestamp
+            'sync_type': sync_type
         }
         
+        # Extract products
+        if output_mode == 's3':
+            if not PIPELINE_BUCKET:
+                raise ValueError("PIPELINE_BUCKET must be set for s3 output mode")
+            
+            run_prefix = new_run_prefix(sanitize_dynamodb_key(client_id), 'extract')
+            manifest = extract_products_to_s3(siesa_client, sync_type, PIPELINE_BUCKET, run_prefix)
+            count = manifest['total_count']
+            response_data['products_manifest'] = manifest
+            payload_field = 'products_manifest'
+        else:
+            products = extract_all_products(siesa_client, sync_type)
+            count = len(products)
+            response_data['products'] = products
+            payload_field = 'products'
+        
+        # Products were sanitized page by page; let the transformer skip that
+        sign_payload(response_data, payload_field, stage='extract')
+        
+        # Prepare response
+        response_data['count'] = count
+        response_data['extraction_timestamp'] = datetime.now(timezone.utc).isoformat()
+        
+        # Partitions are read by the Map state from S3, not from this payload
+        if output_mode == 's3' and fanout:
+            items = partition_items(response_data)
+            response_data['partitions'] = write_partition_items(items, PIPELINE_BUCKET, run_prefix.rsplit('/', 1)[0])
+            # Each item carries its own signed manifest; the full one only adds payload
+            response_data.pop('products_manifest')
+            response_data.pop(PROVENANCE_FIELD, None)
+        
         # Publish success metrics
         duration = time.time() - start_time
         metrics.put_sync_duration(client_id, duration)
-        metrics.put_records_processed(client_id, len(products), True)
+        metrics.put_records_processed(client_id, count, True)
         metrics.put_api_call_duration(client_id, 'Siesa', duration)
+        timings = report_timings(metrics, client_id)
+        if timings:
+            response_data['timings'] = timings
         
-        logger.info(f"Extraction completed successfully. Products: {len(products)}, Duration: {duration:.2f}s")
+        logger.info(f"Extraction completed successfully. Products: {count}, Duration: {duration:.2f}s")
         
         return {
             'statusCode': 200,
@@ -387,6 +617,9 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             metrics.put_records_processed(client_id, 0, False)
             metrics.put_error_count(client_id, 'ValidationError')
         
+        if fanout:
+            raise
+        
         return {
             'statusCode': 400,
             'body': json.dumps({
@@ -404,6 +637,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             metrics.put_records_processed(client_id, 0, False)
             metrics.put_error_count(client_id, type(e).__name__)
         
+        # Re-raise the exception so Step Functions can catch it
+        if fanout:
+            raise
+        
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -1,7 +1,8 @@
 """Product Adapters Package"""
 
 from .base_adapter import ProductAdapter
+from .batch_sizer import AdaptiveBatchSizer
 from .kong_adapter import KongAdapter
 from .adapter_factory import AdapterFactory
 
-__all__ = ['ProductAdapter', 'KongAdapter', 'AdapterFactory']
+__all__ = ['ProductAdapter', 'AdaptiveBatchSizer', 'KongAdapter', 'AdapterFactory']
@@ -5,13 +5,14 @@ Creates appropriate adapter based on product type
 
 import sys
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from .base_adapter import ProductAdapter
 from .kong_adapter import KongAdapter
 
 # Add parent directory to path to import common module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 from common.logging_utils import get_safe_logger
+from common.rate_limiter import TokenBucket
 
 logger = get_safe_logger(__name__)
 
@@ -20,7 +21,10 @@ class AdapterFactory:
     """Factory to create appropriate adapter based on product type"""
     
     @staticmethod
-    def create_adapter(product_type: str, credentials: Dict[str, Any], config: Dict[str, Any]) -> ProductAdapter:
+    def create_adapter(product_type: str, credentials: Dict[str, Any], config: Dict[str, Any],
+                       max_in_flight: int = 1, max_bisect_calls: int = 0,
+                       rate_limiter: Optional[TokenBucket] = None, tenant_id: str = '',
+                       credentials_secret_arn: Optional[str] = None) -> ProductAdapter:
         """
         Create appropriate adapter based on product type
         
@@ -28,6 +32,11 @@ class AdapterFactory:
             product_type: Product type identifier ('kong', 'KONG_RFID', 'wms', 'WMS')
             credentials: Product API credentials
             config: Product configuration
+            max_in_flight: Batches sent to the product API concurrently
+            max_bisect_calls: Extra calls per failed batch to isolate bad records
+            rate_limiter: Token bucket for the tenant's calls to the product API
+            tenant_id: Tenant the adapter loads for
+            credentials_secret_arn: Secret the credentials came from
         
         Returns:
             ProductAdapter instance
@@ -39,7 +48,9 @@ class AdapterFactory:
         
         if product_type_lower in ['kong', 'kong_rfid']:
             logger.info(f"Creating KongAdapter for product type: {product_type}")
-            return KongAdapter(credentials, config)
+            return KongAdapter(credentials, config, max_in_flight=max_in_flight,
+                               max_bisect_calls=max_bisect_calls, rate_limiter=rate_limiter,
+                               tenant_id=tenant_id, credentials_secret_arn=credentials_secret_arn)
         
         elif product_type_lower in ['wms']:
             # WMS adapter will be implemented in Week 2
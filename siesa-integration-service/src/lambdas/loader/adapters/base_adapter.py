@@ -4,32 +4,81 @@ Abstract base class for all product adapters
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
 import sys
 import os
 
 # Add parent directory to path to import common module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
-from common.logging_utils import get_safe_logger
+from common.logging_utils import get_structured_logger
 from common.input_validation import sanitize_log_message
+from common.rate_limiter import TokenBucket
+from common.timing import span
+from .batch_sizer import AdaptiveBatchSizer
 
-logger = get_safe_logger(__name__)
+logger = get_structured_logger(__name__)
+
+# Batches buffered per chunk when processing a product stream
+STREAM_CHUNK_BATCHES = 10
+
+# Upper bound for concurrent batch uploads per adapter
+MAX_IN_FLIGHT_BATCHES = 16
+
+# Batch rejections caused by the records themselves; only these are bisected
+RECORD_ERROR_STATUS_CODES = (400, 409, 422)
 
 
 class ProductAdapter(ABC):
     """Base adapter interface for all products"""
     
-    def __init__(self, credentials: Dict[str, Any], config: Dict[str, Any]):
+    def __init__(self, credentials: Dict[str, Any], config: Dict[str, Any], max_in_flight: int = 1,
+                 max_bisect_calls: int = 0, rate_limiter: Optional[TokenBucket] = None,
+                 tenant_id: str = '', credentials_secret_arn: Optional[str] = None):
         """
         Initialize adapter
         
         Args:
             credentials: Product API credentials
             config: Product configuration
+            max_in_flight: Batches sent to the product API concurrently
+                (1 sends them one after another)
+            max_bisect_calls: Extra API calls allowed per batch to isolate the
+                records that made it fail (0 fails the whole batch)
+            rate_limiter: Token bucket shared with other invocations for this
+                tenant and product API
+            tenant_id: Tenant the adapter loads for (keys its circuit breakers)
+            credentials_secret_arn: Secret the credentials came from, read
+                again when the product API rejects them
         """
         self.credentials = credentials
+        self.credentials_secret_arn = credentials_secret_arn
         self.config = config
         self.api_client = None
+        self.max_in_flight = max(1, min(int(max_in_flight), MAX_IN_FLIGHT_BATCHES))
+        self.max_bisect_calls = max(0, int(max_bisect_calls))
+        self.rate_limiter = rate_limiter
+        self.tenant_id = tenant_id
+        self._api_client_lock = threading.Lock()
+    
+    def ensure_api_client(self):
+        """
+        Get the API client, creating it on first use
+        
+        Concurrent batches share one client (and so one session, rate limiter
+        and circuit breaker); the lock makes sure only one is created.
+        
+        Returns:
+            API client instance
+        """
+        if self.api_client is None:
+            with self._api_client_lock:
+                if self.api_client is None:
+                    self.api_client = self.get_api_client()
+        return self.api_client
     
     @abstractmethod
     def get_api_client(self):
@@ -80,13 +129,16 @@ class ProductAdapter(ABC):
         """
         pass
     
-    def process_batch(self, canonical_products: List[Dict[str, Any]], batch_size: int = 100) -> Dict[str, Any]:
+    def process_batch(self, canonical_products: List[Dict[str, Any]], batch_size: int = 100,
+                      sizer: Optional[AdaptiveBatchSizer] = None) -> Dict[str, Any]:
         """
         Process products in batches
         
         Args:
             canonical_products: Products in canonical model
             batch_size: Number of products per batch
+            sizer: Adaptive sizer choosing each batch size from the latency and
+                errors of earlier batches (replaces the fixed batch_size)
         
         Returns:
             Summary of processing results
@@ -99,7 +151,8 @@ class ProductAdapter(ABC):
         validation_errors = []
         
         for i, product in enumerate(product_data):
-            is_valid, error_msg = self.validate_product(product)
+            with span('validate_product'):
+                is_valid, error_msg = self.validate_product(product)
             if is_valid:
                 valid_products.append(product)
             else:
@@ -108,55 +161,280 @@ class ProductAdapter(ABC):
                     'product_id': product.get('id') or product.get('external_id'),
                     'error': error_msg
                 })
-                logger.warning(f"Product {i} validation failed: {sanitize_log_message(error_msg)}")
+                logger.warning("Product validation failed", index=i, error=error_msg)
         
-        # Process in batches
+        # Process in batches (up to max_in_flight at a time, results kept in batch order)
         total_processed = 0
         total_success = 0
         total_failed = 0
         batch_results = []
+        record_errors = []
+        failed_product_ids = [error['product_id'] for error in validation_errors if error['product_id']]
         
-        for i in range(0, len(valid_products), batch_size):
-            batch = valid_products[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            try:
-                result = self.load_batch(batch)
-                
-                batch_processed = result.get('records_processed', len(batch))
-                batch_success = result.get('records_success', batch_processed)
-                batch_failed = result.get('records_failed', 0)
-                
-                total_processed += batch_processed
-                total_success += batch_success
-                total_failed += batch_failed
-                
-                batch_results.append({
-                    'batch_number': batch_num,
-                    'processed': batch_processed,
-                    'success': batch_success,
-                    'failed': batch_failed
-                })
-                
-                logger.info(f"Batch {batch_num}: Processed {batch_processed}, Success {batch_success}, Failed {batch_failed}")
-                
-            except Exception as e:
-                logger.error(f"Batch {batch_num} failed: {sanitize_log_message(str(e))}")
-                total_failed += len(batch)
-                batch_results.append({
-                    'batch_number': batch_num,
-                    'processed': len(batch),
-                    'success': 0,
-                    'failed': len(batch),
-                    'error': sanitize_log_message(str(e))
-                })
+        for batch_result, batch_failed_ids in self._load_batches(valid_products, batch_size, sizer):
+            total_processed += batch_result['processed']
+            total_success += batch_result['success']
+            total_failed += batch_result['failed']
+            batch_results.append(batch_result)
+            record_errors.extend(batch_result.get('record_errors', []))
+            failed_product_ids.extend(batch_failed_ids)
         
-        return {
+        results = {
             'total_input': len(canonical_products),
             'total_valid': len(valid_products),
             'total_processed': total_processed,
             'total_success': total_success,
             'total_failed': total_failed + len(validation_errors),
             'validation_errors': validation_errors,
-            'batch_results': batch_results
+            'record_errors': record_errors,
+            'batch_results': batch_results,
+            'failed_product_ids': failed_product_ids
         }
+        if sizer:
+            results['batch_sizing'] = sizer.summary()
+        return results
+    
+    @staticmethod
+    def _numbered_batches(products: List[Dict[str, Any]], batch_size: int,
+                          sizer: Optional[AdaptiveBatchSizer]) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Slice products into numbered batches, sizing each one when it is sent"""
+        start = 0
+        batch_num = 1
+        while start < len(products):
+            size = sizer.size if sizer else batch_size
+            yield batch_num, products[start:start + size]
+            start += size
+            batch_num += 1
+    
+    def _load_batches(self, products: List[Dict[str, Any]], batch_size: int,
+                      sizer: Optional[AdaptiveBatchSizer]) -> List[Tuple[Dict[str, Any], List[Any]]]:
+        """
+        Load all batches, keeping up to max_in_flight of them in flight
+        
+        Batches are cut only when a worker is free, so an adaptive sizer
+        sizes each one from the outcomes seen so far.
+        
+        Returns:
+            _load_numbered_batch outcomes in batch order
+        """
+        batches = self._numbered_batches(products, batch_size, sizer)
+        if self.max_in_flight == 1:
+            return [self._load_numbered_batch(batch_num, batch, sizer) for batch_num, batch in batches]
+        
+        outcomes = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = {
+                executor.submit(self._load_numbered_batch, batch_num, batch, sizer): batch_num
+                for batch_num, batch in islice(batches, self.max_in_flight)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outcomes[pending.pop(future)] = future.result()
+                    for batch_num, batch in islice(batches, 1):
+                        pending[executor.submit(self._load_numbered_batch, batch_num, batch, sizer)] = batch_num
+        
+        return [outcomes[batch_num] for batch_num in sorted(outcomes)]
+    
+    def _load_numbered_batch(self, batch_num: int, batch: List[Dict[str, Any]],
+                             sizer: Optional[AdaptiveBatchSizer] = None) -> Tuple[Dict[str, Any], List[Any]]:
+        """
+        Load one batch and account for its results
+        
+        Args:
+            batch_num: 1-based batch number
+            batch: Products in product-specific format
+            sizer: Adaptive sizer to feed the batch latency and outcome back to
+        
+        Returns:
+            Tuple of (batch_results entry, identities of failed products)
+        """
+        start = time.perf_counter()
+        try:
+            result = self.load_batch(batch)
+            
+            batch_processed = result.get('records_processed', len(batch))
+            batch_success = result.get('records_success', batch_processed)
+            batch_failed = result.get('records_failed', 0)
+            
+            if sizer:
+                # Prefer the API's own latency (excludes rate limiter waits)
+                latency = result.get('duration_seconds', time.perf_counter() - start)
+                sizer.record(len(batch), latency, success=not batch_failed, overloaded=bool(result.get('overloaded')))
+            
+            batch_result = {
+                'batch_number': batch_num,
+                'batch_size': len(batch),
+                'processed': batch_processed,
+                'success': batch_success,
+                'failed': batch_failed
+            }
+            
+            # Batch results do not say which records failed, so the whole batch is
+            # treated as failed unless bisecting it isolates the bad records
+            failed_ids = self._product_ids(batch) if batch_failed else []
+            
+            if batch_failed and self.max_bisect_calls and len(batch) > 1 and self._is_record_error(result):
+                budget = [self.max_bisect_calls]
+                batch_success, failed = self._bisect_batch(batch, result.get('error'), budget)
+                batch_result.update({
+                    'success': batch_success,
+                    'failed': len(failed),
+                    'bisect_calls': self.max_bisect_calls - budget[0],
+                    'record_errors': [
+                        {'product_id': self._product_id(product), 'error': sanitize_log_message(str(error))}
+                        for product, error in failed
+                    ]
+                })
+                failed_ids = self._product_ids([product for product, _ in failed])
+            
+            logger.info("Batch processed", batch=batch_num, processed=batch_processed,
+                        success=batch_result['success'], failed=batch_result['failed'])
+            
+            return batch_result, failed_ids
+            
+        except Exception as e:
+            if sizer:
+                sizer.record(len(batch), time.perf_counter() - start, success=False,
+                             overloaded=isinstance(e, TimeoutError))
+            logger.error("Batch failed", batch=batch_num, error=str(e))
+            return {
+                'batch_number': batch_num,
+                'batch_size': len(batch),
+                'processed': len(batch),
+                'success': 0,
+                'failed': len(batch),
+                'error': sanitize_log_message(str(e))
+            }, self._product_ids(batch)
+    
+    @staticmethod
+    def _is_record_error(result: Dict[str, Any]) -> bool:
+        """Whether a failed batch was rejected because of its records (not load or auth)"""
+        return not result.get('overloaded') and result.get('status_code') in RECORD_ERROR_STATUS_CODES
+    
+    def _bisect_batch(self, products: List[Dict[str, Any]], error: Any,
+                      budget: List[int]) -> Tuple[int, List[Tuple[Dict[str, Any], Any]]]:
+        """
+        Retry a rejected batch in halves until the bad records are isolated
+        
+        Each call spends one unit of budget; once it runs out, the records
+        not yet cleared are reported as failed with the last error seen.
+        
+        Args:
+            products: Records rejected together
+            error: Error the product API returned for them
+            budget: Remaining extra calls (shared by the whole recursion)
+        
+        Returns:
+            Tuple of (records loaded, [(failed record, error)])
+        """
+        if len(products) == 1:
+            return 0, [(products[0], error)]
+        
+        success = 0
+        failed = []
+        mid = len(products) // 2
+        first_half_loaded = False
+        
+        for index, half in enumerate((products[:mid], products[mid:])):
+            if index == 1 and first_half_loaded:
+                # The batch failed as a whole, so the bad records are in this half
+                half_success, half_failed = self._bisect_batch(half, error, budget)
+                success += half_success
+                failed.extend(half_failed)
+                continue
+            
+            if budget[0] < 1:
+                failed.extend((product, error) for product in half)
+                continue
+            budget[0] -= 1
+            
+            try:
+                result = self.load_batch(half)
+            except Exception as e:
+                failed.extend((product, e) for product in half)
+                continue
+            
+            if not result.get('records_failed', 0):
+                success += result.get('records_success', len(half))
+                first_half_loaded = index == 0
+            elif self._is_record_error(result):
+                half_success, half_failed = self._bisect_batch(half, result.get('error'), budget)
+                success += half_success
+                failed.extend(half_failed)
+            else:
+                failed.extend((product, result.get('error')) for product in half)
+        
+        return success, failed
+    
+    @staticmethod
+    def _product_id(product: Dict[str, Any]) -> Any:
+        """Get the identity of a product-specific record"""
+        return product.get('id') or product.get('external_id')
+    
+    @staticmethod
+    def _product_ids(products: List[Dict[str, Any]]) -> List[Any]:
+        """Get the identities of product-specific records"""
+        return [product.get('id') or product.get('external_id') for product in products
+                if product.get('id') or product.get('external_id')]
+    
+    def process_stream(self, canonical_products: Iterable[Dict[str, Any]], batch_size: int = 100,
+                       sizer: Optional[AdaptiveBatchSizer] = None) -> Dict[str, Any]:
+        """
+        Process a stream of products in bounded chunks
+        
+        Products are pulled from the iterable a chunk at a time and each chunk
+        goes through process_batch, so memory use does not depend on the size
+        of the catalog.
+        
+        Args:
+            canonical_products: Iterable of products in canonical model
+            batch_size: Number of products per batch
+            sizer: Adaptive sizer shared by all chunks (replaces batch_size)
+        
+        Returns:
+            Summary of processing results (same structure as process_batch)
+        """
+        summary = {
+            'total_input': 0,
+            'total_valid': 0,
+            'total_processed': 0,
+            'total_success': 0,
+            'total_failed': 0,
+            'validation_errors': [],
+            'record_errors': [],
+            'batch_results': [],
+            'failed_product_ids': []
+        }
+        
+        iterator = iter(canonical_products)
+        
+        while True:
+            # Chunks must hold enough batches to keep every worker busy
+            chunk_size = (sizer.size if sizer else batch_size) * max(STREAM_CHUNK_BATCHES, self.max_in_flight)
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            
+            offset = summary['total_input']
+            batch_offset = len(summary['batch_results'])
+            results = self.process_batch(chunk, batch_size=batch_size, sizer=sizer)
+            
+            for key in ('total_input', 'total_valid', 'total_processed', 'total_success', 'total_failed'):
+                summary[key] += results[key]
+            
+            summary['failed_product_ids'].extend(results.get('failed_product_ids', []))
+            summary['record_errors'].extend(results.get('record_errors', []))
+            
+            for error in results['validation_errors']:
+                summary['validation_errors'].append({**error, 'index': error['index'] + offset})
+            
+            for batch_result in results['batch_results']:
+                summary['batch_results'].append({
+                    **batch_result,
+                    'batch_number': batch_result['batch_number'] + batch_offset
+                })
+        
+        if sizer:
+            summary['batch_sizing'] = sizer.summary()
+        return summary
@@ -0,0 +1,116 @@
+"""
+Adaptive Batch Sizer
+AIMD sizing of product API batches from observed latency and overload errors
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Recent batch latencies used for the p95 estimate
+LATENCY_WINDOW = 20
+
+
+class AdaptiveBatchSizer:
+    """
+    Additive-increase / multiplicative-decrease batch sizer
+
+    The size grows by a fixed step after every successful batch while the
+    p95 of recent batch latencies stays under the target, holds while it is
+    above, and is halved when the API signals overload (413, 429/5xx after
+    retries, timeouts). Concurrent workers share one sizer.
+    """
+
+    def __init__(self, initial_size: int = 100, min_size: int = 10, max_size: int = 1000,
+                 target_latency_seconds: float = 10.0, increase_step: Optional[int] = None):
+        """
+        Initialize sizer
+
+        Args:
+            initial_size: First batch size
+            min_size: Smallest batch size
+            max_size: Largest batch size
+            target_latency_seconds: p95 batch latency the size may grow under
+            increase_step: Products added per successful batch
+                (defaults to a tenth of the initial size)
+        """
+        self.min_size = max(1, int(min_size))
+        self.max_size = max(self.min_size, int(max_size))
+        self.target_latency_seconds = float(target_latency_seconds)
+        self.initial_size = self._clamp(int(initial_size))
+        self.increase_step = max(1, int(increase_step or self.initial_size // 10))
+
+        self._size = self.initial_size
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._smallest = self._size
+        self._largest = self._size
+        self._decreases = 0
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: int) -> int:
+        return max(self.min_size, min(size, self.max_size))
+
+    @property
+    def size(self) -> int:
+        """Size for the next batch"""
+        return self._size
+
+    def p95_latency(self) -> Optional[float]:
+        """p95 of recent batch latencies in seconds (None before any batch)"""
+        with self._lock:
+            return self._p95()
+
+    def _p95(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def record(self, batch_size: int, latency_seconds: float, success: bool, overloaded: bool = False) -> int:
+        """
+        Feed back the outcome of one batch
+
+        Args:
+            batch_size: Products sent in the batch
+            latency_seconds: Time the product API took for the batch
+            success: Whether the batch was accepted
+            overloaded: Whether the API rejected it for size or load
+
+        Returns:
+            Size for the next batch
+        """
+        with self._lock:
+            if overloaded:
+                # Batches sent before the last decrease report stale overload
+                if batch_size <= self._size:
+                    self._size = self._clamp(self._size // 2)
+                    self._latencies.clear()
+                    self._decreases += 1
+            else:
+                self._latencies.append(latency_seconds)
+                if success and batch_size >= self._size and self._p95() < self.target_latency_seconds:
+                    self._size = self._clamp(self._size + self.increase_step)
+
+            self._smallest = min(self._smallest, self._size)
+            self._largest = max(self._largest, self._size)
+            return self._size
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Effective sizes for the results
+
+        Returns:
+            Dict with initial, final, smallest and largest sizes and the
+            number of decreases
+        """
+        with self._lock:
+            p95 = self._p95()
+            return {
+                'initial_size': self.initial_size,
+                'final_size': self._size,
+                'min_size_used': self._smallest,
+                'max_size_used': self._largest,
+                'decreases': self._decreases,
+                'p95_latency_ms': int(p95 * 1000) if p95 is not None else None
+            }
@@ -5,7 +5,9 @@ Handles integration with Kong RFID backend
 
 import sys
 import os
-from typing import Dict, List, Any, Tuple
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -13,22 +15,94 @@ from .base_adapter import ProductAdapter
 
 # Add parent directory to path to import common module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
-from common.logging_utils import get_safe_logger
+from common.aws_utils import get_secret, invalidate_secret
+from common.logging_utils import get_structured_logger
 from common.input_validation import sanitize_log_message
-from common.circuit_breaker import circuit_breaker
-from common.rate_limiter import rate_limit
+from common.circuit_breaker import circuit_breaker, client_key
+from common.rate_limiter import TokenBucket, rate_limit
+from common.timing import timed
 
-logger = get_safe_logger(__name__)
+logger = get_structured_logger(__name__)
+
+# Responses telling the adaptive batch sizer to send smaller batches
+OVERLOAD_STATUS_CODES = (413, 429)
+
+# Longest wait for the shared rate limit before a batch is failed
+RATE_LIMIT_TIMEOUT = 60
+
+
+class _KongSession:
+    """HTTP session and auth token shared by every client of one Kong user"""
+    
+    def __init__(self, session: requests.Session, pool_size: int):
+        self.session = session
+        self.pool_size = pool_size
+        self.token: Optional[str] = None
+        # Serializes logins so concurrent workers re-authenticate once
+        self.lock = threading.Lock()
+
+
+# Sessions kept across warm invocations, per (base URL, username)
+_sessions: Dict[Tuple[str, str], _KongSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def clear_sessions() -> None:
+    """Drop cached Kong sessions and tokens"""
+    with _sessions_lock:
+        for shared in _sessions.values():
+            shared.session.close()
+        _sessions.clear()
 
 
 class KongAPIClient:
-    """Client for Kong RFID API"""
+    """
+    Client for Kong RFID API
     
-    def __init__(self, base_url: str, credentials: Dict[str, str]):
+    Clients for the same base URL and username share one HTTP session
+    (and its connection pool) and one auth token for the life of the
+    container, so warm invocations skip the login. A request answered with
+    401 re-authenticates once, with the credentials read again from
+    credentials_secret_arn when given, and is retried.
+    """
+    
+    def __init__(self, base_url: str, credentials: Dict[str, str], pool_size: int = 10,
+                 rate_limiter: Optional[TokenBucket] = None, tenant_id: str = '',
+                 credentials_secret_arn: Optional[str] = None):
         self.base_url = base_url.rstrip('/')
         self.credentials = credentials
-        self.session = self._create_session()
-        self.token = None
+        self.credentials_secret_arn = credentials_secret_arn
+        # Circuit breakers are kept per tenant and base URL
+        self.tenant_id = tenant_id
+        self.pool_size = pool_size
+        # Tenant-wide budget for SKU uploads (on top of this container's own limit)
+        self.rate_limiter = rate_limiter
+        self._shared = self._get_shared_session()
+    
+    @property
+    def session(self) -> requests.Session:
+        return self._shared.session
+    
+    @property
+    def token(self) -> Optional[str]:
+        return self._shared.token
+    
+    @token.setter
+    def token(self, value: Optional[str]):
+        self._shared.token = value
+    
+    def _get_shared_session(self) -> _KongSession:
+        key = (self.base_url, self.credentials.get('username') or '')
+        with _sessions_lock:
+            shared = _sessions.get(key)
+            if shared is None:
+                shared = _sessions[key] = _KongSession(self._create_session(), self.pool_size)
+            elif shared.pool_size < self.pool_size:
+                # Grow the pool for a caller with more concurrent uploads
+                shared.session.close()
+                shared.session = self._create_session()
+                shared.pool_size = self.pool_size
+            return shared
     
     def _create_session(self) -> requests.Session:
         """Create requests session with retry logic"""
@@ -42,16 +116,25 @@ class KongAPIClient:
             allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE", "PATCH"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Size the connection pool so concurrent batch uploads don't discard connections
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=max(10, self.pool_size))
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
         return session
     
-    @circuit_breaker(failure_threshold=5, recovery_timeout=60)
+    @circuit_breaker(failure_threshold=5, recovery_timeout=60, key=client_key)
     @rate_limit(calls=100, period=60)
-    def authenticate(self) -> bool:
-        """Authenticate with Kong API (Djoser token-based)"""
+    def authenticate(self, force: bool = False) -> bool:
+        """
+        Authenticate with Kong API (Djoser token-based)
+        
+        Args:
+            force: Log in even if a cached token exists
+        """
+        if self.token and not force:
+            return True
+        
         try:
             auth_url = f"{self.base_url}/auth/token/login/"
             
@@ -73,8 +156,36 @@ class KongAPIClient:
             logger.error(f"Failed to authenticate with Kong API: {sanitize_log_message(str(e))}")
             raise
     
-    @circuit_breaker(failure_threshold=3, recovery_timeout=30)
+    def _reauthenticate(self, rejected_token: Optional[str]) -> None:
+        """Replace a token the API rejected, unless another worker already has"""
+        with self._shared.lock:
+            if self.token == rejected_token:
+                logger.info("Kong token rejected, re-authenticating")
+                if self.credentials_secret_arn:
+                    # The password may have been rotated since the secret was cached
+                    invalidate_secret(self.credentials_secret_arn)
+                    self.credentials = get_secret(self.credentials_secret_arn)
+                self.authenticate(force=True)
+    
+    def _post(self, url: str, payload: Any, timeout: int) -> requests.Response:
+        """POST with the auth token, re-authenticating once on 401"""
+        token = self.token
+        response = self.session.post(url, json=payload, headers=self._auth_headers(token), timeout=timeout)
+        if response.status_code == 401:
+            self._reauthenticate(token)
+            response = self.session.post(url, json=payload, headers=self._auth_headers(self.token), timeout=timeout)
+        return response
+    
+    @staticmethod
+    def _auth_headers(token: Optional[str]) -> Dict[str, str]:
+        return {
+            "Authorization": f"Token {token}",
+            "Content-Type": "application/json"
+        }
+    
+    @circuit_breaker(failure_threshold=3, recovery_timeout=30, key=client_key)
     @rate_limit(calls=50, period=60)
+    @timed('kong.create_or_update_skus')
     def create_or_update_skus(self, skus: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Create or update SKUs in Kong (upsert operation)
@@ -83,18 +194,19 @@ class KongAPIClient:
             skus: List of SKUs in Kong format
         
         Returns:
-            Dict with operation results
+            Dict with operation results, the API latency (duration_seconds)
+            and whether Kong signalled overload (413, 429/5xx, timeouts)
         """
+        start = time.perf_counter()
         try:
-            url = f"{self.base_url}/inventory/skus/"
+            if self.rate_limiter:
+                self.rate_limiter.acquire(timeout=RATE_LIMIT_TIMEOUT)
+                start = time.perf_counter()
             
-            headers = {
-                "Authorization": f"Token {self.token}",
-                "Content-Type": "application/json"
-            }
+            url = f"{self.base_url}/inventory/skus/"
             
             # Kong API supports bulk upsert
-            response = self.session.post(url, json=skus, headers=headers, timeout=120)
+            response = self._post(url, skus, timeout=120)
             response.raise_for_status()
             
             data = response.json()
@@ -104,11 +216,13 @@ class KongAPIClient:
                 'records_processed': len(skus),
                 'records_success': len(skus),
                 'records_failed': 0,
-                'response': data
+                'response': data,
+                'duration_seconds': time.perf_counter() - start
             }
             
         except requests.exceptions.HTTPError as e:
-            logger.error(f"Kong API HTTP error: {e.response.status_code} - {sanitize_log_message(e.response.text)}")
+            status_code = e.response.status_code
+            logger.error("Kong API HTTP error", status_code=status_code, response=e.response.text)
             
             # Try to parse error response
             try:
@@ -121,17 +235,25 @@ class KongAPIClient:
                 'records_processed': len(skus),
                 'records_success': 0,
                 'records_failed': len(skus),
-                'error': error_data
+                'error': error_data,
+                'status_code': status_code,
+                'overloaded': status_code in OVERLOAD_STATUS_CODES or status_code >= 500,
+                'duration_seconds': time.perf_counter() - start
             }
             
         except Exception as e:
-            logger.error(f"Kong API error: {sanitize_log_message(str(e))}")
+            logger.error("Kong API error", error=str(e))
             return {
                 'success': False,
                 'records_processed': len(skus),
                 'records_success': 0,
                 'records_failed': len(skus),
-                'error': sanitize_log_message(str(e))
+                'error': sanitize_log_message(str(e)),
+                # Retries exhausted on 429/5xx, the request timed out or the
+                # tenant's rate limit stayed exhausted
+                'overloaded': isinstance(e, (requests.exceptions.RetryError, requests.exceptions.Timeout,
+                                             TimeoutError)),
+                'duration_seconds': time.perf_counter() - start
             }
 
 
@@ -139,10 +261,12 @@ class KongAdapter(ProductAdapter):
     """Adapter for Kong (RFID) product"""
     
     def get_api_client(self):
-        """Initialize Kong API client"""
+        """Initialize Kong API client (logs in only if no cached token exists)"""
         base_url = self.credentials.get('baseUrl') or self.config.get('baseUrl')
         
-        client = KongAPIClient(base_url, self.credentials)
+        client = KongAPIClient(base_url, self.credentials, pool_size=self.max_in_flight,
+                               rate_limiter=self.rate_limiter, tenant_id=self.tenant_id,
+                               credentials_secret_arn=self.credentials_secret_arn)
         client.authenticate()
         
         return client
@@ -195,7 +319,7 @@ class KongAdapter(ProductAdapter):
             
             kong_skus.append(kong_sku)
         
-        logger.info(f"Transformed {len(canonical_products)} products to Kong SKU format")
+        logger.info("Transformed products to Kong SKU format", count=len(canonical_products))
         return kong_skus
     
     def load_batch(self, products: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -208,10 +332,7 @@ class KongAdapter(ProductAdapter):
         Returns:
             Dict with operation results
         """
-        if not self.api_client:
-            self.api_client = self.get_api_client()
-        
-        result = self.api_client.create_or_update_skus(products)
+        result = self.ensure_api_client().create_or_update_skus(products)
         return result
     
     def validate_product(self, product: Dict[str, Any]) -> Tuple[bool, str]:
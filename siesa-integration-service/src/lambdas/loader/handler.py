@@ -3,11 +3,10 @@ Loader Lambda Function
 Loads transformed data to product APIs using Product Adapter Pattern
 """
 
-import json
 import os
 import logging
 from datetime import datetime, timezone
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import boto3
 from botocore.exceptions import ClientError
 
@@ -15,10 +14,18 @@ from botocore.exceptions import ClientError
 import sys
 # Add parent directory to path to import common module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-from common.input_validation import sanitize_dict, sanitize_log_message, sanitize_dynamodb_key
+from common.input_validation import sanitize_log_message, sanitize_dynamodb_key
 from loader.adapters.adapter_factory import AdapterFactory
-from common.logging_utils import get_safe_logger
-from common.metrics import get_metrics_publisher
+from loader.adapters.batch_sizer import AdaptiveBatchSizer
+from common.logging_utils import flush_logs, get_safe_logger
+from common.aws_utils import get_dynamodb_item, get_secret, invalidate_dynamodb_item
+from common.metrics import flush_metrics, get_metrics_publisher
+from common.timing import report_timings, reset_timings
+from common.s3_parts import iter_manifest_records, is_manifest
+from common.fanout import merge_results, read_map_results
+from common.provenance import sanitize_event
+from common.sync_state import DeltaTracker, ProductHashStore
+from common.rate_limiter import get_token_bucket
 import time
 
 # Configure logging
@@ -31,6 +38,26 @@ secrets_manager = boto3.client('secretsmanager')
 # Environment variables
 CLIENTS_TABLE = os.environ.get('CLIENTS_TABLE', 'siesa-integration-config-dev')
 BATCH_SIZE = int(os.environ.get('BATCH_SIZE', '100'))
+# Batches uploaded concurrently (overridable per client with productConfig.batchConcurrency)
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '1'))
+# Extra calls per rejected batch to isolate the bad records by bisection
+# (overridable per client with productConfig.bisectMaxCalls; 0 fails the whole batch)
+BISECT_MAX_CALLS = int(os.environ.get('BISECT_MAX_CALLS', '0'))
+# Batch uploads per minute for a tenant across all loader invocations
+# (overridable per client with productConfig.rateLimitPerMinute)
+API_RATE_LIMIT_PER_MINUTE = int(os.environ.get('API_RATE_LIMIT_PER_MINUTE', '50'))
+# Adaptive batch sizing: BATCH_SIZE becomes the starting size, then grows while
+# p95 batch latency is under the target and halves on overload (overridable per
+# client with productConfig.adaptiveBatchSize, batchSizeMin, batchSizeMax and
+# batchTargetLatencyMs)
+ADAPTIVE_BATCH_SIZE = os.environ.get('ADAPTIVE_BATCH_SIZE', 'false').lower() == 'true'
+BATCH_SIZE_MIN = int(os.environ.get('BATCH_SIZE_MIN', '10'))
+BATCH_SIZE_MAX = int(os.environ.get('BATCH_SIZE_MAX', '1000'))
+BATCH_TARGET_LATENCY_MS = int(os.environ.get('BATCH_TARGET_LATENCY_MS', '10000'))
+SYNC_STATE_TABLE = os.environ.get('SYNC_STATE_TABLE', '')
+
+# Sync types that record product hashes; only incremental syncs skip unchanged products
+DELTA_SYNC_TYPES = ('initial', 'incremental')
 
 
 def get_client_config(client_id: str) -> Dict[str, Any]:
@@ -47,19 +74,17 @@ def get_client_config(client_id: str) -> Dict[str, Any]:
         # Sanitize client_id to prevent NoSQL injection
         sanitized_client_id = sanitize_dynamodb_key(client_id)
         
-        table = dynamodb.Table(CLIENTS_TABLE)
-        
-        response = table.get_item(
-            Key={
-                'tenantId': sanitized_client_id,
-                'configType': 'PRODUCT_CONFIG'
-            }
-        )
-        
-        if 'Item' not in response:
-            raise ValueError(f"Client configuration not found for: {sanitize_log_message(client_id)}")
-        
-        config = response['Item']
+        # Served from the warm-invocation cache when fresh
+        try:
+            config = get_dynamodb_item(
+                CLIENTS_TABLE,
+                {'tenantId': sanitized_client_id, 'configType': 'PRODUCT_CONFIG'},
+                dynamodb_resource=dynamodb,
+                use_cache=True
+            )
+        except ValueError:
+            # Don't expose the table name and key in the error
+            raise ValueError(f"Client configuration not found for: {sanitize_log_message(client_id)}") from None
         
         logger.info(f"Retrieved configuration for client: {sanitize_log_message(client_id)}")
         return config
@@ -83,13 +108,7 @@ def get_product_credentials(secret_arn: str) -> Dict[str, str]:
         Credentials dict
     """
     try:
-        response = secrets_manager.get_secret_value(SecretId=secret_arn)
-        
-        secret_string = response.get('SecretString')
-        if not secret_string:
-            raise ValueError(f"Secret has no string value: {secret_arn}")
-        
-        credentials = json.loads(secret_string)
+        credentials = get_secret(secret_arn, client=secrets_manager)
         
         logger.info(f"Retrieved product credentials from: {secret_arn}")
         return credentials
@@ -99,6 +118,30 @@ def get_product_credentials(secret_arn: str) -> Dict[str, str]:
         raise
 
 
+def create_batch_sizer(product_config: Dict[str, Any]):
+    """
+    Create the adaptive batch sizer for a client
+    
+    Args:
+        product_config: Client product configuration
+    
+    Returns:
+        AdaptiveBatchSizer, or None when the client uses fixed-size batches
+    """
+    enabled = product_config.get('adaptiveBatchSize', ADAPTIVE_BATCH_SIZE)
+    if isinstance(enabled, str):
+        enabled = enabled.lower() == 'true'
+    if not enabled:
+        return None
+    
+    return AdaptiveBatchSizer(
+        initial_size=BATCH_SIZE,
+        min_size=int(product_config.get('batchSizeMin', BATCH_SIZE_MIN)),
+        max_size=int(product_config.get('batchSizeMax', BATCH_SIZE_MAX)),
+        target_latency_seconds=int(product_config.get('batchTargetLatencyMs', BATCH_TARGET_LATENCY_MS)) / 1000
+    )
+
+
 def update_sync_status(client_id: str, status: str, records_success: int, records_failed: int) -> None:
     """
     Update sync status in DynamoDB with input sanitization
@@ -136,6 +179,7 @@ def update_sync_status(client_id: str, status: str, records_success: int, record
                 ':records': records_success
             }
         )
+        invalidate_dynamodb_item(CLIENTS_TABLE, {'tenantId': sanitized_client_id, 'configType': 'PRODUCT_CONFIG'})
         
         logger.info(f"Updated sync status for client {sanitize_log_message(client_id)}: {status}")
         
@@ -147,6 +191,155 @@ def update_sync_status(client_id: str, status: str, records_success: int, record
         # Don't raise - this is not critical
 
 
+def create_product_adapter(client_id: str, product_type: str, product_config: Dict[str, Any]):
+    """
+    Create the adapter loading a client's products
+    
+    Args:
+        client_id: Client identifier
+        product_type: Product type from the event
+        product_config: Client product configuration
+    
+    Returns:
+        ProductAdapter instance
+    """
+    credentials_secret = product_config.get('credentialsSecretArn')
+    
+    if not credentials_secret:
+        raise ValueError(f"Invalid product configuration for client: {sanitize_log_message(client_id)}")
+    
+    # Get product credentials
+    credentials = get_product_credentials(credentials_secret)
+    
+    tenant_id = sanitize_dynamodb_key(client_id)
+    return AdapterFactory.create_adapter(
+        product_type=product_type,
+        credentials=credentials,
+        config=product_config,
+        max_in_flight=int(product_config.get('batchConcurrency', BATCH_CONCURRENCY)),
+        max_bisect_calls=int(product_config.get('bisectMaxCalls', BISECT_MAX_CALLS)),
+        rate_limiter=get_token_bucket(
+            tenant_id,
+            product_type.lower(),
+            calls=int(product_config.get('rateLimitPerMinute', API_RATE_LIMIT_PER_MINUTE))
+        ),
+        tenant_id=tenant_id,
+        credentials_secret_arn=credentials_secret
+    )
+
+
+def create_delta_tracker(client_id: str, sync_type: Optional[str]) -> Optional[DeltaTracker]:
+    """
+    Create the product hash tracker for a sync
+    
+    Args:
+        client_id: Client identifier
+        sync_type: Sync type from the event
+    
+    Returns:
+        DeltaTracker (skipping unchanged products on incremental syncs), or
+        None when the sync type records no hashes or SYNC_STATE_TABLE is unset
+    """
+    if sync_type not in DELTA_SYNC_TYPES or not SYNC_STATE_TABLE:
+        return None
+    
+    hash_store = ProductHashStore(SYNC_STATE_TABLE, sanitize_dynamodb_key(client_id), dynamodb_resource=dynamodb)
+    delta = DeltaTracker(hash_store, skip_unchanged=(sync_type == 'incremental'))
+    
+    if delta.skip_unchanged:
+        previous = delta.previous_high_water_mark()
+        if previous:
+            logger.info(f"Incremental sync: products unchanged since the sync extracted at {previous} are skipped")
+        else:
+            logger.info("Incremental sync: no clean sync recorded yet, only products with a stored hash can be skipped")
+    
+    return delta
+
+
+def load_products(adapter, canonical_products: List[Dict[str, Any]], canonical_manifest: Optional[Dict[str, Any]],
+                  delta: Optional[DeltaTracker], sizer: Optional[AdaptiveBatchSizer]) -> Dict[str, Any]:
+    """
+    Send products to the product API in batches
+    
+    Args:
+        adapter: Product adapter
+        canonical_products: Products from the event (ignored with a manifest)
+        canonical_manifest: Manifest of NDJSON parts to stream products from
+        delta: Tracker dropping unchanged products, if any
+        sizer: Adaptive batch sizer, if any
+    
+    Returns:
+        Adapter batch results
+    """
+    if canonical_manifest:
+        products_stream = iter_manifest_records(canonical_manifest)
+        if delta:
+            products_stream = delta.filter(products_stream)
+        return adapter.process_stream(products_stream, batch_size=BATCH_SIZE, sizer=sizer)
+    
+    if delta:
+        canonical_products = list(delta.filter(canonical_products))
+    return adapter.process_batch(canonical_products, batch_size=BATCH_SIZE, sizer=sizer)
+
+
+def commit_delta(delta: Optional[DeltaTracker], results: Dict[str, Any], extraction_timestamp: Optional[str],
+                 sync_id: str, partition: Optional[Dict[str, Any]]) -> int:
+    """
+    Store the hashes of the products that were loaded
+    
+    Args:
+        delta: Tracker used for the load, if any
+        results: Adapter batch results
+        extraction_timestamp: Extraction timestamp of the sync
+        sync_id: Sync identifier
+        partition: Partition being loaded, if the sync was fanned out
+    
+    Returns:
+        Number of products skipped as unchanged
+    """
+    if delta is None:
+        return 0
+    
+    # A partition cannot tell whether the whole sync succeeded, so the
+    # high-water mark is left to merge_results_handler
+    delta.commit(
+        results.get('failed_product_ids', []),
+        high_water_mark=extraction_timestamp if partition is None else None,
+        sync_id=sync_id
+    )
+    logger.info(f"Delta sync: {delta.skipped} unchanged of {delta.total} products skipped")
+    return delta.skipped
+
+
+def publish_load_metrics(metrics, client_id: str, product_type: str, response: Dict[str, Any],
+                         duration: float) -> None:
+    """
+    Publish the metrics of a completed load
+    
+    Args:
+        metrics: Metrics publisher
+        client_id: Client identifier
+        product_type: Product type
+        response: Loader response
+        duration: Invocation duration in seconds
+    """
+    metrics.put_sync_duration(client_id, duration)
+    metrics.put_records_processed(client_id, response['records_success'], True)
+    if response['records_failed'] > 0:
+        metrics.put_records_processed(client_id, response['records_failed'], False)
+    metrics.put_api_call_duration(client_id, product_type, duration)
+    if response['records_skipped']:
+        metrics.put_records_skipped(client_id, response['records_skipped'])
+    
+    batch_sizing = response.get('batch_sizing')
+    if batch_sizing:
+        metrics.put_effective_batch_size(client_id, product_type, batch_sizing['final_size'])
+        logger.info(f"Adaptive batch size: {batch_sizing['initial_size']} -> {batch_sizing['final_size']} "
+                    f"({batch_sizing['decreases']} decreases)")
+
+
+@flush_logs
+@flush_metrics
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda handler for Loader function with security improvements
@@ -159,20 +352,25 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         Dict with loading results and summary
     """
     metrics = get_metrics_publisher()
+    reset_timings()
     start_time_metrics = time.time()
     client_id = None
     product_type = None
     
     try:
-        # Sanitize input event
-        event = sanitize_dict(event)
+        # Sanitize input event (products signed by the transformer are already clean)
+        event, _ = sanitize_event(event, stage='transform', fields=('canonical_products', 'canonical_manifest'))
         
         # Extract parameters from event (support both formats)
         client_id = event.get('client_id') or event.get('tenantId')
         product_type = event.get('product_type') or event.get('productType', 'kong')
         canonical_products = event.get('canonical_products', [])
+        canonical_manifest = event.get('canonical_manifest')
         transformation_timestamp = event.get('transformation_timestamp')
         extraction_timestamp = event.get('extraction_timestamp')
+        sync_type = event.get('sync_type')
+        # Set when loading one partition of a fanned-out sync (see common/fanout.py)
+        partition = event.get('partition')
         count = event.get('count', len(canonical_products))
         
         # Generate sync_id for tracking
@@ -181,7 +379,12 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not client_id:
             raise ValueError("Missing required parameter: client_id")
         
-        if not canonical_products:
+        if canonical_manifest is not None and not is_manifest(canonical_manifest):
+            raise ValueError("Invalid canonical_manifest")
+        
+        product_count = canonical_manifest['total_count'] if canonical_manifest else len(canonical_products)
+        
+        if not product_count:
             logger.warning(f"No products to load for client: {sanitize_log_message(client_id)}")
             return {
                 'client_id': client_id,
@@ -191,6 +394,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'records_processed': 0,
                 'records_success': 0,
                 'records_failed': 0,
+                'records_skipped': 0,
                 'failed_records': [],
                 'extraction_timestamp': extraction_timestamp,
                 'transformation_timestamp': transformation_timestamp,
@@ -198,7 +402,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'duration_seconds': 0
             }
         
-        logger.info(f"Starting load for client: {sanitize_log_message(client_id)}, product_type: {product_type}, products: {len(canonical_products)}")
+        logger.info(f"Starting load for client: {sanitize_log_message(client_id)}, product_type: {product_type}, products: {product_count}")
         
         start_time = datetime.now(timezone.utc)
         
@@ -207,23 +411,17 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         # Get product configuration
         product_config = config.get('productConfig', {})
-        credentials_secret = product_config.get('credentialsSecretArn')
-        
-        if not credentials_secret:
-            raise ValueError(f"Invalid product configuration for client: {sanitize_log_message(client_id)}")
-        
-        # Get product credentials
-        credentials = get_product_credentials(credentials_secret)
         
         # Create appropriate adapter using factory
-        adapter = AdapterFactory.create_adapter(
-            product_type=product_type,
-            credentials=credentials,
-            config=product_config
-        )
+        adapter = create_product_adapter(client_id, product_type, product_config)
+        
+        # Track product hashes so incremental syncs only send new or changed products
+        delta = create_delta_tracker(client_id, sync_type)
         
-        # Process products in batches
-        results = adapter.process_batch(canonical_products, batch_size=BATCH_SIZE)
+        # Process products in batches (streamed from S3 parts when given a manifest)
+        results = load_products(adapter, canonical_products, canonical_manifest, delta,
+                                create_batch_sizer(product_config))
+        records_skipped = commit_delta(delta, results, extraction_timestamp, sync_id, partition)
         
         # Calculate duration
         end_time = datetime.now(timezone.utc)
@@ -237,24 +435,17 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             status = 'failed'
         
-        # Update sync status in DynamoDB
-        update_sync_status(
-            client_id=client_id,
-            status=status,
-            records_success=results['total_success'],
-            records_failed=results['total_failed']
-        )
-        
         # Prepare response (format for Step Functions)
         load_timestamp = datetime.now(timezone.utc).isoformat()
         
         # Prepare failed records summary (limit to first 10 for response size)
-        failed_records = []
-        for error in results.get('validation_errors', [])[:10]:
-            failed_records.append({
+        failed_records = [
+            {
                 'id': error.get('product_id', 'unknown'),
                 'error': error.get('error', 'Validation failed')
-            })
+            }
+            for error in (results.get('validation_errors', []) + results.get('record_errors', []))[:10]
+        ]
         
         response = {
             'client_id': client_id,
@@ -264,6 +455,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'records_processed': results['total_processed'],
             'records_success': results['total_success'],
             'records_failed': results['total_failed'],
+            'records_skipped': records_skipped,
             'failed_records': failed_records,
             'extraction_timestamp': extraction_timestamp,
             'transformation_timestamp': transformation_timestamp,
@@ -271,13 +463,26 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'duration_seconds': int(duration_seconds)
         }
         
+        # Update sync status in DynamoDB (for the whole sync once partitions are merged)
+        if partition is None:
+            update_sync_status(
+                client_id=client_id,
+                status=status,
+                records_success=results['total_success'],
+                records_failed=results['total_failed']
+            )
+        else:
+            response['partition'] = partition
+        
+        batch_sizing = results.get('batch_sizing')
+        if batch_sizing:
+            response['batch_sizing'] = batch_sizing
+        
         # Publish success metrics
-        duration = time.time() - start_time_metrics
-        metrics.put_sync_duration(client_id, duration)
-        metrics.put_records_processed(client_id, results['total_success'], True)
-        if results['total_failed'] > 0:
-            metrics.put_records_processed(client_id, results['total_failed'], False)
-        metrics.put_api_call_duration(client_id, product_type, duration)
+        publish_load_metrics(metrics, client_id, product_type, response, time.time() - start_time_metrics)
+        timings = report_timings(metrics, client_id)
+        if timings:
+            response['timings'] = timings
         
         logger.info(f"Load completed. Status: {status}, Success: {results['total_success']}, Failed: {results['total_failed']}, Duration: {duration_seconds}s")
         
@@ -300,3 +505,57 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         # Re-raise the exception so Step Functions can catch it
         raise Exception(f"Loader Lambda failed: {sanitize_log_message(str(e))}")
+
+
+@flush_logs
+def merge_results_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Lambda handler merging the partition results of a fanned-out sync
+    
+    Args:
+        event: Extract output fields (client_id, product_type, sync_type,
+            extraction_timestamp), sync_id, and either map_results (the
+            Distributed Map result writer details: Bucket and Key of its
+            manifest) or results (loader responses)
+        context: Lambda context
+    
+    Returns:
+        Sync summary in the loader response format (see common/fanout.py)
+    """
+    client_id = event.get('client_id') or event.get('tenantId')
+    if not client_id:
+        raise ValueError("Missing required parameter: client_id")
+    
+    map_results = event.get('map_results')
+    if map_results:
+        results, failures = read_map_results(map_results['Bucket'], map_results['Key'])
+    else:
+        results, failures = event.get('results', []), []
+    
+    summary = merge_results(results, failures, sync_id=event.get('sync_id'))
+    summary['client_id'] = client_id
+    summary['product_type'] = summary['product_type'] or event.get('product_type')
+    summary['extraction_timestamp'] = summary['extraction_timestamp'] or event.get('extraction_timestamp')
+    
+    update_sync_status(
+        client_id=client_id,
+        status=summary['status'],
+        records_success=summary['records_success'],
+        records_failed=summary['records_failed']
+    )
+    
+    # Same rule as a single loader run: only a clean sync advances the high-water mark
+    extraction_timestamp = summary['extraction_timestamp']
+    if (summary['status'] == 'success' and extraction_timestamp and SYNC_STATE_TABLE
+            and event.get('sync_type') in DELTA_SYNC_TYPES):
+        hash_store = ProductHashStore(SYNC_STATE_TABLE, sanitize_dynamodb_key(client_id), dynamodb_resource=dynamodb)
+        try:
+            hash_store.set_high_water_mark(extraction_timestamp, summary['sync_id'])
+        except ClientError as e:
+            logger.error(f"Failed to persist sync state: {e.response['Error']['Code']}")
+    
+    partitions = summary['partitions']
+    logger.info(f"Sync merged. Status: {summary['status']}, Success: {summary['records_success']}, "
+                f"Failed: {summary['records_failed']}, Partitions: {partitions['succeeded']}/{partitions['total']}")
+    
+    return summary
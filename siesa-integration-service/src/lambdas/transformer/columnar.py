@@ -0,0 +1,311 @@
+"""
+Columnar transform engine
+Applies compiled field plans one column at a time instead of one product
+at a time. Output matches FieldMapper.transform_product for every product
+and warnings are counted per row; warnings logged inside the type converters
+appear once per distinct value.
+Enabled with TRANSFORM_ENGINE=columnar.
+"""
+
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from common.input_validation import sanitize_string_batch
+from common.safe_eval import evaluate_column
+from common.warning_aggregator import record_warning
+
+# Placeholder for fields a product does not get
+MISSING = object()
+
+# Conversions whose results are mutable (parsed JSON), so every row needs its
+# own. Other conversions, and types kept as they are, give immutable results
+# for the scalars that are shared, so equal inputs share one result
+UNSHARED_TYPES = ('object', 'array')
+
+# Types whose values can key the dictionary encoding directly, when a column
+# holds only one of them (so 1 and True never share a slot)
+SELF_KEYED_TYPES = {str, int, bool}
+
+# Matches the max_length used by the row engine's string conversion
+STRING_MAX_LENGTH = 1000
+
+
+def _value_key(value: Any) -> Optional[Tuple]:
+    """
+    Dictionary-encoding key for a value, or None if it cannot be shared
+
+    Only plain JSON scalars are shared; equal values must also print the
+    same, so ints are kept apart from bools and floats are keyed with their
+    sign (0.0 vs -0.0).
+    """
+    value_type = type(value)
+    if value_type is str or value_type is int or value_type is bool:
+        return (value_type, value)
+    if value_type is float:
+        return (float, value, math.copysign(1.0, value))
+    return None
+
+
+def _encode_column(plan, raw_values: List[Any]) -> Tuple[List[Any], List[Any], List[Any]]:
+    """
+    Dictionary-encode a column
+
+    A column whose values are all of one type among str, int and bool (or
+    None) is keyed by the values themselves, so it is encoded without a
+    Python-level loop.
+    Other columns are keyed with _value_key, and values that cannot be
+    shared get a key of their own.
+
+    Returns:
+        (key of each row, distinct keys, value of each distinct key). Rows
+        without a value have key None, which is not among the distinct keys.
+    """
+    value_types = set(map(type, raw_values))
+    value_types.discard(type(None))
+    if not value_types:
+        return raw_values, [], []
+
+    share = plan.field_type not in UNSHARED_TYPES
+    if share and value_types <= SELF_KEYED_TYPES and len(value_types) <= 1:
+        distinct_values = dict.fromkeys(raw_values)
+        distinct_values.pop(None, None)
+        distinct = list(distinct_values)
+        return raw_values, distinct, distinct
+
+    keys: List[Any] = []
+    values_by_key: Dict[Any, Any] = {}
+    for index, value in enumerate(raw_values):
+        if value is None:
+            keys.append(None)
+            continue
+        key = _value_key(value) if share else None
+        if key is None:
+            key = (None, index)
+        if key not in values_by_key:
+            values_by_key[key] = value
+        keys.append(key)
+    return keys, list(values_by_key), list(values_by_key.values())
+
+
+def _convert_one(plan, value: Any) -> Any:
+    try:
+        return plan.convert(value)
+    except Exception as e:
+        return e
+
+
+def _convert_distinct(plan, values: List[Any]) -> List[Any]:
+    """
+    Convert distinct column values
+
+    Returns:
+        For each value, the converted value or the exception that conversion
+        raised (converters never return exceptions)
+    """
+    if plan.field_type != 'string' or plan.trusted:
+        return [_convert_one(plan, value) for value in values]
+
+    # String columns are sanitized in bulk
+    if set(map(type, values)) <= {str}:
+        return sanitize_string_batch(values, max_length=STRING_MAX_LENGTH)
+
+    texts = []
+    for value in values:
+        try:
+            texts.append(str(value))
+        except Exception:
+            texts.append(None)
+
+    return [
+        _convert_one(plan, value) if text is None else sanitized
+        for value, text, sanitized in zip(values, texts, sanitize_string_batch(texts, max_length=STRING_MAX_LENGTH))
+    ]
+
+
+def _transform_distinct(plan, values: List[Any]) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Apply the plan's transformation to distinct converted values
+
+    Returns:
+        For each value, (result, None) or (original value, error)
+    """
+    if plan.calculation is not None:
+        return [(result, None) for result in evaluate_column(plan.calculation, values)]
+
+    outcomes = []
+    for value in values:
+        try:
+            outcomes.append((plan.transform(value), None))
+        except Exception as e:
+            outcomes.append((value, e))
+    return outcomes
+
+
+def _apply_plan(plan, values: List[Any]) -> Tuple[List[Any], Dict[int, List[Tuple[str, str, Tuple[Any, ...]]]]]:
+    """
+    Convert, validate and transform distinct values
+
+    Returns:
+        (result of each value, MISSING where conversion failed;
+        index -> (reason, message, args) of the value's warnings)
+    """
+    results = _convert_distinct(plan, values)
+    warnings: Dict[int, List[Tuple[str, str, Tuple[Any, ...]]]] = {}
+
+    result_types = set(map(type, results))
+
+    # Conversion failures
+    if any(issubclass(result_type, Exception) for result_type in result_types):
+        for index in [index for index, value in enumerate(results) if isinstance(value, Exception)]:
+            warnings[index] = [
+                ('type_conversion', "Type conversion failed for %s: %s", (plan.canonical_field, str(results[index])))
+            ]
+            results[index] = MISSING
+
+    if plan.pattern is not None:
+        if result_types <= {str}:
+            matches = list(map(plan.pattern.match, results))
+            failed = [index for index, match in enumerate(matches) if match is None] if None in matches else []
+        else:
+            failed = [index for index, value in enumerate(results)
+                      if isinstance(value, str) and not plan.pattern.match(value)]
+        for index in failed:
+            warnings.setdefault(index, []).append(
+                ('validation', "Validation failed for %s: %s does not match %s",
+                 (plan.canonical_field, results[index], plan.pattern.pattern))
+            )
+
+    if plan.transform is not None:
+        indexes = [index for index, value in enumerate(results) if value is not MISSING]
+        transformed = _transform_distinct(plan, [results[index] for index in indexes])
+        for index, (value, error) in zip(indexes, transformed):
+            results[index] = value
+            if error is not None:
+                warnings.setdefault(index, []).append(
+                    ('transformation', "Transformation failed for %s: %s", (plan.canonical_field, str(error)))
+                )
+
+    return results, warnings
+
+
+def transform_column(plan, raw_values: Sequence[Any]) -> List[Any]:
+    """
+    Apply one field plan to a column
+
+    Values are dictionary-encoded: conversion, validation and transformation
+    run once per distinct value (for types with immutable results) and the
+    outcome is shared by every row holding it.
+
+    Args:
+        plan: Compiled field plan
+        raw_values: Siesa values of plan.siesa_field, one per product
+
+    Returns:
+        Canonical values, one per product (MISSING where the field is dropped)
+    """
+    if not isinstance(raw_values, list):
+        raw_values = list(raw_values)
+    keys, distinct_keys, values = _encode_column(plan, raw_values)
+
+    # Rows without a value get the default when the field is required
+    empty_rows = keys.count(None)
+    fill = MISSING
+    if empty_rows and plan.required:
+        record_warning(plan.canonical_field, 'missing_required',
+                       "Missing required field: %s -> %s", plan.siesa_field, plan.canonical_field, count=empty_rows)
+        if plan.has_default and plan.default is not None:
+            fill = plan.default
+            values = values + [fill]
+
+    results, warnings = _apply_plan(plan, values)
+
+    # Every row has a value of its own: the results are the column
+    if len(distinct_keys) == len(keys):
+        for value_warnings in warnings.values():
+            for reason, message, args in value_warnings:
+                record_warning(plan.canonical_field, reason, message, *args)
+        return results
+
+    if warnings:
+        # Count each distinct value's warnings once for all the rows holding it
+        rows_per_key = Counter(keys)
+        for index, value_warnings in warnings.items():
+            count = rows_per_key[distinct_keys[index] if index < len(distinct_keys) else None]
+            for reason, message, args in value_warnings:
+                record_warning(plan.canonical_field, reason, message, *args, count=count)
+
+    table = dict(zip(distinct_keys, results))
+    table[None] = results[-1] if fill is not MISSING else MISSING
+    return list(map(table.__getitem__, keys))
+
+
+def _custom_field_name(siesa_field: str) -> Optional[str]:
+    if siesa_field.startswith('custom:') or siesa_field.startswith('f120_custom_'):
+        return siesa_field.replace('f120_custom_', 'custom:')
+    return None
+
+
+def transform_columnar(mapper, siesa_products: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Transform products column by column
+
+    The extract is read into one column per field plan, each column is
+    transformed as a whole, and canonical records are only assembled at the
+    end. Equivalent to [mapper.transform_product(p) for p in siesa_products].
+
+    Args:
+        mapper: FieldMapper with compiled field plans
+        siesa_products: Products data from Siesa
+
+    Returns:
+        Products in canonical model format, in input order
+    """
+    siesa_fields = set().union(*siesa_products)
+    absent = [None] * len(siesa_products)
+
+    fields = []
+    columns = []
+    for plan in mapper.field_plans:
+        siesa_field = plan.siesa_field
+        if siesa_field in siesa_fields:
+            raw_values = [product.get(siesa_field) for product in siesa_products]
+        else:
+            raw_values = absent
+        column = transform_column(plan, raw_values)
+        # Fields no product gets (e.g. not in this extract) are left out
+        if column.count(MISSING) < len(column):
+            fields.append(plan.canonical_field)
+            columns.append(column)
+
+    # Assemble the fields in plan order, then drop those a product does not
+    # get; deleting keys keeps the order of the others
+    rows = zip(*columns) if columns else ((),) * len(siesa_products)
+    canonical_products = [dict(zip(fields, values)) for values in rows]
+    for field, column in zip(fields, columns):
+        if MISSING in column:
+            for index in [index for index, value in enumerate(column) if value is MISSING]:
+                del canonical_products[index][field]
+
+    # Handle custom fields (fields starting with "custom:")
+    custom_fields = {}
+    for siesa_field in siesa_fields:
+        name = _custom_field_name(siesa_field)
+        if name is not None:
+            custom_fields[siesa_field] = name
+
+    if len(custom_fields) == 1:
+        # Only one: it is added last wherever a product has it
+        [(siesa_field, name)] = custom_fields.items()
+        for siesa_product, canonical_product in zip(siesa_products, canonical_products):
+            if siesa_field in siesa_product:
+                canonical_product[name] = siesa_product[siesa_field]
+    elif custom_fields:
+        # Added in each product's own key order
+        for siesa_product, canonical_product in zip(siesa_products, canonical_products):
+            for siesa_field, value in siesa_product.items():
+                name = custom_fields.get(siesa_field)
+                if name is not None:
+                    canonical_product[name] = value
+
+    return canonical_products
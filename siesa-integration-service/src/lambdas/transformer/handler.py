@@ -6,17 +6,33 @@ Transforms Siesa data to canonical model using field mappings
 import json
 import os
 import logging
+import re
+import threading
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, List, Any, NamedTuple, Optional, Pattern, Tuple
 import boto3
 from botocore.exceptions import ClientError
 
 # Import security utilities
-from common.input_validation import sanitize_dict, sanitize_log_message, sanitize_string
-from common.logging_utils import get_safe_logger
+from common.input_validation import sanitize_log_message, sanitize_string
+from common.logging_utils import flush_logs, get_safe_logger
 # SECURITY FIX: Import safe evaluation functions from safe_eval module
-from common.safe_eval import apply_transformation_logic, evaluate_condition
-from common.metrics import get_metrics_publisher
+from common.safe_eval import (
+    CompiledExpression,
+    SafeEvalError,
+    apply_transformation_logic,
+    compile_expression,
+    evaluate_column,
+    evaluate_condition
+)
+from common.metrics import flush_metrics, get_metrics_publisher
+from common.timing import report_timings, reset_timings, span, timed
+from common.warning_aggregator import (
+    record_warning, report_warnings, reset_warnings, restore_warnings, snapshot_warnings
+)
+from common.s3_parts import PartWriter, iter_manifest_parts, is_manifest
+from common.provenance import sanitize_event, sign_payload
+from transformer.columnar import transform_columnar
 import time
 
 # Configure logging
@@ -27,6 +43,13 @@ s3 = boto3.client('s3')
 
 # Environment variables
 FIELD_MAPPINGS_S3_BUCKET = os.environ.get('FIELD_MAPPINGS_S3_BUCKET', 'siesa-integration-config-dev-224874703567')
+# 'row' maps product by product, 'columnar' maps field by field (see transformer/columnar.py)
+TRANSFORM_ENGINE = os.environ.get('TRANSFORM_ENGINE', 'row')
+# Seconds a loaded mapping is used without asking S3; after that it is
+# revalidated with a conditional GET on its ETag (0 revalidates every time)
+MAPPINGS_CACHE_TTL_SECONDS = int(os.environ.get('MAPPINGS_CACHE_TTL_SECONDS', '300'))
+# Directory of bundled mapping files, read instead of S3 when it has the key
+FIELD_MAPPINGS_DIR = os.environ.get('FIELD_MAPPINGS_DIR', '')
 
 
 # SECURITY FIX: SafeExpressionEvaluator, apply_transformation_logic, and evaluate_condition
@@ -34,15 +57,223 @@ FIELD_MAPPINGS_S3_BUCKET = os.environ.get('FIELD_MAPPINGS_S3_BUCKET', 'siesa-int
 # This eliminates code duplication and ensures consistent security controls
 
 
+def _to_string(value: Any) -> Any:
+    # SECURITY FIX: Use safe conversion and sanitization
+    try:
+        str_value = str(value) if value is not None else ''
+        return sanitize_string(str_value, max_length=1000)
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Type conversion failed for string: {sanitize_log_message(str(e))}")
+        return str(value) if value is not None else ''
+
+
+def _to_sanitized_string(value: Any) -> str:
+    # Input already sanitized (and HTML-escaped) by a signed earlier stage
+    return str(value) if value is not None else ''
+
+
+def _to_integer(value: Any) -> Any:
+    # SECURITY FIX: Safe numeric conversion
+    try:
+        if isinstance(value, str):
+            value = value.replace(',', '.')
+            # Sanitize before conversion
+            sanitized_value = sanitize_string(str(value), max_length=50)
+            float_value = float(sanitized_value)
+            return round(float_value)
+        return round(float(value))
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Type conversion failed for integer: {sanitize_log_message(str(e))}")
+        return value
+
+
+def _to_float(value: Any) -> Any:
+    # SECURITY FIX: Safe float conversion
+    try:
+        if isinstance(value, str):
+            value = value.replace(',', '.')
+            sanitized_value = sanitize_string(str(value), max_length=50)
+            return float(sanitized_value)
+        return float(value)
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Type conversion failed for float: {sanitize_log_message(str(e))}")
+        return value
+
+
+def _to_boolean(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ('true', '1', 'yes', 'si', 's')
+    return bool(value)
+
+
+def _to_object(value: Any) -> Any:
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def _to_array(value: Any) -> Any:
+    if isinstance(value, str):
+        return json.loads(value)
+    if not isinstance(value, list):
+        return [value]
+    return value
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+# Type converters by mapping type; unknown types pass values through
+TYPE_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    'string': _to_string,
+    'number': _to_integer,
+    'integer': _to_integer,
+    'float': _to_float,
+    'boolean': _to_boolean,
+    'object': _to_object,
+    'array': _to_array
+}
+
+
+def _compile_logic(expression: Any):
+    """Compile a transformation expression, or None if it can never evaluate"""
+    try:
+        return compile_expression(expression)
+    except (SafeEvalError, TypeError) as e:
+        logger.warning(f"Invalid transformation expression: {sanitize_log_message(str(e))}")
+        return None
+
+
+def compile_transformation(transformation: Dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    Resolve a named transformation definition into a callable
+    
+    Args:
+        transformation: Transformation definition from the mappings file
+    
+    Returns:
+        Function applying the transformation to a value
+    """
+    trans_type = transformation.get('type')
+    
+    if trans_type == 'format':
+        # Date format transformation
+        if transformation.get('from') == 'YYYY-MM-DD' and transformation.get('to') == 'ISO8601':
+            # Convert to ISO8601
+            def to_iso8601(value: Any) -> Any:
+                if isinstance(value, str) and len(value) == 10:
+                    return f"{value}T00:00:00Z"
+                return value
+            return to_iso8601
+        return _identity
+    
+    elif trans_type == 'calculation':
+        # Mathematical calculation (safe evaluator instead of dangerous eval())
+        logic = _compile_logic(transformation.get('logic'))
+        if logic is None:
+            return _identity
+        return lambda value: apply_transformation_logic(value, logic)
+    
+    elif trans_type == 'lookup':
+        # Lookup table transformation
+        lookup_table = dict(transformation.get('table', {}))
+        return lambda value: lookup_table.get(str(value), value)
+    
+    elif trans_type == 'conditional':
+        # Conditional transformation (safe evaluator instead of dangerous eval())
+        condition = _compile_logic(transformation.get('condition'))
+        true_value = transformation.get('true_value')
+        false_value = transformation.get('false_value')
+        if condition is None:
+            return lambda value: false_value
+        return lambda value: true_value if evaluate_condition(value, condition) else false_value
+    
+    return _identity
+
+
+class FieldPlan(NamedTuple):
+    """Compiled mapping rule for one canonical field"""
+    canonical_field: str
+    siesa_field: Optional[str]
+    field_type: str
+    convert: Callable[[Any], Any]
+    required: bool
+    has_default: bool
+    default: Any
+    pattern: Optional[Pattern]
+    transform: Optional[Callable[[Any], Any]]
+    # Compiled logic of a 'calculation' transformation, evaluated per column in batches
+    calculation: Optional[CompiledExpression] = None
+    # Strings were sanitized by the extractor (signed payload), so are not sanitized again
+    trusted: bool = False
+
+
+def compile_field_plans(mappings: Dict[str, Any], trusted_input: bool = False) -> Tuple[FieldPlan, ...]:
+    """
+    Compile a field mappings file into per-field plans
+    
+    Converters, validation regexes and transformations are resolved once
+    here so transforming a product does no lookups on the mapping config.
+    
+    Args:
+        mappings: Field mappings dict (field-mappings-*.json)
+        trusted_input: Products come from a verified extractor payload
+            (see common/provenance.py); string values are kept as they are
+            instead of being sanitized and escaped a second time
+    
+    Returns:
+        Tuple of field plans, in mapping order
+    """
+    product_mappings = mappings.get('mappings', {}).get('product', {})
+    transformations = mappings.get('transformations', {})
+    defaults = mappings.get('defaults', {})
+    
+    plans = []
+    for canonical_field, mapping_rule in product_mappings.items():
+        validation_pattern = mapping_rule.get('validation')
+        transformation = mapping_rule.get('transformation')
+        definition = transformations.get(transformation, {}) if transformation else {}
+        
+        field_type = mapping_rule.get('type', 'string')
+        convert = TYPE_CONVERTERS.get(field_type, _identity)
+        if trusted_input and field_type == 'string':
+            convert = _to_sanitized_string
+        
+        plans.append(FieldPlan(
+            canonical_field=canonical_field,
+            siesa_field=mapping_rule.get('siesa_field'),
+            field_type=field_type,
+            convert=convert,
+            required=mapping_rule.get('required', False),
+            has_default=canonical_field in defaults,
+            default=defaults.get(canonical_field),
+            pattern=re.compile(validation_pattern) if validation_pattern else None,
+            transform=(
+                compile_transformation(transformations[transformation])
+                if transformation and transformation in transformations else None
+            ),
+            calculation=(
+                _compile_logic(definition.get('logic'))
+                if definition.get('type') == 'calculation' else None
+            ),
+            trusted=trusted_input
+        ))
+    
+    return tuple(plans)
+
+
 class FieldMapper:
     """Handles field mapping and data transformation"""
     
-    def __init__(self, mappings: Dict[str, Any]):
+    def __init__(self, mappings: Dict[str, Any], trusted_input: bool = False):
         self.mappings = mappings
         self.product_mappings = mappings.get('mappings', {}).get('product', {})
         self.transformations = mappings.get('transformations', {})
         self.defaults = mappings.get('defaults', {})
+        self.field_plans = compile_field_plans(mappings, trusted_input=trusted_input)
     
+    @timed('transform_product')
     def transform_product(self, siesa_product: Dict[str, Any]) -> Dict[str, Any]:
         """
         Transform a single Siesa product to canonical model
@@ -53,63 +284,103 @@ class FieldMapper:
         Returns:
             Product in canonical model format
         """
-        canonical_product = {}
-        validation_warnings = []
-        
-        # Apply field mappings
-        for canonical_field, mapping_rule in self.product_mappings.items():
-            siesa_field = mapping_rule.get('siesa_field')
-            field_type = mapping_rule.get('type', 'string')
-            required = mapping_rule.get('required', False)
-            validation_pattern = mapping_rule.get('validation')
-            transformation = mapping_rule.get('transformation')
+        return self._map_product(siesa_product)
+    
+    def transform_batch(self, siesa_products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Transform many Siesa products, evaluating calculations per column
+        
+        Gives the same result as transform_product on each product, but
+        calculation transformations run once over the column of converted
+        values (vectorized when possible, see evaluate_column).
+        
+        Args:
+            siesa_products: Products data from Siesa
+        
+        Returns:
+            Products in canonical model format, in input order
+        """
+        deferred = {plan.canonical_field: [] for plan in self.field_plans if plan.calculation is not None}
+        
+        # Timed per product like transform_product; the column calculations
+        # below are timed as safe_eval.column
+        canonical_products = []
+        for siesa_product in siesa_products:
+            with span('transform_product'):
+                canonical_products.append(self._map_product(siesa_product, deferred or None))
+        if not deferred:
+            return canonical_products
+        
+        for plan in self.field_plans:
+            rows = deferred.get(plan.canonical_field)
+            if not rows:
+                continue
             
+            results = evaluate_column(plan.calculation, [value for _, value in rows])
+            for (canonical_product, _), result in zip(rows, results):
+                canonical_product[plan.canonical_field] = result
+        
+        return canonical_products
+    
+    def _map_product(self, siesa_product: Dict[str, Any],
+                     deferred: Optional[Dict[str, List[Tuple[Dict[str, Any], Any]]]] = None) -> Dict[str, Any]:
+        """
+        Apply the field plans to one product
+        
+        Args:
+            siesa_product: Product data from Siesa
+            deferred: When given, calculation fields are left untransformed and
+                queued here per canonical field as (canonical_product, value)
+        
+        Returns:
+            Product in canonical model format
+        """
+        canonical_product = {}
+        get_value = siesa_product.get
+        
+        # Apply compiled field plans
+        for plan in self.field_plans:
             # Get value from Siesa product
-            value = siesa_product.get(siesa_field)
+            value = get_value(plan.siesa_field)
             
-            # Handle missing required fields
-            if required and value is None:
-                warning = f"Missing required field: {siesa_field} -> {canonical_field}"
-                validation_warnings.append(warning)
-                logger.warning(warning)
+            if value is None:
+                # Skip if value is None and not required
+                if not plan.required:
+                    continue
+                
+                # Handle missing required fields
+                record_warning(plan.canonical_field, 'missing_required',
+                               "Missing required field: %s -> %s", plan.siesa_field, plan.canonical_field)
                 
                 # Use default value if available
-                if canonical_field in self.defaults:
-                    value = self.defaults[canonical_field]
-                else:
+                if not plan.has_default or plan.default is None:
                     continue
-            
-            # Skip if value is None and not required
-            if value is None:
-                continue
+                value = plan.default
             
             # Apply type conversion
             try:
-                value = self._convert_type(value, field_type)
+                value = plan.convert(value)
             except Exception as e:
-                warning = f"Type conversion failed for {canonical_field}: {str(e)}"
-                validation_warnings.append(warning)
-                logger.warning(warning)
+                record_warning(plan.canonical_field, 'type_conversion',
+                               "Type conversion failed for %s: %s", plan.canonical_field, str(e))
                 continue
             
             # Apply validation pattern
-            if validation_pattern and isinstance(value, str):
-                import re
-                if not re.match(validation_pattern, value):
-                    warning = f"Validation failed for {canonical_field}: {value} does not match {validation_pattern}"
-                    validation_warnings.append(warning)
-                    logger.warning(warning)
+            if plan.pattern is not None and isinstance(value, str) and not plan.pattern.match(value):
+                record_warning(plan.canonical_field, 'validation', "Validation failed for %s: %s does not match %s",
+                               plan.canonical_field, value, plan.pattern.pattern)
             
             # Apply transformation if specified
-            if transformation and transformation in self.transformations:
+            if deferred is not None and plan.calculation is not None:
+                deferred[plan.canonical_field].append((canonical_product, value))
+            elif plan.transform is not None:
                 try:
-                    value = self._apply_transformation(value, transformation)
+                    value = plan.transform(value)
                 except Exception as e:
-                    warning = f"Transformation failed for {canonical_field}: {str(e)}"
-                    validation_warnings.append(warning)
-                    logger.warning(warning)
+                    record_warning(plan.canonical_field, 'transformation',
+                                   "Transformation failed for %s: %s", plan.canonical_field, str(e))
             
-            canonical_product[canonical_field] = value
+            canonical_product[plan.canonical_field] = value
         
         # Handle custom fields (fields starting with "custom:")
         for siesa_field, value in siesa_product.items():
@@ -124,120 +395,115 @@ class FieldMapper:
         if value is None:
             return None
         
-        if target_type == 'string':
-            # SECURITY FIX: Use safe conversion and sanitization
-            try:
-                str_value = str(value) if value is not None else ''
-                return sanitize_string(str_value, max_length=1000)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Type conversion failed for string: {sanitize_log_message(str(e))}")
-                return str(value) if value is not None else ''
-        
-        elif target_type in ['number', 'integer']:
-            # SECURITY FIX: Safe numeric conversion
-            try:
-                if isinstance(value, str):
-                    value = value.replace(',', '.')
-                    # Sanitize before conversion
-                    sanitized_value = sanitize_string(str(value), max_length=50)
-                    float_value = float(sanitized_value)
-                    return round(float_value)
-                return round(float(value))
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Type conversion failed for integer: {sanitize_log_message(str(e))}")
-                return value
-        
-        elif target_type == 'float':
-            # SECURITY FIX: Safe float conversion
-            try:
-                if isinstance(value, str):
-                    value = value.replace(',', '.')
-                    sanitized_value = sanitize_string(str(value), max_length=50)
-                    return float(sanitized_value)
-                return float(value)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Type conversion failed for float: {sanitize_log_message(str(e))}")
-                return value
-        
-        elif target_type == 'boolean':
-            if isinstance(value, str):
-                return value.lower() in ('true', '1', 'yes', 'si', 's')
-            return bool(value)
-        
-        elif target_type == 'object':
-            if isinstance(value, str):
-                return json.loads(value)
-            return value
-        
-        elif target_type == 'array':
-            if isinstance(value, str):
-                return json.loads(value)
-            if not isinstance(value, list):
-                return [value]
-            return value
-        
-        else:
-            return value
+        return TYPE_CONVERTERS.get(target_type, _identity)(value)
     
     def _apply_transformation(self, value: Any, transformation_name: str) -> Any:
         """Apply named transformation to value"""
-        transformation = self.transformations.get(transformation_name, {})
-        trans_type = transformation.get('type')
-        
-        if trans_type == 'format':
-            # Date format transformation
-            from_format = transformation.get('from')
-            to_format = transformation.get('to')
-            
-            if from_format == 'YYYY-MM-DD' and to_format == 'ISO8601':
-                # Convert to ISO8601
-                if isinstance(value, str) and len(value) == 10:
-                    return f"{value}T00:00:00Z"
-            
-            return value
-        
-        elif trans_type == 'calculation':
-            # Mathematical calculation
-            logic = transformation.get('logic')
-            # Use safe evaluator instead of dangerous eval()
-            return apply_transformation_logic(value, logic)
-        
-        elif trans_type == 'lookup':
-            # Lookup table transformation
-            lookup_table = transformation.get('table', {})
-            return lookup_table.get(str(value), value)
-        
-        elif trans_type == 'conditional':
-            # Conditional transformation
-            condition = transformation.get('condition')
-            true_value = transformation.get('true_value')
-            false_value = transformation.get('false_value')
-            
-            # Use safe evaluator instead of dangerous eval()
-            if evaluate_condition(value, condition):
-                return true_value
-            else:
-                return false_value
-        
-        return value
+        return compile_transformation(self.transformations.get(transformation_name, {}))(value)
+
+
+class _CachedMappings(NamedTuple):
+    mappings: Dict[str, Any]
+    # S3 ETag, or file modification time for local files
+    version: Any
+    checked_at: float
+
+
+# Parsed mappings and compiled mappers, kept across warm invocations
+_mappings_cache: Dict[Tuple[str, str], _CachedMappings] = {}
+_mapper_cache: Dict[Tuple[str, str, bool], FieldMapper] = {}
+_mappings_lock = threading.Lock()
+
+
+def clear_mappings_cache() -> None:
+    """Drop cached mappings and mappers"""
+    with _mappings_lock:
+        _mappings_cache.clear()
+        _mapper_cache.clear()
+
+
+def _is_not_modified(error: ClientError) -> bool:
+    return (
+        error.response.get('Error', {}).get('Code') in ('304', 'NotModified')
+        or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304
+    )
+
+
+def load_field_mappings_file(path: str) -> Dict[str, Any]:
+    """
+    Load field mappings from a local file (bundled with the function or in tests)
+    
+    The parsed file is cached until its modification time changes.
+    
+    Args:
+        path: Path to the mappings JSON file
+    
+    Returns:
+        Field mappings dict
+    """
+    cache_key = ('file', path)
+    mtime = os.path.getmtime(path)
+    cached = _mappings_cache.get(cache_key)
+    if cached is not None and cached.version == mtime:
+        return cached.mappings
+    
+    with open(path, encoding='utf-8') as f:
+        mappings = json.load(f)
+    
+    with _mappings_lock:
+        _mappings_cache[cache_key] = _CachedMappings(mappings, mtime, time.monotonic())
+    logger.info(f"Loaded field mappings from {path}")
+    return mappings
 
 
 def load_field_mappings(bucket: str, key: str) -> Dict[str, Any]:
     """
     Load field mappings from S3
     
+    Parsed mappings are cached per bucket/key. Within
+    MAPPINGS_CACHE_TTL_SECONDS of the last check they are served without
+    calling S3; after that the object is fetched with If-None-Match on the
+    cached ETag and only downloaded and parsed again if it changed. A file
+    named after the key in FIELD_MAPPINGS_DIR takes precedence over S3.
+    
     Args:
         bucket: S3 bucket name
         key: S3 object key
     
     Returns:
-        Field mappings dict
+        Field mappings dict (the same object while the mapping is unchanged)
     """
+    if FIELD_MAPPINGS_DIR:
+        path = os.path.join(FIELD_MAPPINGS_DIR, key)
+        if os.path.isfile(path):
+            return load_field_mappings_file(path)
+    
+    cache_key = (bucket, key)
+    cached = _mappings_cache.get(cache_key)
+    now = time.monotonic()
+    if cached is not None and now - cached.checked_at < MAPPINGS_CACHE_TTL_SECONDS:
+        return cached.mappings
+    
     try:
-        response = s3.get_object(Bucket=bucket, Key=key)
+        if cached is not None and cached.version:
+            try:
+                response = s3.get_object(Bucket=bucket, Key=key, IfNoneMatch=cached.version)
+            except ClientError as e:
+                if not _is_not_modified(e):
+                    raise
+                with _mappings_lock:
+                    _mappings_cache[cache_key] = cached._replace(checked_at=now)
+                logger.info(f"Field mappings unchanged at s3://{bucket}/{key}")
+                return cached.mappings
+        else:
+            response = s3.get_object(Bucket=bucket, Key=key)
+        
         content = response['Body'].read().decode('utf-8')
         mappings = json.loads(content)
         
+        with _mappings_lock:
+            _mappings_cache[cache_key] = _CachedMappings(mappings, response.get('ETag'), now)
+        
         logger.info(f"Loaded field mappings from s3://{bucket}/{key}")
         return mappings
         
@@ -250,6 +516,32 @@ def load_field_mappings(bucket: str, key: str) -> Dict[str, Any]:
         raise
 
 
+def get_field_mapper(bucket: str, key: str, trusted_input: bool = False) -> FieldMapper:
+    """
+    Get a compiled FieldMapper for a mappings file
+    
+    The mapper is reused across invocations for as long as
+    load_field_mappings returns the same mappings, so field plans and
+    expressions are compiled once per mapping version.
+    
+    Args:
+        bucket: S3 bucket name
+        key: S3 object key
+        trusted_input: Whether products were already sanitized upstream
+    
+    Returns:
+        FieldMapper
+    """
+    mappings = load_field_mappings(bucket, key)
+    cache_key = (bucket, key, trusted_input)
+    mapper = _mapper_cache.get(cache_key)
+    if mapper is None or mapper.mappings is not mappings:
+        mapper = FieldMapper(mappings, trusted_input=trusted_input)
+        with _mappings_lock:
+            _mapper_cache[cache_key] = mapper
+    return mapper
+
+
 def validate_canonical_product(product: Dict[str, Any]) -> List[str]:
     """
     Validate canonical product has required fields
@@ -272,6 +564,108 @@ def validate_canonical_product(product: Dict[str, Any]) -> List[str]:
     return errors
 
 
+def transform_products(
+    mapper: FieldMapper,
+    products: Iterable[Dict[str, Any]],
+    offset: int = 0
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Transform and validate a sequence of Siesa products
+    
+    Args:
+        mapper: Field mapper for the product type
+        products: Siesa products
+        offset: Index of the first product, used in error messages
+    
+    Returns:
+        Tuple of (valid canonical products, validation error messages)
+    """
+    canonical_products = []
+    validation_errors = []
+    
+    products = list(products)
+    warnings = snapshot_warnings()
+    try:
+        if TRANSFORM_ENGINE == 'columnar':
+            with span('transform_columnar'):
+                mapped_products = transform_columnar(mapper, products)
+        else:
+            mapped_products = mapper.transform_batch(products)
+    except Exception as e:
+        logger.warning(f"Batch transformation failed, transforming products one at a time: {sanitize_log_message(str(e))}")
+        mapped_products = None
+        # The products are mapped again below; count their warnings once
+        restore_warnings(warnings)
+    
+    for i, siesa_product in enumerate(products, start=offset):
+        try:
+            if mapped_products is not None:
+                canonical_product = mapped_products[i - offset]
+            else:
+                canonical_product = mapper.transform_product(siesa_product)
+            
+            # Validate canonical product
+            product_errors = validate_canonical_product(canonical_product)
+            
+            if product_errors:
+                error_msg = f"Product {i}: " + ", ".join(product_errors)
+                validation_errors.append(error_msg)
+                record_warning('product', 'validation', "%s", error_msg)
+                # Skip invalid products
+                continue
+            
+            canonical_products.append(canonical_product)
+            
+        except Exception as e:
+            error_msg = f"Product {i} transformation failed: {str(e)}"
+            validation_errors.append(error_msg)
+            logger.error(error_msg)
+            # Continue with next product
+            continue
+    
+    return canonical_products, validation_errors
+
+
+def transform_manifest(mapper: FieldMapper, products_manifest: Dict[str, Any],
+                       partition: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Transform products stored as NDJSON parts, one part at a time
+    
+    Each input part produces one output part next to it (the 'extract'
+    prefix becomes 'transform'), so memory use is bounded by a single part.
+    
+    Args:
+        mapper: Field mapper for the product type
+        products_manifest: Manifest written by the extractor
+        partition: Partition of the extract this manifest covers (see
+            common/fanout.py); its parts are written under their own prefix
+    
+    Returns:
+        Tuple of (manifest of canonical product parts, validation error messages)
+    """
+    run_prefix = products_manifest['prefix'].rsplit('/', 1)[0]
+    output_prefix = f"{run_prefix}/transform"
+    offset = 0
+    if partition is not None:
+        output_prefix = f"{output_prefix}/partition-{int(partition['index']):05d}"
+        offset = int(partition.get('offset', 0))
+    writer = PartWriter(products_manifest['bucket'], output_prefix)
+    
+    all_validation_errors = []
+    
+    for part, records in zip(products_manifest['parts'], iter_manifest_parts(products_manifest)):
+        canonical_products, validation_errors = transform_products(mapper, records, offset=offset)
+        offset += part['count']
+        
+        all_validation_errors.extend(validation_errors)
+        if canonical_products:
+            writer.write_part(canonical_products)
+    
+    return writer.manifest(), all_validation_errors
+
+
+@flush_logs
+@flush_metrics
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda handler for Transformer function with security improvements
@@ -284,36 +678,46 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         Dict with transformed products in canonical model
     """
     metrics = get_metrics_publisher()
+    reset_timings()
+    reset_warnings()
     start_time = time.time()
     client_id = None
     
     try:
-        # Sanitize input event
-        event = sanitize_dict(event)
+        # Sanitize input event (products signed by the extractor are already clean)
+        event, trusted = sanitize_event(event, stage='extract', fields=('products', 'products_manifest'))
         
         # Extract parameters from event (support both formats)
         client_id = event.get('client_id') or event.get('tenantId')
         product_type = event.get('product_type') or event.get('productType', 'kong')
         products = event.get('products', [])
+        products_manifest = event.get('products_manifest')
         extraction_timestamp = event.get('extraction_timestamp')
         sync_type = event.get('sync_type', 'incremental')
+        partition = event.get('partition')
         
         if not client_id:
             raise ValueError("Missing required parameter: client_id")
         
-        if not products:
+        if products_manifest is not None and not is_manifest(products_manifest):
+            raise ValueError("Invalid products_manifest")
+        
+        product_count = products_manifest['total_count'] if products_manifest else len(products)
+        
+        if not product_count:
             logger.warning(f"No products to transform for client: {sanitize_log_message(client_id)}")
             return {
                 'client_id': client_id,
                 'product_type': product_type,
                 'canonical_products': [],
                 'count': 0,
+                'sync_type': sync_type,
                 'extraction_timestamp': extraction_timestamp,
                 'transformation_timestamp': datetime.now(timezone.utc).isoformat(),
                 'validation_errors': []
             }
         
-        logger.info(f"Starting transformation for client: {sanitize_log_message(client_id)}, products: {len(products)}")
+        logger.info(f"Starting transformation for client: {sanitize_log_message(client_id)}, products: {product_count}")
         
         # Determine field mappings file based on product type
         product_type_lower = product_type.lower()
@@ -324,60 +728,57 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             raise ValueError(f"Unknown product type: {product_type}")
         
-        # Load field mappings from S3
-        mappings = load_field_mappings(FIELD_MAPPINGS_S3_BUCKET, mappings_key)
-        
-        # Create field mapper
-        mapper = FieldMapper(mappings)
-        
-        # Transform products
-        canonical_products = []
-        all_validation_errors = []
-        
-        for i, siesa_product in enumerate(products):
-            try:
-                canonical_product = mapper.transform_product(siesa_product)
-                
-                # Validate canonical product
-                validation_errors = validate_canonical_product(canonical_product)
-                
-                if validation_errors:
-                    error_msg = f"Product {i}: " + ", ".join(validation_errors)
-                    all_validation_errors.append(error_msg)
-                    logger.warning(error_msg)
-                    # Skip invalid products
-                    continue
-                
-                canonical_products.append(canonical_product)
-                
-            except Exception as e:
-                error_msg = f"Product {i} transformation failed: {str(e)}"
-                all_validation_errors.append(error_msg)
-                logger.error(error_msg)
-                # Continue with next product
-                continue
+        # Load field mappings (cached across warm invocations) and the compiled mapper
+        mapper = get_field_mapper(FIELD_MAPPINGS_S3_BUCKET, mappings_key, trusted_input=trusted)
         
         # Prepare response (format for Step Functions)
-        transformation_timestamp = datetime.now(timezone.utc).isoformat()
-        
         response = {
             'client_id': client_id,
-            'product_type': product_type,
-            'canonical_products': canonical_products,
-            'count': len(canonical_products),
+            'product_type': product_type
+        }
+        if partition is not None:
+            response['partition'] = partition
+        
+        # Transform products
+        if products_manifest:
+            canonical_manifest, all_validation_errors = transform_manifest(mapper, products_manifest, partition)
+            count = canonical_manifest['total_count']
+            response['canonical_manifest'] = canonical_manifest
+            payload_field = 'canonical_manifest'
+        else:
+            canonical_products, all_validation_errors = transform_products(mapper, products)
+            count = len(canonical_products)
+            response['canonical_products'] = canonical_products
+            payload_field = 'canonical_products'
+        
+        response.update({
+            'count': count,
+            'sync_type': sync_type,
             'extraction_timestamp': extraction_timestamp,
-            'transformation_timestamp': transformation_timestamp,
+            'transformation_timestamp': datetime.now(timezone.utc).isoformat(),
             'validation_errors': all_validation_errors[:10]  # Limit to 10 for response size
-        }
+        })
+        
+        # Canonical products are clean if their input was: inline products were
+        # sanitized above, unsigned manifest parts were not
+        if trusted or not products_manifest:
+            sign_payload(response, payload_field, stage='transform')
         
         # Publish success metrics
         duration = time.time() - start_time
         metrics.put_sync_duration(client_id, duration)
-        metrics.put_records_processed(client_id, len(canonical_products), True)
+        metrics.put_records_processed(client_id, count, True)
         if all_validation_errors:
             metrics.put_validation_errors(client_id, len(all_validation_errors))
-        
-        logger.info(f"Transformation completed. Canonical products: {len(canonical_products)}, Errors: {len(all_validation_errors)}, Duration: {duration:.2f}s")
+        warnings = report_warnings(metrics, client_id)
+        if warnings:
+            # Per-product warnings counted by field and reason (only a sample is logged)
+            response['validation_warnings'] = warnings
+        timings = report_timings(metrics, client_id)
+        if timings:
+            response['timings'] = timings
+        
+        logger.info(f"Transformation completed. Canonical products: {count}, Errors: {len(all_validation_errors)}, Duration: {duration:.2f}s")
         
         return response
         
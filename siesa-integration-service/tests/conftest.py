@@ -0,0 +1,57 @@
+"""
+Shared test fixtures
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src/lambdas'))
+
+from common import aws_utils, metrics
+from common.warning_aggregator import reset_warnings
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks (marked slow) unless RUN_BENCHMARKS is set"""
+    if os.environ.get('RUN_BENCHMARKS'):
+        return
+    skip_slow = pytest.mark.skip(reason="benchmark; set RUN_BENCHMARKS=1 to run")
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture
+def aws_credentials(monkeypatch):
+    """Fake credentials for moto, removed again after the test"""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+@pytest.fixture(autouse=True)
+def emf_metrics(monkeypatch):
+    """Handlers write metrics to stdout (EMF) instead of calling CloudWatch"""
+    monkeypatch.setattr(metrics, 'METRICS_MODE', 'emf')
+    monkeypatch.setattr(metrics, '_metrics_publisher', None)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Keep cached configs, secrets, mappings, sessions and warning counts from leaking between tests"""
+    _clear_caches()
+    yield
+    _clear_caches()
+
+
+def _clear_caches():
+    aws_utils.clear_caches()
+    reset_warnings()
+    # Handler modules create AWS clients on import, so only clear them once loaded
+    transformer = sys.modules.get('transformer.handler')
+    if transformer is not None:
+        transformer.clear_mappings_cache()
+    kong_adapter = sys.modules.get('loader.adapters.kong_adapter')
+    if kong_adapter is not None:
+        kong_adapter.clear_sessions()
@@ -4,6 +4,7 @@ Tests protection against injection attacks
 """
 
 import pytest
+import random
 import sys
 import os
 
@@ -14,10 +15,33 @@ from common.input_validation import (
     sanitize_string,
     sanitize_dict,
     sanitize_log_message,
-    ValidationError
+    sanitize_string_batch,
+    ValidationError,
+    SQL_INJECTION_PATTERN,
+    XSS_PATTERNS,
+    _is_suspicious,
+    _is_suspicious_block
 )
 
 
+PRESCREEN_SEED = int(os.environ.get('SANITIZE_PRESCREEN_SEED', '20240612'))
+PRESCREEN_CASES = int(os.environ.get('SANITIZE_PRESCREEN_CASES', '20000'))
+
+# Fragments of attack payloads mixed with product-like text
+FRAGMENTS = [
+    'select', 'SEL ect', 'union', 'un\tion', 'insert', 'update', 'delete', 'drop', 'exec', 'script',
+    'concat', 'sleep', 'benchmark', 'waitfor delay', 'and 1=1', 'or 2>', '0x1f', '0X', '--', '/*', '*/',
+    '#', ';', '||', '<', '>', '=', ':', '(', '@import', 'onerror', 'javascript', 'data:text/html',
+    'eval', 'style="', '<!doctype', '<?xml ?>', 'Camisa', 'Zapato', 'talla M', '12,50', 'EXT-0001',
+    'ſelect', 'ſcript', 'İnsert', 'unıon', 'ﬀ', 'Kelvin K', 'Acción', ' ', '\n', '-', '/', '*', '|'
+]
+
+
+def has_attack_pattern(value):
+    """Full pattern battery, as sanitize_string ran it before the pre-screen"""
+    return bool(SQL_INJECTION_PATTERN.search(value)) or any(p.search(value) for p in XSS_PATTERNS)
+
+
 class TestSanitizeString:
     """Test suite for sanitize_string function"""
     
@@ -94,6 +118,88 @@ class TestSanitizeString:
         assert result  # Just verify it returns something
 
 
+class TestSuspiciousPrescreen:
+    """The pre-screen must flag every string the full pattern battery matches"""
+    
+    def test_prescreen_is_superset_of_battery(self):
+        """Test random payload mixes: battery match implies pre-screen match"""
+        rng = random.Random(PRESCREEN_SEED)
+        matched = 0
+        
+        for _ in range(PRESCREEN_CASES):
+            parts = [rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 5))]
+            value = ''.join(part.upper() if rng.random() < 0.3 else part for part in parts)
+            
+            if has_attack_pattern(value):
+                matched += 1
+                assert _is_suspicious(value), f"pre-screen missed {value!r}"
+        
+        # The generator must produce real attack matches, not only plain text
+        assert matched > PRESCREEN_CASES // 4
+    
+    def test_unicode_case_folding_is_flagged(self):
+        """Test strings that only match through Unicode case folding"""
+        for value in ['ſelect * from t', 'ſcript', 'İNSERT', 'UNİON']:
+            assert has_attack_pattern(value)
+            assert _is_suspicious(value)
+    
+    def test_plain_product_strings_take_fast_path(self):
+        """Test that ordinary product values are not flagged"""
+        for value in ['Camisa Polo Azul', 'EXT-000123', '7701234567890', '12,50', 'Acción rápida', 'A-01']:
+            assert not _is_suspicious(value)
+
+
+class TestSanitizeStringBatch:
+    """Test suite for sanitize_string_batch function"""
+    
+    def test_matches_sanitize_string(self):
+        """Test that every value gets the same result or error as sanitize_string"""
+        values = [
+            "hello", "Zapato & Cia", "<b>bold</b>", "'; SELECT * FROM users--",
+            "<script>alert(1)</script>", "img onerror=x", "line\nbreak", "",
+            "x" * 1001, 123, None, "javascript:void(0)", "eval (code)", "plain text"
+        ] * 40
+        
+        results = sanitize_string_batch(values)
+        
+        assert len(results) == len(values)
+        for value, result in zip(values, results):
+            try:
+                expected = sanitize_string(value)
+            except ValidationError as e:
+                assert isinstance(result, ValidationError)
+                assert str(result) == str(e)
+            else:
+                assert result == expected
+    
+    def test_block_screen_is_superset_of_battery(self):
+        """Test that a block holding a battery match among plain values is flagged"""
+        rng = random.Random(PRESCREEN_SEED)
+        plain = ['Camisa Polo Azul', 'EXT-000123', 'talla M', '12,50']
+        
+        for _ in range(PRESCREEN_CASES // 4):
+            parts = [rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 5))]
+            value = ''.join(part.upper() if rng.random() < 0.3 else part for part in parts)
+            
+            if has_attack_pattern(value):
+                block = '\n'.join(rng.sample(plain, 2) + [value] + rng.sample(plain, 2))
+                assert _is_suspicious_block(block), f"block screen missed {value!r}"
+    
+    def test_plain_blocks_pass_the_block_screen(self):
+        """Test that a block of ordinary product values is not flagged"""
+        block = '\n'.join(['Camisa Polo Azul', 'EXT-000123', '7701234567890', '12,50', 'A-01'] * 50)
+        
+        assert not _is_suspicious_block(block)
+    
+    def test_clean_blocks_are_escaped(self):
+        """Test that values in a block without matches are still HTML escaped"""
+        assert sanitize_string_batch(['a & b', '"q"', 'a\nb']) == ['a &amp; b', '&quot;q&quot;', 'a\nb']
+    
+    def test_match_spanning_values_is_not_an_error(self):
+        """Test that a pattern formed across two values does not reject either"""
+        assert sanitize_string_batch(['<scr', 'ipt>', 'x']) == ['&lt;scr', 'ipt&gt;', 'x']
+
+
 class TestSanitizeDict:
     """Test suite for sanitize_dict function"""
     
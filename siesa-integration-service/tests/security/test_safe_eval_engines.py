@@ -0,0 +1,145 @@
+"""
+Differential tests for the safe_eval engines
+Random expressions are evaluated by the AST interpreter and by the closure
+compiler; both must return the same value or raise the same error.
+"""
+
+import math
+import random
+import time
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.safe_eval import CompiledExpression, SafeEvalError, TimeoutError as EvalTimeoutError
+
+
+FUZZ_SEED = int(os.environ.get('SAFE_EVAL_FUZZ_SEED', '20240611'))
+FUZZ_CASES = int(os.environ.get('SAFE_EVAL_FUZZ_CASES', '3000'))
+
+BINARY_OPERATORS = ['+', '-', '*', '/', '//', '%', '**', '&', '<<', '@']
+UNARY_OPERATORS = ['-', '+', 'not ', '~']
+COMPARISONS = ['<', '<=', '==', '!=', '>', '>=', 'in', 'is', 'is not']
+FUNCTIONS = ['abs', 'round', 'len', 'sum', 'sqrt', 'pow', 'ceil', 'floor', 'upper', 'max']
+NAMES = ['value', 'qty', 'flag', 'missing']
+CONSTANTS = ['0', '1', '2', '-3', '0.5', '1.19', '100', '1e308', 'True', 'False', '"text"', 'None']
+
+
+def random_expression(rng: random.Random, depth: int = 0) -> str:
+    """Generate a random expression, mostly valid, sometimes unsafe or unsupported"""
+    if depth > 4 or rng.random() < 0.3:
+        return rng.choice(CONSTANTS + NAMES)
+
+    kind = rng.random()
+
+    def sub():
+        return random_expression(rng, depth + 1)
+
+    if kind < 0.35:
+        return f"({sub()} {rng.choice(BINARY_OPERATORS)} {sub()})"
+    if kind < 0.45:
+        return f"({rng.choice(UNARY_OPERATORS)}{sub()})"
+    if kind < 0.6:
+        parts = [sub()]
+        for _ in range(rng.randint(1, 3)):
+            parts.append(rng.choice(COMPARISONS))
+            parts.append(sub())
+        return f"({' '.join(parts)})"
+    if kind < 0.7:
+        return f"({sub()} {rng.choice(['and', 'or'])} {sub()})"
+    if kind < 0.85:
+        args = ', '.join(sub() for _ in range(rng.randint(0, 3)))
+        return f"{rng.choice(FUNCTIONS)}({args})"
+    if kind < 0.9:
+        return f"({sub()} if {sub()} else {sub()})"
+    if kind < 0.95:
+        return f"[{sub()}, {sub()}]"
+    return f"{rng.choice(NAMES)}.real"
+
+
+def outcome(expression: str, engine: str, context: dict):
+    """Evaluate with one engine, returning ('ok', value) or ('error', type, message)"""
+    try:
+        compiled = CompiledExpression(expression, engine=engine)
+    except SafeEvalError as e:
+        return ('compile-error', str(e))
+
+    try:
+        return ('ok', compiled.evaluate(dict(context)))
+    except (SafeEvalError, EvalTimeoutError) as e:
+        return ('error', type(e).__name__, str(e))
+
+
+def same_value(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+def test_engines_agree_on_random_expressions():
+    """Interpreter and closure compiler return identical results and errors"""
+    rng = random.Random(FUZZ_SEED)
+    contexts = [
+        {'value': 10, 'qty': 3, 'flag': True},
+        {'value': 0, 'qty': -2.5, 'flag': False},
+        {'value': 1.19, 'qty': 0.0, 'flag': 1},
+    ]
+
+    evaluated = 0
+    for case in range(FUZZ_CASES):
+        expression = random_expression(rng)
+        context = contexts[case % len(contexts)]
+
+        expected = outcome(expression, 'interpreter', context)
+        actual = outcome(expression, 'closure', context)
+
+        if expected[0] == 'ok' and actual[0] == 'ok':
+            assert same_value(expected[1], actual[1]), f"{expression!r} with {context}: {expected} != {actual}"
+            evaluated += 1
+        else:
+            assert expected == actual, f"{expression!r} with {context}: {expected} != {actual}"
+
+    # The generator must exercise the success path, not only errors
+    assert evaluated > FUZZ_CASES // 10
+
+
+@pytest.mark.parametrize('expression, context, expected', [
+    ('value * 1.19', {'value': 100}, 100 * 1.19),
+    ('round(value * 1.19, 2)', {'value': 9.99}, round(9.99 * 1.19, 2)),
+    ('1 < value <= 10', {'value': 10}, True),
+    ('value > 5 and value < 3', {'value': 4}, False),
+    ('-value ** 2', {'value': 3}, -9),
+])
+def test_engines_agree_on_pricing_logic(expression, context, expected):
+    """Typical mapping expressions give the same answer on both engines"""
+    for engine in ('interpreter', 'closure'):
+        assert CompiledExpression(expression, engine=engine).evaluate(context) == expected
+
+
+@pytest.mark.slow
+def test_closure_engine_speedup():
+    """Closure engine is at least 5x faster per evaluation on pricing logic"""
+    iterations = 50000
+    context = {'value': 1234.5}
+
+    def per_evaluation(engine):
+        compiled = CompiledExpression('value * 1.19', engine=engine)
+        evaluate = compiled.evaluate
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                evaluate(context)
+            best = min(best, (time.perf_counter() - start) / iterations)
+        return best
+
+    interpreter = per_evaluation('interpreter')
+    closure = per_evaluation('closure')
+
+    print(f"\nvalue * 1.19: interpreter {interpreter * 1e6:.2f} us, closure {closure * 1e6:.2f} us "
+          f"({interpreter / closure:.1f}x)")
+
+    assert interpreter / closure >= 5
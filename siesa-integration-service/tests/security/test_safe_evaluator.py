@@ -12,6 +12,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
 
 # SECURITY FIX: Import from safe_eval module instead of transformer
 from common.safe_eval import safe_eval, apply_transformation_logic, evaluate_condition, SafeEvalError
+from common.safe_eval import CompiledExpression, compile_expression, TimeoutError as EvalTimeoutError
+from common.safe_eval import evaluate_column
+import random
+import time
+import threading
+from unittest.mock import patch
 
 
 class TestSafeEval:
@@ -162,5 +168,116 @@ class TestEvaluateCondition:
         assert result is False  # Should return False on error
 
 
+class TestCompiledExpression:
+    """Test suite for compiled, cached expressions"""
+    
+    def test_compile_is_cached_by_text(self):
+        """Test that the same expression text returns the same compiled object"""
+        first = compile_expression("value * 3")
+        second = compile_expression("value * 3")
+        
+        assert first is second
+        assert isinstance(first, CompiledExpression)
+        assert first.evaluate({"value": 2}) == 6
+        assert first.evaluate({"value": 4}) == 12
+    
+    def test_evaluation_starts_no_threads(self):
+        """Test that evaluation runs in the calling thread"""
+        with patch.object(threading.Thread, 'start', side_effect=AssertionError("thread started")):
+            assert safe_eval("value + 1", {"value": 1}) == 2
+            assert apply_transformation_logic(2, "value * 2") == 4
+            assert evaluate_condition(2, "value > 1") is True
+    
+    def test_validation_happens_at_compile_time(self):
+        """Test that unsafe expressions never produce a compiled object"""
+        with pytest.raises(SafeEvalError, match="Attribute access and subscripting not allowed"):
+            compile_expression("value.__class__")
+        with pytest.raises(SafeEvalError, match="Invalid expression syntax"):
+            CompiledExpression("1 +")
+    
+    def test_deadline_bounds_evaluation(self):
+        """Test that an expired deadline stops evaluation"""
+        # Closures check the deadline before powers and calls
+        with pytest.raises(EvalTimeoutError):
+            compile_expression("abs(value) + 1").evaluate({"value": 1}, timeout=-1)
+        with pytest.raises(EvalTimeoutError):
+            compile_expression("value ** 2").evaluate({"value": 1}, timeout=-1)
+        # The interpreter checks it at every node
+        with pytest.raises(EvalTimeoutError):
+            CompiledExpression("value + 1", engine='interpreter').evaluate({"value": 1}, timeout=-1)
+    
+    def test_large_integer_power_rejected(self):
+        """Test that integer powers cannot grow past the size bound"""
+        with pytest.raises(SafeEvalError, match="Exponent too large"):
+            safe_eval("9 ** 9 ** 9")
+        with pytest.raises(SafeEvalError, match="Exponent too large"):
+            safe_eval("pow(10, 100000)")
+        assert safe_eval("2 ** 10") == 1024
+    
+    def test_wrappers_accept_compiled_expressions(self):
+        """Test apply_transformation_logic/evaluate_condition with precompiled input"""
+        assert apply_transformation_logic(10, compile_expression("value * 1.5")) == 15.0
+        assert evaluate_condition(10, compile_expression("value > 5")) is True
+        assert apply_transformation_logic(10, compile_expression("value / 0")) == 10
+
+
+class TestEvaluateColumn:
+    """Test suite for column-at-a-time evaluation"""
+    
+    @staticmethod
+    def assert_matches_per_row(logic, values):
+        expected = [apply_transformation_logic(value, logic) for value in values]
+        actual = evaluate_column(logic, values)
+        assert len(actual) == len(expected)
+        for a, b in zip(actual, expected):
+            assert (a != a and b != b) or (type(a) is type(b) and a == b), (logic, a, b)
+    
+    @pytest.mark.parametrize('logic', [
+        'value * 1.19',
+        '(value + 1) * 1.19',
+        '-value / 3',
+        'value / (value - 5)',
+        'value * value * value * value / 7',
+        'value + 1',
+        'round(value * 1.19, 2)',
+        'value > 100',
+    ])
+    def test_matches_per_row_evaluation(self, logic):
+        """Test that vectorized and fallback rows give per-row results"""
+        rng = random.Random(7)
+        values = [rng.uniform(-1e6, 1e6) for _ in range(200)]
+        values += [rng.randint(-10 ** 6, 10 ** 6) for _ in range(200)]
+        values += [0, 5, 0.0, 2 ** 60, 10 ** 400, True, None, 'text', float('nan'), float('inf'), 1e308]
+        
+        self.assert_matches_per_row(logic, values)
+    
+    def test_invalid_logic_keeps_values(self):
+        """Test that an expression that cannot compile leaves the column unchanged"""
+        values = list(range(100))
+        assert evaluate_column('value.__class__', values) == values
+        assert evaluate_column('value +', values) == values
+    
+    def test_fallback_without_numpy(self):
+        """Test per-row evaluation when NumPy is not installed"""
+        values = [float(i) for i in range(100)]
+        
+        with patch('common.safe_eval.np', None):
+            assert evaluate_column('value * 2', values) == [value * 2 for value in values]
+    
+    def test_price_column_in_milliseconds(self):
+        """Test that 100k prices are recalculated in one vectorized pass"""
+        pytest.importorskip('numpy')
+        values = [random.uniform(0, 1e6) for _ in range(100000)]
+        compiled = compile_expression('value * 1.19')
+        
+        start = time.perf_counter()
+        results = evaluate_column(compiled, values)
+        elapsed = time.perf_counter() - start
+        
+        assert results[:100] == [value * 1.19 for value in values[:100]]
+        # Per-row evaluation takes ~100ms here; the vectorized pass ~10ms
+        assert elapsed < 0.08
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,73 @@
+"""
+Benchmark for the sanitizer pre-screen
+Measures sanitize_dict cost per product on Siesa-like product dicts, with
+the pre-screen and with every string sent through the full pattern battery.
+Row count can be changed with SANITIZER_BENCHMARK_ROWS.
+"""
+
+import pytest
+import time
+from unittest.mock import patch
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.input_validation import sanitize_dict
+
+
+BENCHMARK_ROWS = int(os.environ.get('SANITIZER_BENCHMARK_ROWS', '20000'))
+
+
+def siesa_products(count):
+    """Raw Siesa product dicts as returned by the extractor"""
+    return [
+        {
+            'f_codigo': f'P{i:06d}',
+            'f_codigo_externo': f'EXT-{i:06d}',
+            'f_nombre': f'Camisa Polo Manga Corta {i}',
+            'f_nombre_comercial': f'Camisa polo algodón talla {("S", "M", "L")[i % 3]}',
+            'f_descripcion': 'Prenda en algodón peinado, cuello tejido (lavar a máquina)',
+            'f_ean': f'770{i:010d}',
+            'f_sku': f'SKU{i:06d}',
+            'f_categoria': ('ROPA', 'CALZADO', 'ACCESORIOS')[i % 3],
+            'f_unidad_medida': 'UND',
+            'f_cantidad': str(i % 500),
+            'f_ubicacion': f'A-{i % 40:02d}',
+            'f_precio_unitario': f'{i % 1000},50',
+            'f_activo': 'SI',
+            'f_fecha_modificacion': '2024-06-01T10:15:00'
+        }
+        for i in range(count)
+    ]
+
+
+def microseconds_per_product(products, runs=2):
+    """Best sanitize_dict time per product over a few runs"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        for product in products:
+            sanitize_dict(product)
+        best = min(best, (time.perf_counter() - start) / len(products))
+    return best * 1e6
+
+
+@pytest.mark.slow
+def test_prescreen_benchmark():
+    """Pre-screen gives the same output at a fraction of the per-product cost"""
+    products = siesa_products(BENCHMARK_ROWS)
+
+    with patch('common.input_validation._is_suspicious', return_value=True):
+        expected = [sanitize_dict(product) for product in products[:1000]]
+        battery = microseconds_per_product(products)
+
+    assert [sanitize_dict(product) for product in products[:1000]] == expected
+    prescreen = microseconds_per_product(products)
+
+    print(f"\nsanitize_dict on {BENCHMARK_ROWS} products: full battery {battery:.1f} us/product, "
+          f"pre-screen {prescreen:.1f} us/product ({battery / prescreen:.1f}x)")
+
+    # Generous margin: timings are noisy on shared runners
+    assert battery / prescreen >= 3
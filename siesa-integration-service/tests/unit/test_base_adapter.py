@@ -3,6 +3,8 @@ Unit tests for Base Product Adapter
 Tests the process_batch method which orchestrates validation and loading
 """
 import pytest
+import threading
+import time
 from typing import Dict, List, Any, Tuple
 
 # Import the module to test
@@ -11,6 +13,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
 
 from loader.adapters.base_adapter import ProductAdapter
+from loader.adapters.batch_sizer import AdaptiveBatchSizer
 
 
 # ============================================================================
@@ -277,6 +280,315 @@ class TestBaseAdapterProcessBatch:
         # Check individual batch results
         assert result['batch_results'][0]['success'] == 10
         assert result['batch_results'][1]['failed'] == 10
+        
+        # Only the failed batch is reported for retry
+        assert result['failed_product_ids'] == [f'PROD{i:03d}' for i in range(11, 21)]
+    
+    def test_process_batch_failed_ids_include_validation_errors(self, mixed_products):
+        """Test that products failing validation are reported by id"""
+        adapter = TestProductAdapter({}, {})
+        
+        result = adapter.process_batch(mixed_products, batch_size=10)
+        
+        assert result['failed_product_ids'] == ['PROD003']
+
+
+class TestBaseAdapterProcessStream:
+    """Tests for process_stream method"""
+    
+    def test_process_stream_matches_process_batch(self, mixed_products):
+        """Test that streaming a generator gives the same totals as a list"""
+        products = mixed_products * 30  # 120 products, 60 valid
+        
+        batch_result = TestProductAdapter({}, {}).process_batch(products, batch_size=4)
+        stream_result = TestProductAdapter({}, {}).process_stream(
+            (product for product in products), batch_size=4
+        )
+        
+        for key in ('total_input', 'total_valid', 'total_processed', 'total_success', 'total_failed'):
+            assert stream_result[key] == batch_result[key]
+        assert len(stream_result['validation_errors']) == 60
+    
+    def test_process_stream_bounds_chunk_size(self, valid_products):
+        """Test that the stream is consumed in chunks, not all at once"""
+        adapter = TestProductAdapter({}, {})
+        chunk_sizes = []
+        original = adapter.process_batch
+        
+        def record_chunk(chunk, batch_size=100, sizer=None):
+            chunk_sizes.append(len(chunk))
+            return original(chunk, batch_size=batch_size, sizer=sizer)
+        
+        adapter.process_batch = record_chunk
+        products = ({'id': f'P{i}', 'name': f'Product {i}'} for i in range(45))
+        
+        result = adapter.process_stream(products, batch_size=2)
+        
+        assert chunk_sizes == [20, 20, 5]
+        assert result['total_success'] == 45
+        # Batch numbers and error indexes are global across chunks
+        assert [b['batch_number'] for b in result['batch_results']] == list(range(1, 24))
+    
+    def test_process_stream_offsets_validation_indexes(self, mixed_products):
+        """Test that validation error indexes refer to the position in the stream"""
+        adapter = TestProductAdapter({}, {})
+        
+        result = adapter.process_stream(iter(mixed_products * 6), batch_size=1)
+        
+        # mixed_products has invalid items at positions 1 and 2; chunks hold 10
+        indexes = [e['index'] for e in result['validation_errors']]
+        assert indexes == [i for i in range(24) if i % 4 in (1, 2)]
+
+
+class TestBaseAdapterConcurrentBatches:
+    """Tests for uploading batches concurrently"""
+    
+    class SlowAdapter(ProductAdapter):
+        """Adapter whose uploads take a while and record their concurrency"""
+        
+        def __init__(self, credentials, config, max_in_flight=1, fail_batches=()):
+            super().__init__(credentials, config, max_in_flight=max_in_flight)
+            self.fail_batches = set(fail_batches)
+            self.lock = threading.Lock()
+            self.in_flight = 0
+            self.peak_in_flight = 0
+            self.clients_created = 0
+        
+        def get_api_client(self):
+            with self.lock:
+                self.clients_created += 1
+            time.sleep(0.02)
+            return object()
+        
+        def transform_products(self, canonical_products):
+            return canonical_products
+        
+        def validate_product(self, product):
+            return True, ""
+        
+        def load_batch(self, products):
+            self.ensure_api_client()
+            with self.lock:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                time.sleep(0.02)
+                if products[0]['id'] in self.fail_batches:
+                    raise Exception(f"Upload failed at {products[0]['id']}")
+                failed = 1 if products[0]['id'].endswith('5') else 0
+                return {
+                    'records_processed': len(products),
+                    'records_success': len(products) - failed,
+                    'records_failed': failed
+                }
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+    
+    @pytest.fixture
+    def products(self):
+        return [{'id': f'P{i:03d}', 'name': f'Product {i}'} for i in range(60)]
+    
+    def test_results_match_serial_upload(self, products):
+        """Test that accounting and batch order are the same as one at a time"""
+        serial = self.SlowAdapter({}, {}, fail_batches={'P010'}).process_batch(products, batch_size=5)
+        concurrent = self.SlowAdapter({}, {}, fail_batches={'P010'}, max_in_flight=4).process_batch(products, batch_size=5)
+        
+        assert concurrent == serial
+        assert [b['batch_number'] for b in concurrent['batch_results']] == list(range(1, 13))
+        assert concurrent['batch_results'][2]['error'] == 'Upload failed at P010'
+    
+    def test_in_flight_batches_are_bounded(self, products):
+        """Test that no more than max_in_flight uploads run at once"""
+        adapter = self.SlowAdapter({}, {}, max_in_flight=3)
+        
+        adapter.process_batch(products, batch_size=5)
+        
+        assert 1 < adapter.peak_in_flight <= 3
+    
+    def test_concurrent_batches_share_one_client(self, products):
+        """Test that the API client is created once for all workers"""
+        adapter = self.SlowAdapter({}, {}, max_in_flight=6)
+        
+        adapter.process_batch(products, batch_size=5)
+        
+        assert adapter.clients_created == 1
+    
+    def test_max_in_flight_is_capped(self):
+        """Test that the concurrency setting is clamped to a sane range"""
+        assert TestProductAdapter({}, {}).max_in_flight == 1
+        assert self.SlowAdapter({}, {}, max_in_flight=0).max_in_flight == 1
+        assert self.SlowAdapter({}, {}, max_in_flight=1000).max_in_flight == 16
+
+
+class TestBaseAdapterAdaptiveBatches:
+    """Tests for batch sizes chosen by an AdaptiveBatchSizer"""
+    
+    class LimitedAdapter(ProductAdapter):
+        """Adapter whose API rejects batches above a payload limit (413)"""
+        
+        def __init__(self, credentials, config, max_in_flight=1, limit=40):
+            super().__init__(credentials, config, max_in_flight=max_in_flight)
+            self.limit = limit
+            self.lock = threading.Lock()
+            self.loaded_ids = []
+        
+        def get_api_client(self):
+            return None
+        
+        def transform_products(self, canonical_products):
+            return canonical_products
+        
+        def validate_product(self, product):
+            return True, ""
+        
+        def load_batch(self, products):
+            if len(products) > self.limit:
+                return {'records_processed': len(products), 'records_success': 0,
+                        'records_failed': len(products), 'overloaded': True, 'duration_seconds': 0.01}
+            with self.lock:
+                self.loaded_ids.extend(product['id'] for product in products)
+            return {'records_processed': len(products), 'records_success': len(products),
+                    'records_failed': 0, 'duration_seconds': 0.01}
+    
+    @pytest.fixture
+    def products(self):
+        return [{'id': f'P{i:04d}', 'name': f'Product {i}'} for i in range(1000)]
+    
+    def test_size_grows_and_backs_off(self, products):
+        """Test that batches grow until the API pushes back, then halve"""
+        adapter = self.LimitedAdapter({}, {})
+        sizer = AdaptiveBatchSizer(initial_size=10, increase_step=10, target_latency_seconds=1.0)
+        
+        result = adapter.process_batch(products, sizer=sizer)
+        
+        sizes = [b['batch_size'] for b in result['batch_results']]
+        assert sizes[:5] == [10, 20, 30, 40, 50]
+        assert sizes[5] == 25
+        assert max(sizes) <= 50
+        assert result['batch_sizing']['decreases'] >= 1
+        assert result['batch_sizing']['max_size_used'] == 50
+    
+    def test_rejected_batches_are_reported(self, products):
+        """Test that overload failures are accounted like any failed batch"""
+        adapter = self.LimitedAdapter({}, {})
+        sizer = AdaptiveBatchSizer(initial_size=10, increase_step=10, target_latency_seconds=1.0)
+        
+        result = adapter.process_batch(products, sizer=sizer)
+        
+        rejected = sum(b['failed'] for b in result['batch_results'])
+        assert result['total_success'] == len(adapter.loaded_ids) == 1000 - rejected
+        assert sorted(result['failed_product_ids'] + adapter.loaded_ids) == [p['id'] for p in products]
+    
+    def test_concurrent_adaptive_batches_cover_every_product(self, products):
+        """Test that dynamically sized concurrent batches neither skip nor repeat products"""
+        adapter = self.LimitedAdapter({}, {}, max_in_flight=4, limit=10_000)
+        sizer = AdaptiveBatchSizer(initial_size=10, increase_step=10, target_latency_seconds=1.0)
+        
+        result = adapter.process_batch(products, sizer=sizer)
+        
+        assert sorted(adapter.loaded_ids) == [p['id'] for p in products]
+        assert [b['batch_number'] for b in result['batch_results']] == list(range(1, len(result['batch_results']) + 1))
+        assert sum(b['batch_size'] for b in result['batch_results']) == 1000
+        assert result['batch_sizing']['final_size'] > 10
+    
+    def test_stream_shares_the_sizer(self, products):
+        """Test that sizing carries over from one stream chunk to the next"""
+        adapter = self.LimitedAdapter({}, {}, limit=10_000)
+        sizer = AdaptiveBatchSizer(initial_size=5, increase_step=5, target_latency_seconds=1.0)
+        
+        result = adapter.process_stream(iter(products), sizer=sizer)
+        
+        assert result['total_success'] == 1000
+        assert result['batch_sizing']['final_size'] > 50
+    
+    def test_fixed_size_without_sizer(self, products):
+        """Test that batch_size is used as-is when no sizer is given"""
+        result = self.LimitedAdapter({}, {}).process_batch(products, batch_size=25)
+        
+        assert {b['batch_size'] for b in result['batch_results']} == {25}
+        assert 'batch_sizing' not in result
+
+
+class TestBaseAdapterBisectRetry:
+    """Tests for isolating bad records in a rejected batch"""
+    
+    class PickyAdapter(ProductAdapter):
+        """Adapter whose API rejects (400) any batch holding a bad record"""
+        
+        def __init__(self, credentials, config, bad_ids=(), max_bisect_calls=0, status_code=400):
+            super().__init__(credentials, config, max_bisect_calls=max_bisect_calls)
+            self.bad_ids = set(bad_ids)
+            self.status_code = status_code
+            self.calls = 0
+        
+        def get_api_client(self):
+            return None
+        
+        def transform_products(self, canonical_products):
+            return canonical_products
+        
+        def validate_product(self, product):
+            return True, ""
+        
+        def load_batch(self, products):
+            self.calls += 1
+            bad = [product['id'] for product in products if product['id'] in self.bad_ids]
+            if bad:
+                return {'records_processed': len(products), 'records_success': 0,
+                        'records_failed': len(products), 'status_code': self.status_code,
+                        'error': {'detail': f'invalid sku {bad[0]}'}}
+            return {'records_processed': len(products), 'records_success': len(products), 'records_failed': 0}
+    
+    @pytest.fixture
+    def products(self):
+        return [{'id': f'P{i:03d}', 'name': f'Product {i}'} for i in range(100)]
+    
+    def test_only_bad_records_fail(self, products):
+        """Test that one bad SKU no longer fails the 99 good ones"""
+        adapter = self.PickyAdapter({}, {}, bad_ids={'P042'}, max_bisect_calls=16)
+        
+        result = adapter.process_batch(products, batch_size=100)
+        
+        assert result['total_success'] == 99
+        assert result['total_failed'] == 1
+        assert result['failed_product_ids'] == ['P042']
+        assert [error['product_id'] for error in result['record_errors']] == ['P042']
+        assert 'invalid sku P042' in result['record_errors'][0]['error']
+        # 100 -> 50 -> 25 -> 13 -> 7 -> 4 -> 2 -> 1, one call per level at most
+        assert result['batch_results'][0]['bisect_calls'] <= 2 * 7
+    
+    def test_bisect_calls_are_capped(self, products):
+        """Test that records left unresolved when the budget runs out are failed"""
+        bad_ids = {'P005'}
+        adapter = self.PickyAdapter({}, {}, bad_ids=bad_ids, max_bisect_calls=6)
+        
+        result = adapter.process_batch(products, batch_size=100)
+        
+        assert adapter.calls == 1 + 6
+        assert result['batch_results'][0]['bisect_calls'] == 6
+        assert result['total_success'] + result['total_failed'] == 100
+        assert bad_ids <= set(result['failed_product_ids'])
+        assert 0 < result['total_success'] < 99
+    
+    def test_disabled_by_default(self, products):
+        """Test that without a budget the whole batch fails as before"""
+        adapter = self.PickyAdapter({}, {}, bad_ids={'P042'})
+        
+        result = adapter.process_batch(products, batch_size=100)
+        
+        assert adapter.calls == 1
+        assert result['total_failed'] == 100
+        assert 'bisect_calls' not in result['batch_results'][0]
+    
+    def test_non_record_errors_are_not_bisected(self, products):
+        """Test that auth or server errors fail the batch without extra calls"""
+        adapter = self.PickyAdapter({}, {}, bad_ids={'P042'}, max_bisect_calls=16, status_code=401)
+        
+        result = adapter.process_batch(products, batch_size=100)
+        
+        assert adapter.calls == 1
+        assert result['total_failed'] == 100
 
 
 class TestBaseAdapterAbstractMethods:
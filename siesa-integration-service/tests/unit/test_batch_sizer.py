@@ -0,0 +1,88 @@
+"""
+Unit tests for the adaptive batch sizer
+Tests loader/adapters/batch_sizer.py
+"""
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from loader.adapters.batch_sizer import AdaptiveBatchSizer
+
+
+# ============================================================================
+# AdaptiveBatchSizer Tests
+# ============================================================================
+
+class TestAdaptiveBatchSizer:
+    """Tests for AIMD batch sizing"""
+    
+    def test_grows_additively_under_target_latency(self):
+        """Test that fast successful batches grow the size by one step each"""
+        sizer = AdaptiveBatchSizer(initial_size=100, increase_step=10, target_latency_seconds=1.0)
+        
+        for _ in range(3):
+            sizer.record(sizer.size, 0.2, success=True)
+        
+        assert sizer.size == 130
+    
+    def test_holds_when_p95_is_over_target(self):
+        """Test that the size stops growing once the latency tail is too slow"""
+        sizer = AdaptiveBatchSizer(initial_size=100, increase_step=10, target_latency_seconds=1.0)
+        
+        sizer.record(100, 1.5, success=True)
+        sizer.record(100, 0.2, success=True)
+        
+        assert sizer.size == 100
+        assert sizer.p95_latency() == 1.5
+    
+    def test_halves_on_overload(self):
+        """Test multiplicative decrease on 413/5xx/timeouts"""
+        sizer = AdaptiveBatchSizer(initial_size=200, min_size=30)
+        
+        assert sizer.record(200, 0.1, success=False, overloaded=True) == 100
+        assert sizer.record(100, 0.1, success=False, overloaded=True) == 50
+        assert sizer.record(50, 0.1, success=False, overloaded=True) == 30
+    
+    def test_stale_overload_is_ignored(self):
+        """Test that batches sent before a decrease do not halve the size again"""
+        sizer = AdaptiveBatchSizer(initial_size=200)
+        
+        # Four concurrent batches of 200 all rejected
+        for _ in range(4):
+            sizer.record(200, 0.1, success=False, overloaded=True)
+        
+        assert sizer.size == 100
+        assert sizer.summary()['decreases'] == 1
+    
+    def test_failed_batch_does_not_grow(self):
+        """Test that a rejected (non overload) batch keeps the size"""
+        sizer = AdaptiveBatchSizer(initial_size=100, increase_step=10)
+        
+        sizer.record(100, 0.1, success=False)
+        
+        assert sizer.size == 100
+    
+    def test_size_is_clamped(self):
+        """Test that the size stays between min_size and max_size"""
+        sizer = AdaptiveBatchSizer(initial_size=5000, min_size=10, max_size=120, increase_step=50)
+        
+        assert sizer.size == 120
+        sizer.record(120, 0.1, success=True)
+        assert sizer.size == 120
+    
+    def test_summary_reports_effective_sizes(self):
+        """Test the sizing summary added to the results"""
+        sizer = AdaptiveBatchSizer(initial_size=100, increase_step=50)
+        sizer.record(100, 0.25, success=True)
+        sizer.record(150, 0.1, success=False, overloaded=True)
+        
+        assert sizer.summary() == {
+            'initial_size': 100,
+            'final_size': 75,
+            'min_size_used': 75,
+            'max_size_used': 150,
+            'decreases': 1,
+            'p95_latency_ms': None
+        }
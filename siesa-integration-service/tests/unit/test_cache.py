@@ -0,0 +1,229 @@
+"""
+Unit tests for the in-process TTL cache
+Tests common/cache.py and the cached lookups in common/aws_utils.py
+"""
+import pytest
+import json
+from unittest.mock import Mock, patch
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common import aws_utils
+from common.cache import TTLCache
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def caches_enabled():
+    """Config and secret caches switched on"""
+    with patch.object(aws_utils._secret_cache, 'ttl_seconds', 300), \
+         patch.object(aws_utils._item_cache, 'ttl_seconds', 60):
+        yield
+
+
+# ============================================================================
+# TTLCache Tests
+# ============================================================================
+
+class TestTTLCache:
+    """Tests for TTLCache"""
+
+    def test_get_returns_stored_value(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert 'a' in cache
+        assert cache.get('missing', 'default') == 'default'
+
+    def test_entries_expire_after_ttl(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+        cache.set('a', 1)
+
+        clock.now += 9.9
+        assert cache.get('a') == 1
+        clock.now += 0.1
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_per_entry_ttl_override(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+        cache.set('short', 1, ttl_seconds=1)
+        cache.set('long', 2)
+
+        clock.now += 5
+        assert cache.get('short') is None
+        assert cache.get('long') == 2
+
+    def test_evicts_least_recently_used(self, clock):
+        cache = TTLCache(max_size=2, ttl_seconds=10, clock=clock)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_get_or_load_loads_once(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+        loader = Mock(return_value='value')
+
+        assert cache.get_or_load('k', loader) == 'value'
+        assert cache.get_or_load('k', loader) == 'value'
+        assert loader.call_count == 1
+
+        clock.now += 10
+        cache.get_or_load('k', loader)
+        assert loader.call_count == 2
+
+    def test_get_or_load_does_not_store_failures(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_load('k', Mock(side_effect=RuntimeError('boom')))
+        assert len(cache) == 0
+
+    def test_invalidate_and_clear(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        assert cache.invalidate('a') is True
+        assert cache.invalidate('a') is False
+        assert cache.get('a') is None
+
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_zero_ttl_disables_cache(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=0, clock=clock)
+        cache.set('a', 1)
+
+        assert not cache.enabled
+        assert cache.get('a') is None
+
+    def test_stats_count_hits_and_misses(self, clock):
+        cache = TTLCache(max_size=4, ttl_seconds=10, clock=clock)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        stats = cache.stats()
+        assert stats['size'] == 1
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+
+# ============================================================================
+# aws_utils cached lookups
+# ============================================================================
+
+class TestCachedSecrets:
+    """Tests for get_secret caching"""
+
+    def _client(self, secret):
+        client = Mock()
+        client.get_secret_value.return_value = {'SecretString': json.dumps(secret)}
+        return client
+
+    def test_secret_fetched_once_while_fresh(self, caches_enabled):
+        client = self._client({'username': 'user', 'password': 'pass'})
+
+        first = aws_utils.get_secret('arn:secret', client=client)
+        second = aws_utils.get_secret('arn:secret', client=client)
+
+        assert first == second == {'username': 'user', 'password': 'pass'}
+        assert client.get_secret_value.call_count == 1
+
+    def test_callers_get_independent_copies(self, caches_enabled):
+        client = self._client({'username': 'user'})
+
+        aws_utils.get_secret('arn:secret', client=client)['username'] = 'changed'
+
+        assert aws_utils.get_secret('arn:secret', client=client)['username'] == 'user'
+
+    def test_invalidate_secret_forces_refetch(self, caches_enabled):
+        client = self._client({'username': 'user'})
+
+        aws_utils.get_secret('arn:secret', client=client)
+        aws_utils.invalidate_secret('arn:secret')
+        aws_utils.get_secret('arn:secret', client=client)
+
+        assert client.get_secret_value.call_count == 2
+
+    def test_use_cache_false_bypasses_cache(self, caches_enabled):
+        client = self._client({'username': 'user'})
+
+        aws_utils.get_secret('arn:secret', client=client, use_cache=False)
+        aws_utils.get_secret('arn:secret', client=client, use_cache=False)
+
+        assert client.get_secret_value.call_count == 2
+
+    def test_cache_disabled_by_default(self):
+        client = self._client({'username': 'user'})
+
+        aws_utils.get_secret('arn:secret', client=client)
+        aws_utils.get_secret('arn:secret', client=client)
+
+        assert client.get_secret_value.call_count == 2
+
+
+class TestCachedItems:
+    """Tests for get_dynamodb_item caching"""
+
+    def _resource(self, response):
+        table = Mock()
+        table.get_item.return_value = response
+        resource = Mock()
+        resource.Table.return_value = table
+        return resource, table
+
+    def test_item_fetched_once_while_fresh(self, caches_enabled):
+        resource, table = self._resource({'Item': {'tenantId': 't1', 'enabled': True}})
+        key = {'tenantId': 't1', 'configType': 'PRODUCT_CONFIG'}
+
+        aws_utils.get_dynamodb_item('config', key, dynamodb_resource=resource, use_cache=True)
+        item = aws_utils.get_dynamodb_item('config', key, dynamodb_resource=resource, use_cache=True)
+
+        assert item == {'tenantId': 't1', 'enabled': True}
+        assert table.get_item.call_count == 1
+
+    def test_missing_item_is_not_cached(self, caches_enabled):
+        resource, table = self._resource({})
+        key = {'tenantId': 't1'}
+
+        for _ in range(2):
+            with pytest.raises(ValueError, match="not found"):
+                aws_utils.get_dynamodb_item('config', key, dynamodb_resource=resource, use_cache=True)
+        assert table.get_item.call_count == 2
+
+    def test_update_invalidates_cached_item(self, caches_enabled):
+        resource, table = self._resource({'Item': {'tenantId': 't1'}})
+        key = {'tenantId': 't1'}
+
+        with patch.object(aws_utils, 'get_dynamodb_resource', return_value=resource):
+            aws_utils.get_dynamodb_item('config', key, use_cache=True)
+            aws_utils.update_dynamodb_item('config', key, {'lastSyncStatus': 'success'})
+            aws_utils.get_dynamodb_item('config', key, use_cache=True)
+
+        assert table.get_item.call_count == 2
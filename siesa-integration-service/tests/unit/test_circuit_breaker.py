@@ -1,6 +1,16 @@
 import pytest
+import os
+import sys
+import threading
 import time
-from src.lambdas.common.circuit_breaker import CircuitBreaker, CircuitState
+from unittest.mock import Mock, patch
+
+# State change metrics import common.metrics the way the Lambdas do
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from src.lambdas.common.circuit_breaker import (
+    CircuitBreaker, CircuitState, circuit_breaker, get_circuit_breaker
+)
 
 
 def test_closed_allows_calls():
@@ -145,3 +155,153 @@ def test_exception_propagation():
     
     with pytest.raises(CustomException):
         cb.call(raise_custom)
+
+
+def test_half_open_allows_one_probe():
+    """Test that concurrent callers cannot all hit a recovering service"""
+    cb = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    cb.state = CircuitState.OPEN
+    cb.last_failure_time = time.time()
+    
+    probe_started = threading.Event()
+    release_probe = threading.Event()
+    
+    def slow_probe():
+        probe_started.set()
+        release_probe.wait(5)
+        return "recovered"
+    
+    results = []
+    worker = threading.Thread(target=lambda: results.append(cb.call(slow_probe)))
+    worker.start()
+    probe_started.wait(5)
+    
+    # A second caller is rejected while the probe is in flight
+    with pytest.raises(Exception, match="HALF_OPEN"):
+        cb.call(lambda: "should not reach")
+    
+    release_probe.set()
+    worker.join(5)
+    
+    assert results == ["recovered"]
+    assert cb.state == CircuitState.CLOSED
+    assert cb.call(lambda: "success") == "success"
+
+
+def test_concurrent_failures_are_all_counted():
+    """Test that failures from many threads are not lost"""
+    cb = CircuitBreaker(failure_threshold=1000)
+    
+    def fail():
+        raise ValueError("boom")
+    
+    def worker():
+        for _ in range(50):
+            with pytest.raises(ValueError):
+                cb.call(fail)
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert cb.failure_count == 400
+
+
+def test_half_open_probe_limit():
+    """Test that half_open_max_calls trial calls can run at once"""
+    cb = CircuitBreaker(failure_threshold=1, recovery_timeout=0, half_open_max_calls=2)
+    cb.state = CircuitState.OPEN
+    cb.last_failure_time = time.time()
+    release = threading.Event()
+    started = threading.Barrier(3)
+    
+    def slow_probe():
+        started.wait(5)
+        release.wait(5)
+        return "ok"
+    
+    workers = [threading.Thread(target=cb.call, args=(slow_probe,)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    started.wait(5)
+    
+    with pytest.raises(Exception, match="HALF_OPEN"):
+        cb.call(lambda: "third probe")
+    
+    release.set()
+    for worker in workers:
+        worker.join(5)
+    assert cb.state == CircuitState.CLOSED
+
+
+def test_state_changes_are_reported():
+    """Test that listeners see every transition, in order"""
+    listener = Mock()
+    cb = CircuitBreaker(failure_threshold=1, recovery_timeout=0, on_state_change=listener)
+    
+    with pytest.raises(ValueError):
+        cb.call(lambda: exec('raise ValueError("down")'))
+    cb.call(lambda: "back")
+    
+    transitions = [(call.args[1], call.args[2]) for call in listener.call_args_list]
+    assert transitions == [
+        (CircuitState.CLOSED, CircuitState.OPEN),
+        (CircuitState.OPEN, CircuitState.HALF_OPEN),
+        (CircuitState.HALF_OPEN, CircuitState.CLOSED)
+    ]
+
+
+def test_listener_errors_do_not_break_calls():
+    """Test that a failing listener does not change the call's outcome"""
+    cb = CircuitBreaker(failure_threshold=1, on_state_change=Mock(side_effect=RuntimeError("metrics down")))
+    
+    with pytest.raises(ValueError):
+        cb.call(lambda: exec('raise ValueError("down")'))
+    
+    assert cb.state == CircuitState.OPEN
+
+
+def test_keyed_breakers_isolate_tenants():
+    """Test that one tenant's broken endpoint does not open another tenant's circuit"""
+    class Client:
+        def __init__(self, tenant_id, base_url, healthy):
+            self.tenant_id = tenant_id
+            self.base_url = base_url
+            self.healthy = healthy
+        
+        @circuit_breaker(failure_threshold=2, recovery_timeout=60,
+                         key=lambda client: (client.tenant_id, client.base_url))
+        def fetch(self):
+            if not self.healthy:
+                raise ConnectionError("endpoint down")
+            return "data"
+    
+    broken = Client('tenant-isolation-a', 'https://a.example.com', healthy=False)
+    healthy = Client('tenant-isolation-b', 'https://b.example.com', healthy=True)
+    
+    with patch('src.lambdas.common.circuit_breaker._publish_state_change', return_value=None):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                broken.fetch()
+        
+        with pytest.raises(Exception, match="Circuit breaker is OPEN"):
+            broken.fetch()
+        assert healthy.fetch() == "data"
+    
+    assert get_circuit_breaker('tenant-isolation-a', 'https://a.example.com', 'fetch').state == CircuitState.OPEN
+    assert get_circuit_breaker('tenant-isolation-b', 'https://b.example.com', 'fetch').state == CircuitState.CLOSED
+
+
+def test_keyed_breaker_publishes_state_metric():
+    """Test that registry breakers export state changes as CircuitBreakerState"""
+    publisher = Mock()
+    breaker = get_circuit_breaker('tenant-metrics', 'https://kong.example.com', 'create_or_update_skus',
+                                  failure_threshold=1)
+    
+    with patch('common.metrics.get_metrics_publisher', return_value=publisher):
+        with pytest.raises(ValueError):
+            breaker.call(lambda: exec('raise ValueError("down")'))
+    
+    publisher.put_circuit_breaker_state.assert_called_once_with('tenant-metrics', 'create_or_update_skus', 'OPEN')
@@ -5,6 +5,11 @@ Tests all functions and classes in extractor/handler.py
 
 import pytest
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
 from unittest.mock import Mock, patch, MagicMock, call
 from datetime import datetime, timezone
 from moto import mock_dynamodb, mock_secretsmanager
@@ -22,6 +27,7 @@ from extractor.handler import (
     get_client_config,
     get_siesa_credentials,
     extract_all_products,
+    extract_products_to_s3,
     lambda_handler
 )
 
@@ -316,6 +322,25 @@ class TestSiesaAPIClient:
         with pytest.raises(requests.exceptions.HTTPError):
             client.get_products(page=1, page_size=100)
     
+    @pytest.mark.parametrize('status_code', [401, 403])
+    @patch('extractor.handler.invalidate_secret')
+    @patch('extractor.handler.requests.Session.get')
+    def test_get_products_rejected_keys_invalidate_secret(self, mock_get, mock_invalidate, status_code,
+                                                          siesa_credentials):
+        """Test rejected keys are dropped from the secret cache so the retry reads them again"""
+        response = Mock(status_code=status_code)
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            f"{status_code} Error", response=response
+        )
+        mock_get.return_value = response
+        
+        client = SiesaAPIClient('https://api.siesa.com', siesa_credentials, '8585', 'API_v2_Items',
+                                credentials_secret_arn='arn:siesa-secret')
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_products(page=1, page_size=100)
+        mock_invalidate.assert_called_once_with('arn:siesa-secret')
+    
     @patch('extractor.handler.requests.Session.get')
     def test_get_products_with_modified_since(self, mock_get, siesa_credentials, sample_products):
         """Test product retrieval with modified_since filter"""
@@ -384,8 +409,10 @@ class TestGetClientConfig:
         mock_table.get_item.return_value = {}
         mock_dynamodb.Table.return_value = mock_table
         
-        with pytest.raises(ValueError, match="not found"):
+        with pytest.raises(ValueError, match="not found") as exc_info:
             get_client_config('non-existent-client')
+        # The table name and key stay out of the error
+        assert str(exc_info.value) == "Client configuration not found for: non-existent-client"
     
     @patch.dict(os.environ, {'CLIENTS_TABLE': 'siesa-integration-config-dev'})
     @patch('extractor.handler.dynamodb')
@@ -709,3 +736,243 @@ class TestLambdaHandler:
         assert result['statusCode'] == 200
         body = json.loads(result['body'])
         assert body['count'] == 250
+
+
+# ============================================================================
+# Concurrent pagination Tests (fake Siesa HTTP server)
+# ============================================================================
+
+
+FAKE_PAGE_SIZE = 5
+FAKE_TOTAL_RECORDS = 37  # 7 full pages + 1 short page
+FAKE_LATENCY = 0.1
+
+
+class _FakeSiesaHandler(BaseHTTPRequestHandler):
+    """Serves ejecutarconsultaestandar pages with a fixed latency"""
+    
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        pagination = dict(part.split('=') for part in query['paginacion'][0].split('|'))
+        page = int(pagination['numPag'])
+        page_size = int(pagination['tamPag'])
+        
+        start = (page - 1) * page_size
+        end = min(start + page_size, FAKE_TOTAL_RECORDS)
+        records = [
+            {'f_codigo': f'PROD{i:04d}', 'f_nombre': f'Product {i}'}
+            for i in range(start, end)
+        ]
+        
+        time.sleep(FAKE_LATENCY)
+        
+        body = json.dumps({'data': records}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_siesa_server():
+    """Run a local fake Siesa API and yield its base URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeSiesaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    
+    server.shutdown()
+    server.server_close()
+
+
+class TestConcurrentExtraction:
+    """Tests for parallel page fetching"""
+    
+    def _client(self, base_url, siesa_credentials, max_workers):
+        return SiesaAPIClient(base_url, siesa_credentials, '8585', 'API_v2_Items', max_workers=max_workers)
+    
+    def test_get_product_pages_keeps_page_order(self, fake_siesa_server, siesa_credentials):
+        """Test that a parallel window is returned in page order"""
+        client = self._client(fake_siesa_server, siesa_credentials, max_workers=4)
+        
+        results = client.get_product_pages(1, 4, page_size=FAKE_PAGE_SIZE)
+        
+        assert [r['pagination']['current_page'] for r in results] == [1, 2, 3, 4]
+        assert results[0]['products'][0]['f_codigo'] == 'PROD0000'
+        assert results[3]['products'][-1]['f_codigo'] == 'PROD0019'
+    
+    def test_get_product_pages_stops_at_short_page(self, fake_siesa_server, siesa_credentials):
+        """Test that pages after the first short page are dropped"""
+        client = self._client(fake_siesa_server, siesa_credentials, max_workers=4)
+        
+        results = client.get_product_pages(7, 4, page_size=FAKE_PAGE_SIZE)
+        
+        assert len(results) == 2
+        assert results[-1]['pagination']['has_more'] is False
+        assert results[-1]['pagination']['records_in_page'] == 2
+    
+    def test_extract_all_products_concurrent(self, fake_siesa_server, siesa_credentials):
+        """Test full concurrent extraction returns every product in order"""
+        client = self._client(fake_siesa_server, siesa_credentials, max_workers=3)
+        
+        with patch('extractor.handler.PAGE_SIZE', FAKE_PAGE_SIZE):
+            products = extract_all_products(client, 'initial')
+        
+        assert len(products) == FAKE_TOTAL_RECORDS
+        assert [p['f_codigo'] for p in products] == [f'PROD{i:04d}' for i in range(FAKE_TOTAL_RECORDS)]
+    
+    @pytest.mark.slow
+    def test_wall_clock_scales_with_concurrency(self, fake_siesa_server, siesa_credentials):
+        """Test that fetching 8 pages gets faster roughly linearly with workers"""
+        timings = {}
+        
+        for workers in (1, 2, 4):
+            client = self._client(fake_siesa_server, siesa_credentials, max_workers=workers)
+            
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = client.get_product_pages(1, 8, page_size=FAKE_PAGE_SIZE, executor=executor)
+            timings[workers] = time.perf_counter() - start
+            
+            assert len(results) == 8
+        
+        # 8 * 100ms sequential; ideal speedups are 2x and 4x
+        assert timings[1] >= 8 * FAKE_LATENCY
+        assert timings[1] / timings[2] > 1.6
+        assert timings[1] / timings[4] > 2.8
+
+
+# ============================================================================
+# S3 output mode Tests
+# ============================================================================
+
+class TestExtractToS3:
+    """Tests for streaming extraction to NDJSON parts"""
+    
+    def test_extract_products_to_s3_writes_one_part_per_page(self, siesa_credentials):
+        """Test that every page becomes a part and only the manifest is returned"""
+        client = SiesaAPIClient('https://api.siesa.com', siesa_credentials, '8585', 'API_v2_Items')
+        pages = [
+            {'products': [{'f_codigo': f'P{p}{i}'} for i in range(3)], 'pagination': {'has_more': p < 2}}
+            for p in range(3)
+        ]
+        
+        mock_writer = Mock()
+        mock_writer.manifest.return_value = {'bucket': 'pipeline', 'parts': [{}, {}, {}], 'total_count': 9}
+        
+        with patch.object(client, 'get_products', side_effect=pages), \
+             patch('extractor.handler.PartWriter', return_value=mock_writer) as mock_writer_class, \
+             patch('extractor.handler.time.sleep'):
+            manifest = extract_products_to_s3(client, 'initial', 'pipeline', 'runs/c/r/extract')
+        
+        mock_writer_class.assert_called_once_with('pipeline', 'runs/c/r/extract')
+        assert mock_writer.write_part.call_count == 3
+        assert mock_writer.write_part.call_args_list[2] == call(pages[2]['products'])
+        assert manifest['total_count'] == 9
+    
+    @patch('extractor.handler.get_client_config')
+    @patch('extractor.handler.get_siesa_credentials')
+    @patch('extractor.handler.extract_products_to_s3')
+    def test_lambda_handler_s3_output_mode(self, mock_extract_s3, mock_get_creds, mock_get_config):
+        """Test that s3 mode returns a manifest instead of the product list"""
+        mock_get_config.return_value = {
+            'siesaConfig': {
+                'baseUrl': 'https://api.siesa.com',
+                'credentialsSecretArn': 'test-secret'
+            },
+            'productType': 'kong'
+        }
+        mock_get_creds.return_value = {'conniKey': 'k', 'conniToken': 't'}
+        mock_extract_s3.return_value = {
+            'bucket': 'pipeline',
+            'prefix': 'runs/test-client/r1/extract',
+            'parts': [{'key': 'runs/test-client/r1/extract/part-00001.ndjson', 'count': 250}],
+            'total_count': 250
+        }
+        
+        with patch('extractor.handler.PIPELINE_BUCKET', 'pipeline'):
+            result = lambda_handler({'client_id': 'test-client', 'output_mode': 's3'}, None)
+        
+        assert result['statusCode'] == 200
+        body = json.loads(result['body'])
+        assert 'products' not in body
+        assert body['count'] == 250
+        assert body['products_manifest']['total_count'] == 250
+        assert mock_extract_s3.call_args[0][2] == 'pipeline'
+        assert mock_extract_s3.call_args[0][3].startswith('runs/test-client/')
+
+    @patch('extractor.handler.get_client_config')
+    @patch('extractor.handler.get_siesa_credentials')
+    @patch('extractor.handler.extract_products_to_s3')
+    @patch('extractor.handler.write_partition_items')
+    def test_lambda_handler_fanout_writes_partitions(self, mock_write_items, mock_extract_s3,
+                                                     mock_get_creds, mock_get_config):
+        """Test that fan-out mode hands the Map state a partition file reference"""
+        mock_get_config.return_value = {
+            'siesaConfig': {'baseUrl': 'https://api.siesa.com', 'credentialsSecretArn': 'test-secret'},
+            'productType': 'kong'
+        }
+        mock_get_creds.return_value = {'conniKey': 'k', 'conniToken': 't'}
+        mock_extract_s3.return_value = {
+            'bucket': 'pipeline',
+            'prefix': 'runs/test-client/r1/extract',
+            'parts': [{'key': f'runs/test-client/r1/extract/part-0000{i}.ndjson', 'count': 100} for i in (1, 2)],
+            'total_count': 200
+        }
+        mock_write_items.return_value = {'bucket': 'pipeline', 'key': 'runs/test-client/r1/partitions.json', 'count': 2}
+
+        with patch('extractor.handler.PIPELINE_BUCKET', 'pipeline'):
+            result = lambda_handler({'client_id': 'test-client', 'output_mode': 's3', 'fanout': True}, None)
+
+        body = json.loads(result['body'])
+        items, bucket, prefix = mock_write_items.call_args[0]
+        assert body['partitions']['key'] == 'runs/test-client/r1/partitions.json'
+        assert 'products_manifest' not in body
+        assert '_provenance' not in body
+        assert [item['partition']['index'] for item in items] == [0, 1]
+        assert items[1]['extraction_timestamp'] == body['extraction_timestamp']
+        assert bucket == 'pipeline'
+        assert prefix.startswith('runs/test-client/') and not prefix.endswith('/extract')
+
+    @patch('extractor.handler.get_client_config')
+    @patch('extractor.handler.get_siesa_credentials')
+    @patch('extractor.handler.extract_products_to_s3')
+    def test_lambda_handler_fanout_raises_on_failure(self, mock_extract_s3, mock_get_creds, mock_get_config):
+        """Test that fan-out mode fails the task instead of handing an error body to the Map state"""
+        mock_get_config.return_value = {
+            'siesaConfig': {'baseUrl': 'https://api.siesa.com', 'credentialsSecretArn': 'test-secret'},
+            'productType': 'kong'
+        }
+        mock_get_creds.return_value = {'conniKey': 'k', 'conniToken': 't'}
+        mock_extract_s3.side_effect = requests.exceptions.ConnectionError("Siesa unreachable")
+        
+        with patch('extractor.handler.PIPELINE_BUCKET', 'pipeline'):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                lambda_handler({'client_id': 'test-client', 'output_mode': 's3', 'fanout': True}, None)
+            with pytest.raises(ValueError, match="Missing required parameter"):
+                lambda_handler({'output_mode': 's3', 'fanout': True}, None)
+            
+            # Direct invocations still get an error response
+            result = lambda_handler({'client_id': 'test-client', 'output_mode': 's3'}, None)
+        
+        assert result['statusCode'] == 500
+        assert json.loads(result['body'])['error'] == 'ConnectionError'
+
+    @patch('extractor.handler.get_client_config')
+    @patch('extractor.handler.get_siesa_credentials')
+    def test_lambda_handler_s3_output_mode_requires_bucket(self, mock_get_creds, mock_get_config):
+        """Test that s3 mode without a bucket is a validation error"""
+        mock_get_config.return_value = {
+            'siesaConfig': {'baseUrl': 'https://api.siesa.com', 'credentialsSecretArn': 'test-secret'}
+        }
+        mock_get_creds.return_value = {'conniKey': 'k', 'conniToken': 't'}
+        
+        with patch('extractor.handler.PIPELINE_BUCKET', ''):
+            result = lambda_handler({'client_id': 'test-client', 'output_mode': 's3'}, None)
+        
+        assert result['statusCode'] == 400
@@ -0,0 +1,338 @@
+"""
+Unit tests for the partitioned fan-out
+Tests common/fanout.py and the partition entry points of the transformer and loader
+"""
+import pytest
+import json
+from unittest.mock import Mock, patch
+from moto import mock_s3
+import boto3
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.fanout import (
+    merge_results,
+    partition_items,
+    partition_manifest,
+    read_map_results,
+    run_fanout,
+    write_partition_items
+)
+from common.provenance import verified_field
+from common.s3_parts import PartWriter, iter_manifest_records
+from loader import handler as loader_handler
+from transformer import handler as transformer_handler
+
+
+BUCKET = 'test-pipeline-bucket'
+KEY = b'test-signing-key'
+
+MAPPINGS = {
+    'mappings': {
+        'product': {
+            'id': {'siesa_field': 'f_codigo', 'type': 'string', 'required': True},
+            'external_id': {'siesa_field': 'f_codigo', 'type': 'string', 'required': True},
+            'sku': {'siesa_field': 'f_codigo', 'type': 'string', 'required': True},
+            'name': {'siesa_field': 'f_nombre', 'type': 'string', 'required': True}
+        }
+    }
+}
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def s3_client(aws_credentials):
+    """Moto S3 client with the pipeline bucket created"""
+    with mock_s3():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        with patch('common.s3_parts.get_s3_client', return_value=client), \
+                patch('common.fanout.get_s3_client', return_value=client):
+            yield client
+
+
+@pytest.fixture
+def extract_output(s3_client):
+    """Extractor response data for five pages of three products"""
+    writer = PartWriter(BUCKET, 'runs/test-client/r1/extract', s3_client=s3_client)
+    for page in range(5):
+        writer.write_part([{'f_codigo': f'P{page}{i}', 'f_nombre': f'Producto {page}-{i}'} for i in range(3)])
+    return {
+        'client_id': 'test-client',
+        'product_type': 'kong',
+        'sync_type': 'initial',
+        'extraction_timestamp': '2024-01-01T00:00:00+00:00',
+        'products_manifest': writer.manifest(),
+        'count': 15
+    }
+
+
+def load_result(index, success, failed=0, load_timestamp='2024-01-01T00:05:00+00:00'):
+    """Loader response of one partition"""
+    return {
+        'client_id': 'test-client',
+        'product_type': 'kong',
+        'sync_id': f'sync-{index}',
+        'status': 'success' if not failed else 'partial',
+        'records_processed': success + failed,
+        'records_success': success,
+        'records_failed': failed,
+        'records_skipped': 0,
+        'failed_records': [{'id': f'P{index}{i}', 'error': 'rejected'} for i in range(failed)],
+        'extraction_timestamp': '2024-01-01T00:00:00+00:00',
+        'transformation_timestamp': '2024-01-01T00:01:00+00:00',
+        'load_timestamp': load_timestamp,
+        'duration_seconds': 10 + index,
+        'partition': {'index': index, 'count': 3, 'offset': index * 10}
+    }
+
+
+# ============================================================================
+# Partitioning Tests
+# ============================================================================
+
+class TestPartitioning:
+    """Tests for partition_manifest and partition_items"""
+
+    def test_groups_consecutive_parts(self, extract_output):
+        partitions = partition_manifest(extract_output['products_manifest'], parts_per_partition=2)
+
+        assert [len(p['parts']) for p in partitions] == [2, 2, 1]
+        assert [p['total_count'] for p in partitions] == [6, 6, 3]
+        assert [p['partition'] for p in partitions] == [
+            {'index': 0, 'count': 3, 'offset': 0},
+            {'index': 1, 'count': 3, 'offset': 6},
+            {'index': 2, 'count': 3, 'offset': 12}
+        ]
+        assert all(p['bucket'] == BUCKET for p in partitions)
+
+    def test_empty_manifest_has_no_partitions(self):
+        manifest = {'bucket': BUCKET, 'prefix': 'runs/c/r/extract', 'parts': [], 'total_count': 0}
+
+        assert partition_manifest(manifest) == []
+
+    def test_items_are_signed_transformer_events(self, extract_output):
+        with patch('common.provenance.get_signing_key', return_value=KEY):
+            items = partition_items(extract_output, parts_per_partition=2)
+
+        assert len(items) == 3
+        for item in items:
+            assert item['client_id'] == 'test-client'
+            assert item['sync_type'] == 'initial'
+            assert 'partition' not in item['products_manifest']
+            assert verified_field(item, 'extract', ('products_manifest',), key=KEY) == 'products_manifest'
+
+    def test_items_round_trip_through_s3(self, s3_client, extract_output):
+        items = partition_items(extract_output, parts_per_partition=2)
+
+        reference = write_partition_items(items, BUCKET, 'runs/test-client/r1')
+
+        assert reference == {'bucket': BUCKET, 'key': 'runs/test-client/r1/partitions.json', 'count': 3}
+        body = s3_client.get_object(Bucket=BUCKET, Key=reference['key'])['Body'].read()
+        assert json.loads(body) == items
+
+
+# ============================================================================
+# Merge Tests
+# ============================================================================
+
+class TestMergeResults:
+    """Tests for merge_results and read_map_results"""
+
+    def test_sums_partition_results(self):
+        summary = merge_results([load_result(1, 10), load_result(0, 8, failed=2)], sync_id='exec-1')
+
+        assert summary['sync_id'] == 'exec-1'
+        assert summary['client_id'] == 'test-client'
+        assert summary['records_processed'] == 20
+        assert summary['records_success'] == 18
+        assert summary['records_failed'] == 2
+        assert summary['status'] == 'partial'
+        assert [r['id'] for r in summary['failed_records']] == ['P00', 'P01']
+        assert summary['duration_seconds'] == 11
+        assert summary['partitions'] == {'total': 2, 'succeeded': 2, 'failed': 0}
+
+    def test_latest_load_timestamp_wins(self):
+        summary = merge_results([
+            load_result(0, 1, load_timestamp='2024-01-01T00:07:00+00:00'),
+            load_result(1, 1, load_timestamp='2024-01-01T00:06:00+00:00')
+        ])
+
+        assert summary['load_timestamp'] == '2024-01-01T00:07:00+00:00'
+        assert summary['status'] == 'success'
+
+    def test_failed_partitions_make_the_sync_partial(self):
+        summary = merge_results([load_result(0, 5)], [{'partition': 1, 'error': 'States.TaskFailed', 'cause': 'boom'}])
+
+        assert summary['status'] == 'partial'
+        assert summary['partitions'] == {'total': 2, 'succeeded': 1, 'failed': 1}
+        assert summary['failed_partitions'][0]['partition'] == 1
+
+    def test_reads_result_writer_output(self, s3_client):
+        prefix = 'map-results/run-1'
+        succeeded = [{'Status': 'SUCCEEDED', 'Input': '{}', 'Output': json.dumps(load_result(0, 3))}]
+        failed = [{
+            'Status': 'FAILED',
+            'Input': json.dumps({'partition': {'index': 1}}),
+            'Error': 'States.TaskFailed',
+            'Cause': 'Transformer Lambda failed'
+        }]
+        s3_client.put_object(Bucket=BUCKET, Key=f'{prefix}/SUCCEEDED_0.json', Body=json.dumps(succeeded))
+        s3_client.put_object(Bucket=BUCKET, Key=f'{prefix}/FAILED_0.json', Body=json.dumps(failed))
+        s3_client.put_object(Bucket=BUCKET, Key=f'{prefix}/manifest.json', Body=json.dumps({
+            'DestinationBucket': BUCKET,
+            'ResultFiles': {
+                'SUCCEEDED': [{'Key': f'{prefix}/SUCCEEDED_0.json', 'Size': 1}],
+                'FAILED': [{'Key': f'{prefix}/FAILED_0.json', 'Size': 1}],
+                'PENDING': []
+            }
+        }))
+
+        outputs, failures = read_map_results(BUCKET, f'{prefix}/manifest.json')
+
+        assert [o['records_success'] for o in outputs] == [3]
+        assert failures == [{'partition': 1, 'error': 'States.TaskFailed', 'cause': 'Transformer Lambda failed'}]
+
+
+# ============================================================================
+# Local fan-out Tests
+# ============================================================================
+
+def fake_adapter():
+    """Adapter that accepts every streamed product"""
+    def process_stream(products, batch_size, sizer=None):
+        count = len(list(products))
+        return {'total_processed': count, 'total_success': count, 'total_failed': 0,
+                'validation_errors': [], 'record_errors': []}
+
+    adapter = Mock()
+    adapter.process_stream.side_effect = process_stream
+    return adapter
+
+
+@pytest.fixture(autouse=True)
+def metrics():
+    """Metrics publisher stand-in (the handlers would call CloudWatch)"""
+    publisher = Mock()
+    with patch('transformer.handler.get_metrics_publisher', return_value=publisher), \
+            patch('loader.handler.get_metrics_publisher', return_value=publisher):
+        yield publisher
+
+
+@pytest.fixture
+def loader_mocks():
+    """Loader dependencies outside S3"""
+    with patch('loader.handler.get_client_config', return_value={'productConfig': {'credentialsSecretArn': 'arn'}}), \
+            patch('loader.handler.get_product_credentials', return_value={}), \
+            patch('loader.handler.AdapterFactory.create_adapter', side_effect=lambda **kwargs: fake_adapter()), \
+            patch('loader.handler.update_sync_status') as update_status:
+        yield update_status
+
+
+class TestRunFanout:
+    """Tests for the in-process fan-out runner with the real entry points"""
+
+    def test_transforms_and_loads_every_partition(self, s3_client, extract_output, loader_mocks):
+        with patch('transformer.handler.load_field_mappings', return_value=MAPPINGS):
+            summary = run_fanout(
+                extract_output,
+                transform=lambda event: transformer_handler.lambda_handler(event, None),
+                load=lambda event: loader_handler.lambda_handler(event, None),
+                max_concurrency=3,
+                parts_per_partition=2,
+                sync_id='exec-1'
+            )
+
+        assert summary['status'] == 'success'
+        assert summary['records_success'] == 15
+        assert summary['partitions'] == {'total': 3, 'succeeded': 3, 'failed': 0}
+        # Partitions only report their counts; the sync status is written once merged
+        loader_mocks.assert_not_called()
+
+        keys = [obj['Key'] for obj in s3_client.list_objects_v2(Bucket=BUCKET, Prefix='runs/test-client/r1/transform/')['Contents']]
+        assert len(keys) == 5
+        assert {key.split('/')[4] for key in keys} == {'partition-00000', 'partition-00001', 'partition-00002'}
+
+    def test_failed_partition_does_not_stop_the_others(self, s3_client, extract_output, loader_mocks):
+        def transform(event):
+            if event['partition']['index'] == 1:
+                raise Exception("Transformer Lambda failed: boom")
+            return transformer_handler.lambda_handler(event, None)
+
+        with patch('transformer.handler.load_field_mappings', return_value=MAPPINGS):
+            summary = run_fanout(extract_output, transform=transform,
+                                 load=lambda event: loader_handler.lambda_handler(event, None),
+                                 parts_per_partition=2)
+
+        assert summary['status'] == 'partial'
+        assert summary['records_success'] == 9
+        assert summary['failed_partitions'][0]['partition'] == 1
+
+    def test_transformer_keeps_global_product_indexes(self, s3_client, extract_output):
+        # The second partition holds pages 2 and 3, products 6 to 11
+        item = partition_items(extract_output, parts_per_partition=2)[1]
+
+        with patch('transformer.handler.load_field_mappings', return_value=MAPPINGS), \
+                patch('transformer.handler.transform_products', wraps=transformer_handler.transform_products) as transform:
+            result = transformer_handler.lambda_handler(item, None)
+
+        assert [call.kwargs['offset'] for call in transform.call_args_list] == [6, 9]
+        assert result['partition'] == {'index': 1, 'count': 3, 'offset': 6}
+        assert [p['id'] for p in iter_manifest_records(result['canonical_manifest'])] == ['P20', 'P21', 'P22', 'P30', 'P31', 'P32']
+
+
+# ============================================================================
+# merge_results_handler() Tests
+# ============================================================================
+
+class TestMergeResultsHandler:
+    """Tests for the loader's merge entry point"""
+
+    def test_writes_one_sync_status(self):
+        event = {
+            'client_id': 'test-client',
+            'product_type': 'kong',
+            'sync_type': 'full',
+            'sync_id': 'exec-1',
+            'results': [load_result(0, 4), load_result(1, 6)]
+        }
+
+        with patch('loader.handler.update_sync_status') as update_status:
+            summary = loader_handler.merge_results_handler(event, None)
+
+        update_status.assert_called_once_with(client_id='test-client', status='success',
+                                              records_success=10, records_failed=0)
+        assert summary['sync_id'] == 'exec-1'
+        assert summary['records_success'] == 10
+
+    def test_clean_sync_advances_high_water_mark(self):
+        event = {
+            'client_id': 'test-client',
+            'sync_type': 'incremental',
+            'sync_id': 'exec-1',
+            'results': [load_result(0, 4)]
+        }
+
+        with patch('loader.handler.update_sync_status'), \
+                patch('loader.handler.SYNC_STATE_TABLE', 'sync-state'), \
+                patch('loader.handler.ProductHashStore') as store:
+            loader_handler.merge_results_handler(event, None)
+            loader_handler.merge_results_handler({**event, 'results': [load_result(0, 3, failed=1)]}, None)
+
+        store.return_value.set_high_water_mark.assert_called_once_with('2024-01-01T00:00:00+00:00', 'exec-1')
+
+    def test_no_partitions_merge_to_empty_sync(self):
+        with patch('loader.handler.update_sync_status'):
+            summary = loader_handler.merge_results_handler(
+                {'client_id': 'test-client', 'product_type': 'kong', 'results': []}, None
+            )
+
+        assert summary['status'] == 'success'
+        assert summary['records_processed'] == 0
+        assert summary['product_type'] == 'kong'
@@ -18,10 +18,12 @@ from loader.handler import (
     get_client_config,
     update_sync_status,
     get_product_credentials,
+    create_batch_sizer,
     lambda_handler
 )
 from loader.adapters.kong_adapter import KongAPIClient, KongAdapter
 from loader.adapters.adapter_factory import AdapterFactory
+from common.rate_limiter import TokenBucket
 
 
 # ============================================================================
@@ -127,6 +129,100 @@ class TestKongAPIClient:
             client.authenticate()
 
 
+def _kong_response(status_code, data=None):
+    """Mock Kong response whose raise_for_status matches its status code"""
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = data or {}
+    response.text = json.dumps(data or {})
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            f"{status_code} Error", response=response
+        )
+    return response
+
+
+class TestKongSessionReuse:
+    """Tests for sessions and tokens shared across invocations"""
+    
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_token_reused_by_later_clients(self, mock_post, kong_credentials):
+        """Test a warm invocation reuses the session and skips the login"""
+        mock_post.return_value = _kong_response(200, {'auth_token': 'token-1'})
+        
+        first = KongAPIClient('https://api.kong.com', kong_credentials)
+        first.authenticate()
+        second = KongAPIClient('https://api.kong.com/', kong_credentials)
+        second.authenticate()
+        
+        assert second.token == 'token-1'
+        assert second.session is first.session
+        assert mock_post.call_count == 1
+    
+    def test_sessions_are_kept_per_user(self, kong_credentials):
+        """Test other users of the same API get their own session"""
+        first = KongAPIClient('https://api.kong.com', kong_credentials)
+        other = KongAPIClient('https://api.kong.com', {**kong_credentials, 'username': 'other_user'})
+        
+        assert other.session is not first.session
+    
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_reauthenticates_once_on_401(self, mock_post, kong_credentials):
+        """Test an expired token is replaced and the upload retried"""
+        mock_post.side_effect = [
+            _kong_response(401, {'detail': 'Invalid token.'}),
+            _kong_response(200, {'auth_token': 'token-2'}),
+            _kong_response(200, {'count': 1})
+        ]
+        
+        client = KongAPIClient('https://api.kong.com', kong_credentials)
+        client.token = 'expired'
+        result = client.create_or_update_skus([{'external_id': 'SKU001'}])
+        
+        assert result['success'] is True
+        assert client.token == 'token-2'
+        assert 'auth/token/login' in mock_post.call_args_list[1][0][0]
+        assert mock_post.call_args_list[2][1]['headers']['Authorization'] == 'Token token-2'
+    
+    @patch('loader.adapters.kong_adapter.get_secret')
+    @patch('loader.adapters.kong_adapter.invalidate_secret')
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_401_rereads_credentials_secret(self, mock_post, mock_invalidate, mock_get_secret, kong_credentials):
+        """Test re-authenticating after a 401 uses the credentials as now stored in the secret"""
+        mock_get_secret.return_value = {**kong_credentials, 'password': 'rotated_pass'}
+        mock_post.side_effect = [
+            _kong_response(401, {'detail': 'Invalid token.'}),
+            _kong_response(200, {'auth_token': 'token-2'}),
+            _kong_response(200, {'count': 1})
+        ]
+        
+        client = KongAPIClient('https://api.kong.com', kong_credentials, credentials_secret_arn='arn:kong-secret')
+        client.token = 'expired'
+        result = client.create_or_update_skus([{'external_id': 'SKU001'}])
+        
+        assert result['success'] is True
+        mock_invalidate.assert_called_once_with('arn:kong-secret')
+        mock_get_secret.assert_called_once_with('arn:kong-secret')
+        assert mock_post.call_args_list[1][1]['json']['password'] == 'rotated_pass'
+    
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_repeated_401_fails_batch(self, mock_post, kong_credentials):
+        """Test a token rejected again after re-authenticating fails the batch"""
+        mock_post.side_effect = [
+            _kong_response(401, {'detail': 'Invalid token.'}),
+            _kong_response(200, {'auth_token': 'token-2'}),
+            _kong_response(401, {'detail': 'Invalid token.'})
+        ]
+        
+        client = KongAPIClient('https://api.kong.com', kong_credentials)
+        client.token = 'expired'
+        result = client.create_or_update_skus([{'external_id': 'SKU001'}])
+        
+        assert result['success'] is False
+        assert result['status_code'] == 401
+        assert mock_post.call_count == 3
+
+
 # ============================================================================
 # KongAPIClient Tests - 4 tests for create_or_update_skus()
 # ============================================================================
@@ -229,6 +325,59 @@ class TestKongAPIClientSKUs:
         
         assert result['success'] is True
         assert result['records_processed'] == 50
+    
+    @pytest.mark.parametrize('status_code,overloaded', [(413, True), (502, True), (400, False)])
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_create_or_update_skus_flags_overload(self, mock_post, status_code, overloaded, kong_credentials):
+        """Test that payload-too-large and server errors ask for smaller batches"""
+        mock_response = Mock()
+        mock_response.status_code = status_code
+        mock_response.text = "Error"
+        mock_response.json.return_value = {'error': 'Error'}
+        mock_post.side_effect = requests.exceptions.HTTPError(response=mock_response)
+        
+        client = KongAPIClient('https://api.kong.com', kong_credentials)
+        client.token = 'valid_token'
+        
+        result = client.create_or_update_skus([{'external_id': 'PROD001', 'name': 'Product 1'}])
+        
+        assert result['status_code'] == status_code
+        assert result['overloaded'] is overloaded
+        assert result['duration_seconds'] >= 0
+    
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_create_or_update_skus_timeout_is_overload(self, mock_post, kong_credentials):
+        """Test that a timed out upload asks for smaller batches"""
+        mock_post.side_effect = requests.exceptions.ReadTimeout("Read timed out")
+        
+        client = KongAPIClient('https://api.kong.com', kong_credentials)
+        client.token = 'valid_token'
+        
+        result = client.create_or_update_skus([{'external_id': 'PROD001', 'name': 'Product 1'}])
+        
+        assert result['success'] is False
+        assert result['overloaded'] is True
+    
+    @patch('loader.adapters.kong_adapter.RATE_LIMIT_TIMEOUT', 0.01)
+    @patch('loader.adapters.kong_adapter.requests.Session.post')
+    def test_create_or_update_skus_waits_for_shared_rate_limit(self, mock_post, kong_credentials):
+        """Test that uploads draw from the tenant's token bucket"""
+        mock_response = Mock()
+        mock_response.json.return_value = {'status': 'success'}
+        mock_response.raise_for_status = Mock()
+        mock_post.return_value = mock_response
+        
+        client = KongAPIClient('https://api.kong.com', kong_credentials,
+                               rate_limiter=TokenBucket(1, 60, ('test-client', 'kong')))
+        client.token = 'valid_token'
+        skus = [{'external_id': 'PROD001', 'name': 'Product 1'}]
+        
+        assert client.create_or_update_skus(skus)['success'] is True
+        result = client.create_or_update_skus(skus)
+        
+        assert result['success'] is False
+        assert result['overloaded'] is True
+        assert mock_post.call_count == 1
 
 
 # ============================================================================
@@ -474,8 +623,27 @@ class TestGetClientConfig:
         mock_table.get_item.return_value = {}
         mock_dynamodb.Table.return_value = mock_table
         
-        with pytest.raises(ValueError, match="not found"):
+        with pytest.raises(ValueError, match="not found") as exc_info:
             get_client_config('non-existent-client')
+        # The table name and key stay out of the error
+        assert str(exc_info.value) == "Client configuration not found for: non-existent-client"
+
+    @patch('loader.handler.dynamodb')
+    def test_get_client_config_reused_across_invocations(self, mock_dynamodb, client_config):
+        """Test warm invocations serve the config from the cache until the status update"""
+        from common import aws_utils
+        mock_table = Mock()
+        mock_table.get_item.return_value = {'Item': client_config}
+        mock_dynamodb.Table.return_value = mock_table
+        
+        with patch.object(aws_utils._item_cache, 'ttl_seconds', 60):
+            assert get_client_config('test-client') == client_config
+            assert get_client_config('test-client') == client_config
+            assert mock_table.get_item.call_count == 1
+            
+            update_sync_status('test-client', 'success', 1, 0)
+            get_client_config('test-client')
+            assert mock_table.get_item.call_count == 2
 
 
 # ============================================================================
@@ -639,3 +807,241 @@ class TestLambdaHandler:
         
         assert result['status'] == 'success'
         assert result['records_success'] == 100
+    
+    @patch('loader.handler.get_client_config')
+    @patch('loader.handler.get_product_credentials')
+    @patch('loader.handler.update_sync_status')
+    @patch('loader.handler.AdapterFactory.create_adapter')
+    @patch('loader.handler.iter_manifest_records')
+    def test_lambda_handler_canonical_manifest(self, mock_iter_records, mock_create_adapter,
+                                               mock_update_status, mock_get_credentials,
+                                               mock_get_config, client_config, kong_credentials,
+                                               sample_canonical_products):
+        """Test that a manifest is streamed to the adapter instead of loaded as a list"""
+        mock_get_config.return_value = client_config
+        mock_get_credentials.return_value = kong_credentials
+        mock_iter_records.return_value = iter(sample_canonical_products)
+        
+        mock_adapter = Mock()
+        mock_adapter.process_stream.return_value = {
+            'total_input': 2,
+            'total_valid': 2,
+            'total_processed': 2,
+            'total_success': 2,
+            'total_failed': 0,
+            'validation_errors': [],
+            'batch_results': []
+        }
+        mock_create_adapter.return_value = mock_adapter
+        
+        manifest = {
+            'bucket': 'pipeline',
+            'prefix': 'runs/test-client/r1/transform',
+            'parts': [{'key': 'runs/test-client/r1/transform/part-00001.ndjson', 'count': 2, 'sha256': 'abc'}],
+            'total_count': 2
+        }
+        event = {'client_id': 'test-client', 'canonical_manifest': manifest, 'count': 2}
+        
+        result = lambda_handler(event, None)
+        
+        assert result['status'] == 'success'
+        assert result['records_success'] == 2
+        mock_adapter.process_batch.assert_not_called()
+        mock_iter_records.assert_called_once_with(manifest)
+        assert mock_adapter.process_stream.call_args[1]['batch_size'] == 100
+    
+    @patch('loader.handler.get_client_config')
+    def test_lambda_handler_empty_manifest(self, mock_get_config):
+        """Test that an empty manifest short-circuits like an empty list"""
+        manifest = {'bucket': 'pipeline', 'prefix': 'runs/c/r/transform', 'parts': [], 'total_count': 0}
+        
+        result = lambda_handler({'client_id': 'test-client', 'canonical_manifest': manifest}, None)
+        
+        assert result['status'] == 'success'
+        assert result['records_processed'] == 0
+        mock_get_config.assert_not_called()
+    
+    @patch('loader.handler.SYNC_STATE_TABLE', 'sync-state-test')
+    @patch('loader.handler.ProductHashStore')
+    @patch('loader.handler.get_client_config')
+    @patch('loader.handler.get_product_credentials')
+    @patch('loader.handler.update_sync_status')
+    @patch('loader.handler.AdapterFactory.create_adapter')
+    def test_lambda_handler_incremental_skips_unchanged(self, mock_create_adapter, mock_update_status,
+                                                        mock_get_credentials, mock_get_config,
+                                                        mock_store_class, client_config, kong_credentials,
+                                                        sample_canonical_products):
+        """Test that an incremental sync only loads products whose hash changed"""
+        from common.sync_state import product_hash
+        
+        mock_get_config.return_value = client_config
+        mock_get_credentials.return_value = kong_credentials
+        
+        mock_store = Mock()
+        mock_store.get_hashes.return_value = {'PROD001': product_hash(sample_canonical_products[0])}
+        mock_store.get_high_water_mark.return_value = '2025-12-01T00:00:00+00:00'
+        mock_store_class.return_value = mock_store
+        
+        mock_adapter = Mock()
+        mock_adapter.process_batch.return_value = {
+            'total_input': 1,
+            'total_valid': 1,
+            'total_processed': 1,
+            'total_success': 1,
+            'total_failed': 0,
+            'validation_errors': [],
+            'batch_results': [],
+            'failed_product_ids': []
+        }
+        mock_create_adapter.return_value = mock_adapter
+        
+        event = {
+            'client_id': 'test-client',
+            'canonical_products': sample_canonical_products,
+            'sync_type': 'incremental',
+            'extraction_timestamp': '2026-01-01T00:00:00+00:00'
+        }
+        
+        result = lambda_handler(event, None)
+        
+        loaded = mock_adapter.process_batch.call_args[0][0]
+        assert [p['external_id'] for p in loaded] == ['PROD002']
+        assert result['records_skipped'] == 1
+        mock_store.put_hashes.assert_called_once_with({'PROD002': product_hash(sample_canonical_products[1])})
+        mock_store.get_high_water_mark.assert_called_once()
+        mock_store.set_high_water_mark.assert_called_once()
+    
+    @patch('loader.handler.SYNC_STATE_TABLE', 'sync-state-test')
+    @patch('loader.handler.ProductHashStore')
+    @patch('loader.handler.get_client_config')
+    @patch('loader.handler.get_product_credentials')
+    @patch('loader.handler.update_sync_status')
+    @patch('loader.handler.AdapterFactory.create_adapter')
+    def test_lambda_handler_initial_sync_records_hashes(self, mock_create_adapter, mock_update_status,
+                                                        mock_get_credentials, mock_get_config,
+                                                        mock_store_class, client_config, kong_credentials,
+                                                        sample_canonical_products):
+        """Test that an initial sync loads everything and skips failed products when storing hashes"""
+        mock_get_config.return_value = client_config
+        mock_get_credentials.return_value = kong_credentials
+        
+        mock_store = Mock()
+        mock_store_class.return_value = mock_store
+        
+        mock_adapter = Mock()
+        mock_adapter.process_batch.return_value = {
+            'total_input': 2,
+            'total_valid': 1,
+            'total_processed': 1,
+            'total_success': 1,
+            'total_failed': 1,
+            'validation_errors': [{'index': 0, 'product_id': 'PROD001', 'error': 'Missing name'}],
+            'batch_results': [],
+            'failed_product_ids': ['PROD001']
+        }
+        mock_create_adapter.return_value = mock_adapter
+        
+        event = {
+            'client_id': 'test-client',
+            'canonical_products': sample_canonical_products,
+            'sync_type': 'initial'
+        }
+        
+        result = lambda_handler(event, None)
+        
+        assert len(mock_adapter.process_batch.call_args[0][0]) == 2
+        mock_store.get_hashes.assert_not_called()
+        assert list(mock_store.put_hashes.call_args[0][0]) == ['PROD002']
+        assert result['status'] == 'partial'
+        assert result['records_skipped'] == 0
+    
+    @patch('loader.handler.ADAPTIVE_BATCH_SIZE', True)
+    @patch('loader.handler.get_metrics_publisher')
+    @patch('loader.handler.get_client_config')
+    @patch('loader.handler.get_product_credentials')
+    @patch('loader.handler.update_sync_status')
+    @patch('loader.handler.AdapterFactory.create_adapter')
+    def test_lambda_handler_adaptive_batch_size(self, mock_create_adapter, mock_update_status,
+                                                mock_get_credentials, mock_get_config, mock_get_metrics,
+                                                client_config, kong_credentials, sample_canonical_products):
+        """Test that the adaptive sizer is passed to the adapter and its sizes reported"""
+        mock_get_config.return_value = client_config
+        mock_get_credentials.return_value = kong_credentials
+        
+        mock_adapter = Mock()
+        mock_adapter.process_batch.return_value = {
+            'total_input': 2,
+            'total_valid': 2,
+            'total_processed': 2,
+            'total_success': 2,
+            'total_failed': 0,
+            'validation_errors': [],
+            'batch_results': [],
+            'batch_sizing': {'initial_size': 100, 'final_size': 150, 'min_size_used': 100,
+                             'max_size_used': 150, 'decreases': 0, 'p95_latency_ms': 800}
+        }
+        mock_create_adapter.return_value = mock_adapter
+        
+        result = lambda_handler({'client_id': 'test-client', 'canonical_products': sample_canonical_products}, None)
+        
+        assert mock_adapter.process_batch.call_args[1]['sizer'].size == 100
+        assert result['batch_sizing']['final_size'] == 150
+        mock_get_metrics.return_value.put_effective_batch_size.assert_called_once_with('test-client', 'kong', 150)
+    
+    @patch('loader.handler.get_client_config')
+    @patch('loader.handler.get_product_credentials')
+    @patch('loader.handler.update_sync_status')
+    @patch('loader.handler.AdapterFactory.create_adapter')
+    def test_lambda_handler_reports_isolated_records(self, mock_create_adapter, mock_update_status,
+                                                     mock_get_credentials, mock_get_config,
+                                                     client_config, kong_credentials, sample_canonical_products):
+        """Test that records isolated by bisection are listed as failed records"""
+        mock_get_config.return_value = client_config
+        mock_get_credentials.return_value = kong_credentials
+        
+        mock_adapter = Mock()
+        mock_adapter.process_batch.return_value = {
+            'total_input': 2,
+            'total_valid': 2,
+            'total_processed': 2,
+            'total_success': 1,
+            'total_failed': 1,
+            'validation_errors': [],
+            'record_errors': [{'product_id': 'PROD002', 'error': 'invalid sku'}],
+            'batch_results': [],
+            'failed_product_ids': ['PROD002']
+        }
+        mock_create_adapter.return_value = mock_adapter
+        
+        event = {'client_id': 'test-client', 'canonical_products': sample_canonical_products}
+        with patch.dict(client_config['productConfig'], {'bisectMaxCalls': 8}):
+            result = lambda_handler(event, None)
+        
+        assert mock_create_adapter.call_args[1]['max_bisect_calls'] == 8
+        assert result['status'] == 'partial'
+        assert result['failed_records'] == [{'id': 'PROD002', 'error': 'invalid sku'}]
+
+
+# ============================================================================
+# create_batch_sizer() Tests
+# ============================================================================
+
+class TestCreateBatchSizer:
+    """Tests for per-client adaptive batch sizing configuration"""
+    
+    def test_disabled_by_default(self):
+        """Test that fixed-size batches are kept unless enabled"""
+        assert create_batch_sizer({}) is None
+    
+    @patch('loader.handler.ADAPTIVE_BATCH_SIZE', True)
+    def test_client_overrides(self):
+        """Test that productConfig can tune or switch off the sizer"""
+        sizer = create_batch_sizer({'batchSizeMax': 400, 'batchTargetLatencyMs': 2500})
+        
+        assert sizer.max_size == 400
+        assert sizer.target_latency_seconds == 2.5
+        assert create_batch_sizer({'adaptiveBatchSize': False}) is None
+    
+    def test_client_can_opt_in(self):
+        """Test enabling the sizer for one client"""
+        assert create_batch_sizer({'adaptiveBatchSize': 'true'}) is not None
@@ -1,7 +1,19 @@
 import pytest
+import json
 from unittest.mock import Mock, patch, call
 from datetime import datetime
-from src.lambdas.common.metrics import MetricsPublisher, get_metrics_publisher
+from src.lambdas.common.metrics import MetricsPublisher, flush_metrics, get_metrics_publisher
+
+
+class StubCloudWatch:
+    """Local stand-in for the CloudWatch client that records PutMetricData requests"""
+    
+    def __init__(self):
+        self.requests = []
+    
+    def put_metric_data(self, Namespace, MetricData):
+        assert len(MetricData) <= 1000
+        self.requests.append({'Namespace': Namespace, 'MetricData': MetricData})
 
 
 class TestMetricsPublisher:
@@ -202,6 +214,125 @@ class TestMetricsPublisher:
         
         assert metric_data['MetricName'] == 'ValidationErrors'
         assert metric_data['Value'] == 5
+    
+    @patch('src.lambdas.common.metrics.boto3.client')
+    def test_put_stage_timing(self, mock_boto_client):
+        """Test stage histogram metrics"""
+        mock_cw = Mock()
+        mock_boto_client.return_value = mock_cw
+        
+        publisher = MetricsPublisher()
+        publisher.put_stage_timing('client1', 'sanitize', {
+            'count': 10, 'sum_ms': 25.0, 'p50_ms': 2.0, 'p95_ms': 5.0, 'p99_ms': 6.0
+        })
+        
+        published = {c[1]['MetricData'][0]['MetricName']: c[1]['MetricData'][0] for c in mock_cw.put_metric_data.call_args_list}
+        assert set(published) == {'StageCalls', 'StageTime', 'StageLatencyP50', 'StageLatencyP95', 'StageLatencyP99'}
+        assert published['StageLatencyP95']['Value'] == 5.0
+        assert published['StageLatencyP95']['Unit'] == 'Milliseconds'
+        assert {'Name': 'Stage', 'Value': 'sanitize'} in published['StageTime']['Dimensions']
+
+
+class TestBufferedMetrics:
+    """Tests for buffered and EMF publishing"""
+    
+    @pytest.fixture
+    def cloudwatch(self):
+        stub = StubCloudWatch()
+        with patch('src.lambdas.common.metrics.boto3.client', return_value=stub):
+            yield stub
+    
+    def test_buffered_metrics_wait_for_flush(self, cloudwatch):
+        """Test that recording a metric makes no API call"""
+        publisher = MetricsPublisher(mode='buffered')
+        
+        publisher.put_sync_duration('client1', 1.5)
+        publisher.put_records_processed('client1', 10, True)
+        
+        assert cloudwatch.requests == []
+        publisher.flush()
+        assert len(cloudwatch.requests) == 1
+        assert len(cloudwatch.requests[0]['MetricData']) == 2
+    
+    def test_identical_metrics_become_statistic_sets(self, cloudwatch):
+        """Test that values for the same metric and dimensions are aggregated"""
+        publisher = MetricsPublisher(mode='buffered')
+        
+        for value in (3, 1, 8):
+            publisher.put_metric('RecordsProcessed', value, dimensions={'ClientId': 'client1'})
+        publisher.put_metric('RecordsProcessed', 5, dimensions={'ClientId': 'client2'})
+        publisher.flush()
+        
+        data = cloudwatch.requests[0]['MetricData']
+        assert len(data) == 2
+        assert data[0]['StatisticValues'] == {'SampleCount': 3, 'Sum': 12, 'Minimum': 1, 'Maximum': 8}
+        assert data[0]['Dimensions'] == [{'Name': 'ClientId', 'Value': 'client1'}]
+        assert 'Value' not in data[0]
+    
+    def test_flush_is_split_into_api_sized_requests(self, cloudwatch):
+        """Test that large flushes respect the 1000 metrics per request limit"""
+        publisher = MetricsPublisher(mode='buffered', flush_threshold=5000)
+        
+        for i in range(2500):
+            publisher.put_metric('ApiCallDuration', 0.1, dimensions={'ClientId': f'client{i}'})
+        publisher.flush()
+        
+        assert [len(r['MetricData']) for r in cloudwatch.requests] == [1000, 1000, 500]
+    
+    def test_full_buffer_flushes_early(self, cloudwatch):
+        """Test that the size threshold bounds the buffer"""
+        publisher = MetricsPublisher(mode='buffered', flush_threshold=3)
+        
+        for i in range(3):
+            publisher.put_metric('ErrorCount', 1, dimensions={'ErrorType': f'E{i}'})
+        
+        assert len(cloudwatch.requests) == 1
+    
+    def test_flush_errors_are_swallowed(self, cloudwatch):
+        """Test that metrics failures never break the handler"""
+        publisher = MetricsPublisher(mode='buffered')
+        cloudwatch.put_metric_data = Mock(side_effect=Exception("throttled"))
+        
+        publisher.put_metric('ErrorCount', 1)
+        publisher.flush()
+    
+    def test_emf_writes_stdout_without_api_calls(self, capsys):
+        """Test Embedded Metric Format documents, one per dimension set"""
+        with patch('src.lambdas.common.metrics.boto3.client') as mock_boto_client:
+            publisher = MetricsPublisher(mode='emf')
+            publisher.put_records_processed('client1', 10, True)
+            publisher.put_records_processed('client1', 4, True)
+            publisher.put_error_count('client1', 'ValueError')
+            publisher.flush()
+        
+        mock_boto_client.assert_not_called()
+        documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert len(documents) == 2
+        
+        records = next(d for d in documents if 'RecordsProcessed' in d)
+        directive = records['_aws']['CloudWatchMetrics'][0]
+        assert directive['Namespace'] == 'SiesaIntegration'
+        assert directive['Dimensions'] == [['ClientId', 'Status']]
+        assert directive['Metrics'] == [{'Name': 'RecordsProcessed', 'Unit': 'Count'}]
+        assert records['RecordsProcessed'] == [10, 4]
+        assert records['ClientId'] == 'client1'
+        assert records['Status'] == 'Success'
+    
+    def test_flush_metrics_decorator(self, cloudwatch):
+        """Test that handlers flush buffered metrics even when they raise"""
+        import src.lambdas.common.metrics as metrics_module
+        publisher = MetricsPublisher(mode='buffered')
+        
+        @flush_metrics
+        def handler(event, context):
+            publisher.put_metric('ErrorCount', 1)
+            raise ValueError("boom")
+        
+        with patch.object(metrics_module, '_metrics_publisher', publisher):
+            with pytest.raises(ValueError):
+                handler({}, None)
+        
+        assert len(cloudwatch.requests) == 1
 
 
 class TestGetMetricsPublisher:
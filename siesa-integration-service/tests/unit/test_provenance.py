@@ -0,0 +1,119 @@
+"""
+Unit tests for pipeline payload provenance
+Tests common/provenance.py
+"""
+import pytest
+import copy
+from unittest.mock import patch
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.input_validation import ValidationError
+from common.provenance import (
+    PROVENANCE_FIELD,
+    sanitize_event,
+    sign_payload,
+    verified_field
+)
+
+
+KEY = b'test-signing-key'
+PRODUCT_FIELDS = ('products', 'products_manifest')
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def signed_event():
+    """Extractor output with already sanitized products"""
+    event = {
+        'client_id': 'test-client',
+        'sync_type': 'incremental',
+        'products': [{'f_codigo': 'P1', 'f_nombre': 'Zapato &amp; Cia'}]
+    }
+    return sign_payload(event, 'products', stage='extract', key=KEY)
+
+
+# ============================================================================
+# sign_payload() / verified_field() Tests
+# ============================================================================
+
+class TestSignature:
+    """Tests for signing and verifying payloads"""
+
+    def test_round_trip(self, signed_event):
+        """Test that a signed payload verifies for the expected stage"""
+        assert signed_event[PROVENANCE_FIELD]['field'] == 'products'
+        assert verified_field(signed_event, 'extract', PRODUCT_FIELDS, key=KEY) == 'products'
+
+    def test_tampered_payload_is_rejected(self, signed_event):
+        """Test that changing any product invalidates the signature"""
+        signed_event['products'][0]['f_nombre'] = '<script>alert(1)</script>'
+
+        assert verified_field(signed_event, 'extract', PRODUCT_FIELDS, key=KEY) is None
+
+    def test_payload_is_bound_to_client(self, signed_event):
+        """Test that a payload cannot be replayed for another client"""
+        signed_event['client_id'] = 'other-client'
+
+        assert verified_field(signed_event, 'extract', PRODUCT_FIELDS, key=KEY) is None
+
+    def test_wrong_key_stage_or_field_is_rejected(self, signed_event):
+        """Test that only the expected signer and payload are trusted"""
+        assert verified_field(signed_event, 'extract', PRODUCT_FIELDS, key=b'other-key') is None
+        assert verified_field(signed_event, 'transform', PRODUCT_FIELDS, key=KEY) is None
+        assert verified_field(signed_event, 'extract', ('canonical_products',), key=KEY) is None
+
+    def test_no_key_leaves_payload_unsigned(self):
+        """Test that provenance is a no-op when no key is configured"""
+        with patch('common.provenance.get_signing_key', return_value=None):
+            event = sign_payload({'client_id': 'c', 'products': []}, 'products', stage='extract')
+
+            assert PROVENANCE_FIELD not in event
+            assert verified_field(event, 'extract', PRODUCT_FIELDS) is None
+
+
+# ============================================================================
+# sanitize_event() Tests
+# ============================================================================
+
+class TestSanitizeEvent:
+    """Tests for sanitizing events with signed payloads"""
+
+    def test_trusted_payload_is_not_escaped_again(self, signed_event):
+        """Test that a verified payload passes through unchanged"""
+        products = copy.deepcopy(signed_event['products'])
+
+        event, trusted = sanitize_event(signed_event, 'extract', PRODUCT_FIELDS, key=KEY)
+
+        assert trusted is True
+        assert event['products'] == products
+        assert PROVENANCE_FIELD not in event
+
+    def test_control_fields_are_still_sanitized(self, signed_event):
+        """Test that unsigned fields are validated even when the payload is trusted"""
+        signed_event['sync_type'] = "full'; DROP TABLE sync--"
+
+        event, trusted = sanitize_event(signed_event, 'extract', PRODUCT_FIELDS, key=KEY)
+
+        assert trusted is True
+        assert 'sync_type' not in event
+
+    def test_unsigned_event_is_sanitized_in_full(self):
+        """Test the fallback for events without a valid marker"""
+        raw = {'client_id': 'test-client', 'products': [{'f_nombre': 'Zapato & Cia'}]}
+
+        event, trusted = sanitize_event(raw, 'extract', PRODUCT_FIELDS, key=KEY)
+
+        assert trusted is False
+        assert event['products'][0]['f_nombre'] == 'Zapato &amp; Cia'
+
+    def test_non_dict_event_is_rejected(self):
+        """Test that invalid events still raise"""
+        with pytest.raises(ValidationError):
+            sanitize_event(['not', 'a', 'dict'], 'extract', PRODUCT_FIELDS, key=KEY)
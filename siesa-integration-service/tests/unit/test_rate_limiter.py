@@ -1,6 +1,34 @@
 import pytest
 import time
-from src.lambdas.common.rate_limiter import RateLimiter, rate_limit
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_dynamodb
+from unittest.mock import patch
+from src.lambdas.common.rate_limiter import (
+    RateLimiter, rate_limit, DynamoDBBucketStore, InMemoryBucketStore, TokenBucket
+)
+
+TABLE_NAME = 'siesa-integration-sync-state-test'
+
+
+@pytest.fixture
+def dynamodb_resource(aws_credentials):
+    """Moto DynamoDB resource with the sync-state table created"""
+    with mock_dynamodb():
+        resource = boto3.resource('dynamodb', region_name='us-east-1')
+        resource.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'tenantId', 'KeyType': 'HASH'},
+                {'AttributeName': 'syncId', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'tenantId', 'AttributeType': 'S'},
+                {'AttributeName': 'syncId', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield resource
 
 
 def test_allows_calls_within_limit():
@@ -207,3 +235,100 @@ def test_with_exceptions():
     # Verify all 3 calls were counted
     assert len(limiter.call_times) == 3
     assert call_count['value'] == 3
+
+
+def test_token_bucket_try_acquire_does_not_block():
+    """Test that try_acquire refuses instead of sleeping once the bucket is empty"""
+    bucket = TokenBucket(calls=3, period=60, key=('tenant-a', 'kong'))
+    
+    start = time.time()
+    results = [bucket.try_acquire() for _ in range(4)]
+    
+    assert results == [True, True, True, False]
+    assert time.time() - start < 0.1
+
+
+def test_token_bucket_refills_over_time():
+    """Test that tokens come back at calls/period per second"""
+    bucket = TokenBucket(calls=2, period=0.2, key=('tenant-a', 'kong'))
+    bucket.try_acquire()
+    bucket.try_acquire()
+    
+    assert not bucket.try_acquire()
+    time.sleep(0.12)
+    assert bucket.try_acquire()
+
+
+def test_token_bucket_acquire_waits_and_times_out():
+    """Test that acquire sleeps until a token is available, or gives up"""
+    bucket = TokenBucket(calls=1, period=0.2, key=('tenant-a', 'kong'))
+    bucket.acquire()
+    
+    waited = bucket.acquire()
+    
+    assert 0.15 <= waited <= 0.3
+    with pytest.raises(TimeoutError):
+        bucket.acquire(timeout=0.05)
+
+
+@pytest.mark.parametrize('calls, period', [(0, 60), (-5, 60), (10, 0)])
+def test_token_bucket_rejects_non_positive_limits(calls, period):
+    """Test that a limit of 0 (e.g. rateLimitPerMinute: 0) fails clearly instead of dividing by zero"""
+    with pytest.raises(ValueError, match="Rate limit must allow calls"):
+        TokenBucket(calls, period, ('tenant-a', 'kong'))
+
+
+def test_buckets_are_per_tenant_and_api():
+    """Test that one store keeps a separate budget for each tenant and API"""
+    store = InMemoryBucketStore()
+    kong_a = TokenBucket(1, 60, ('tenant-a', 'kong'), store=store)
+    
+    assert kong_a.try_acquire()
+    assert not TokenBucket(1, 60, ('tenant-a', 'kong'), store=store).try_acquire()
+    assert TokenBucket(1, 60, ('tenant-b', 'kong'), store=store).try_acquire()
+    assert TokenBucket(1, 60, ('tenant-a', 'siesa'), store=store).try_acquire()
+
+
+def test_dynamodb_buckets_are_shared_across_containers(dynamodb_resource):
+    """Test that two containers draw from one budget through the table"""
+    first = TokenBucket(5, 60, ('tenant-a', 'kong'), store=DynamoDBBucketStore(TABLE_NAME, dynamodb_resource))
+    second = TokenBucket(5, 60, ('tenant-a', 'kong'), store=DynamoDBBucketStore(TABLE_NAME, dynamodb_resource))
+    
+    taken = [bucket.try_acquire() for bucket in (first, second) * 4]
+    
+    assert taken.count(True) == 5
+    item = dynamodb_resource.Table(TABLE_NAME).get_item(
+        Key={'tenantId': 'tenant-a', 'syncId': 'RATE#kong'}
+    )['Item']
+    assert float(item['tokens']) < 1
+
+
+def test_dynamodb_bucket_retries_lost_race(dynamodb_resource):
+    """Test that a write racing another container is retried on fresh state"""
+    store = DynamoDBBucketStore(TABLE_NAME, dynamodb_resource)
+    rival = DynamoDBBucketStore(TABLE_NAME, dynamodb_resource)
+    bucket = TokenBucket(2, 60, ('tenant-a', 'kong'), store=store)
+    original_put = store.table.put_item
+    raced = []
+    
+    def put_after_rival(**kwargs):
+        if not raced:
+            raced.append(True)
+            rival.take(('tenant-a', 'kong'), 1, 2, 2 / 60)
+        return original_put(**kwargs)
+    
+    with patch.object(store.table, 'put_item', side_effect=put_after_rival):
+        assert bucket.try_acquire()
+    
+    # The rival's token was not overwritten: the bucket is now empty
+    assert not bucket.try_acquire()
+
+
+def test_dynamodb_errors_fail_open(dynamodb_resource):
+    """Test that a DynamoDB outage does not block API calls"""
+    store = DynamoDBBucketStore(TABLE_NAME, dynamodb_resource)
+    error = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'slow down'}},
+                        'GetItem')
+    
+    with patch.object(store.table, 'get_item', side_effect=error):
+        assert TokenBucket(1, 60, ('tenant-a', 'kong'), store=store).try_acquire()
@@ -0,0 +1,130 @@
+"""
+Unit tests for S3 NDJSON part storage
+Tests common/s3_parts.py against a moto S3 bucket
+"""
+import pytest
+import json
+import types
+from unittest.mock import patch
+from moto import mock_s3
+import boto3
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.s3_parts import (
+    PartWriter,
+    PartChecksumError,
+    encode_records,
+    iter_part,
+    iter_manifest_records,
+    is_manifest,
+    new_run_prefix
+)
+
+
+BUCKET = 'test-pipeline-bucket'
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def s3_client(aws_credentials):
+    """Moto S3 client with the pipeline bucket created"""
+    with mock_s3():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def pages():
+    """Three pages of Siesa-like records"""
+    return [
+        [{'f_codigo': f'P{page}{i}', 'f_nombre': f'Producto ñ {page}-{i}'} for i in range(3)]
+        for page in range(3)
+    ]
+
+
+# ============================================================================
+# PartWriter / reader Tests
+# ============================================================================
+
+class TestPartWriter:
+    """Tests for writing parts and building manifests"""
+
+    def test_write_part_uploads_ndjson(self, s3_client, pages):
+        """Test that each part is one JSON document per line"""
+        writer = PartWriter(BUCKET, 'runs/client/run-1/extract', s3_client=s3_client)
+        part = writer.write_part(pages[0])
+
+        assert part['key'] == 'runs/client/run-1/extract/part-00001.ndjson'
+        assert part['count'] == 3
+
+        body = s3_client.get_object(Bucket=BUCKET, Key=part['key'])['Body'].read()
+        lines = body.decode('utf-8').splitlines()
+        assert [json.loads(line) for line in lines] == pages[0]
+
+    def test_manifest_counts_and_checksums(self, s3_client, pages):
+        """Test manifest totals and per-part checksums"""
+        writer = PartWriter(BUCKET, 'runs/client/run-1/extract/', s3_client=s3_client)
+        for page in pages:
+            writer.write_part(page)
+
+        manifest = writer.manifest()
+
+        assert manifest['bucket'] == BUCKET
+        assert manifest['prefix'] == 'runs/client/run-1/extract'
+        assert manifest['total_count'] == 9
+        assert len(manifest['parts']) == 3
+        assert all(len(part['sha256']) == 64 for part in manifest['parts'])
+        assert is_manifest(manifest)
+        # Manifest stays small no matter how many records the parts hold
+        assert len(json.dumps(manifest)) < 2048
+
+    def test_iter_manifest_records_round_trip(self, s3_client, pages):
+        """Test that records stream back in part order"""
+        writer = PartWriter(BUCKET, 'runs/client/run-1/extract', s3_client=s3_client)
+        for page in pages:
+            writer.write_part(page)
+
+        records = iter_manifest_records(writer.manifest(), s3_client=s3_client)
+
+        assert isinstance(records, types.GeneratorType)
+        assert list(records) == [record for page in pages for record in page]
+
+    def test_iter_part_detects_tampering(self, s3_client, pages):
+        """Test that a modified part fails checksum verification"""
+        writer = PartWriter(BUCKET, 'runs/client/run-1/extract', s3_client=s3_client)
+        part = writer.write_part(pages[0])
+
+        tampered = encode_records([{**pages[0][0], 'f_nombre': 'changed'}] + pages[0][1:])
+        s3_client.put_object(Bucket=BUCKET, Key=part['key'], Body=tampered)
+
+        with pytest.raises(PartChecksumError):
+            list(iter_part(BUCKET, part, s3_client=s3_client))
+
+    def test_iter_part_uses_shared_client_by_default(self, s3_client, pages):
+        """Test that the shared aws_utils client is used when none is given"""
+        writer = PartWriter(BUCKET, 'runs/client/run-1/extract', s3_client=s3_client)
+        part = writer.write_part(pages[1])
+
+        with patch('common.s3_parts.get_s3_client', return_value=s3_client):
+            assert list(iter_part(BUCKET, part)) == pages[1]
+
+
+def test_new_run_prefix_layout():
+    """Test run prefix layout shared by all stages"""
+    assert new_run_prefix('client-1', 'extract', run_id='r1') == 'runs/client-1/r1/extract'
+    assert new_run_prefix('client-1', 'transform').startswith('runs/client-1/')
+
+
+def test_is_manifest_rejects_other_values():
+    """Test manifest detection"""
+    assert not is_manifest(None)
+    assert not is_manifest({'parts': []})
+    assert not is_manifest({'bucket': 'b', 'parts': 'x'})
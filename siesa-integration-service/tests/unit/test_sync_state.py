@@ -0,0 +1,195 @@
+"""
+Unit tests for sync state persistence
+Tests common/sync_state.py against a moto DynamoDB table
+"""
+import pytest
+from unittest.mock import patch
+from moto import mock_dynamodb
+import boto3
+from botocore.exceptions import ClientError
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.sync_state import (
+    DeltaTracker,
+    ProductHashStore,
+    product_hash,
+    product_key,
+    STATE_KEY
+)
+
+
+TABLE_NAME = 'siesa-integration-sync-state-test'
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def dynamodb_resource(aws_credentials):
+    """Moto DynamoDB resource with the sync-state table created"""
+    with mock_dynamodb():
+        resource = boto3.resource('dynamodb', region_name='us-east-1')
+        resource.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'tenantId', 'KeyType': 'HASH'},
+                {'AttributeName': 'syncId', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'tenantId', 'AttributeType': 'S'},
+                {'AttributeName': 'syncId', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield resource
+
+
+@pytest.fixture
+def store(dynamodb_resource):
+    """Hash store for one tenant"""
+    return ProductHashStore(TABLE_NAME, 'tenant-a', dynamodb_resource=dynamodb_resource)
+
+
+@pytest.fixture
+def products():
+    """Canonical products"""
+    return [
+        {'external_id': f'P{i:03d}', 'name': f'Product {i}', 'ean': f'77000{i:03d}'}
+        for i in range(5)
+    ]
+
+
+# ============================================================================
+# Hashing Tests
+# ============================================================================
+
+def test_product_hash_ignores_key_order():
+    """Test that the hash only depends on field values"""
+    assert product_hash({'a': 1, 'b': 'x'}) == product_hash({'b': 'x', 'a': 1})
+    assert product_hash({'a': 1, 'b': 'x'}) != product_hash({'a': 2, 'b': 'x'})
+
+
+def test_product_key_falls_back_to_id():
+    """Test product identity resolution"""
+    assert product_key({'external_id': 'E1', 'id': 'I1'}) == 'E1'
+    assert product_key({'id': 42}) == '42'
+    assert product_key({'name': 'no id'}) is None
+
+
+# ============================================================================
+# ProductHashStore Tests
+# ============================================================================
+
+class TestProductHashStore:
+    """Tests for reading and writing hashes"""
+
+    def test_round_trip_more_than_one_batch(self, store):
+        """Test that lookups are chunked past the BatchGetItem limit"""
+        hashes = {f'P{i:04d}': f'hash-{i}' for i in range(250)}
+        store.put_hashes(hashes)
+
+        assert store.get_hashes(list(hashes) + ['MISSING']) == hashes
+
+    def test_hashes_are_isolated_per_tenant(self, store, dynamodb_resource):
+        """Test that tenants do not see each other's hashes"""
+        store.put_hashes({'P1': 'h1'})
+        other = ProductHashStore(TABLE_NAME, 'tenant-b', dynamodb_resource=dynamodb_resource)
+
+        assert other.get_hashes(['P1']) == {}
+
+    def test_high_water_mark(self, store, dynamodb_resource):
+        """Test high-water mark persistence"""
+        assert store.get_high_water_mark() is None
+
+        store.set_high_water_mark('2026-01-01T00:00:00+00:00', 'sync-1')
+
+        assert store.get_high_water_mark() == '2026-01-01T00:00:00+00:00'
+        item = dynamodb_resource.Table(TABLE_NAME).get_item(
+            Key={'tenantId': 'tenant-a', 'syncId': STATE_KEY}
+        )['Item']
+        assert item['lastSyncId'] == 'sync-1'
+
+
+# ============================================================================
+# DeltaTracker Tests
+# ============================================================================
+
+class TestDeltaTracker:
+    """Tests for filtering unchanged products"""
+
+    def test_first_sync_sends_everything(self, store, products):
+        """Test that products without a stored hash are sent"""
+        tracker = DeltaTracker(store)
+
+        assert list(tracker.filter(products)) == products
+        assert tracker.skipped == 0
+        assert tracker.commit([]) == 5
+
+    def test_second_sync_sends_only_changes(self, store, products):
+        """Test that only new or modified products pass the filter"""
+        first = DeltaTracker(store)
+        list(first.filter(products))
+        first.commit([])
+
+        changed = [dict(p) for p in products]
+        changed[1]['name'] = 'Renamed'
+        changed.append({'external_id': 'P999', 'name': 'New'})
+
+        second = DeltaTracker(store, chunk_size=2)
+        sent = list(second.filter(changed))
+
+        assert [p['external_id'] for p in sent] == ['P001', 'P999']
+        assert second.skipped == 4
+        assert second.total == 6
+
+    def test_failed_products_are_retried(self, store, products):
+        """Test that hashes are not stored for failed products"""
+        first = DeltaTracker(store)
+        list(first.filter(products))
+        assert first.commit(['P002'], high_water_mark='2026-01-01T00:00:00+00:00') == 4
+
+        # A failed load must not advance the high-water mark
+        assert store.get_high_water_mark() is None
+
+        second = DeltaTracker(store)
+        assert [p['external_id'] for p in second.filter(products)] == ['P002']
+
+    def test_full_sync_refreshes_hashes(self, store, products):
+        """Test that skip_unchanged=False sends everything but still records hashes"""
+        first = DeltaTracker(store)
+        list(first.filter(products))
+        first.commit([])
+
+        full = DeltaTracker(store, skip_unchanged=False)
+        assert len(list(full.filter(products))) == 5
+        assert full.commit([], high_water_mark='2026-02-01T00:00:00+00:00') == 5
+        assert store.get_high_water_mark() == '2026-02-01T00:00:00+00:00'
+
+    def test_previous_high_water_mark(self, store, products):
+        """Test that a sync reads the boundary the last clean sync committed"""
+        assert DeltaTracker(store).previous_high_water_mark() is None
+
+        first = DeltaTracker(store)
+        list(first.filter(products))
+        first.commit([], high_water_mark='2026-01-01T00:00:00+00:00')
+
+        assert DeltaTracker(store).previous_high_water_mark() == '2026-01-01T00:00:00+00:00'
+
+    def test_unreadable_high_water_mark_is_none(self, store):
+        """Test that a failed read of the mark does not fail the sync"""
+        error = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'GetItem')
+        with patch.object(store, 'get_high_water_mark', side_effect=error):
+            assert DeltaTracker(store).previous_high_water_mark() is None
+
+    def test_products_without_identity_always_pass(self, store):
+        """Test that untracked products are never skipped"""
+        tracker = DeltaTracker(store)
+        product = {'name': 'Anonymous'}
+
+        assert list(tracker.filter([product])) == [product]
+        assert tracker.pending == {}
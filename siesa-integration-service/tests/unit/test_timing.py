@@ -0,0 +1,177 @@
+"""
+Unit tests for hot-path timing spans
+Tests common/timing.py
+"""
+import pytest
+import time
+from unittest.mock import Mock, patch
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+import common.timing as timing
+from common.timing import report_timings, reset_timings, span, timed, timing_summary
+
+
+@pytest.fixture
+def enabled():
+    """Timing switched on, with no spans left over from other tests"""
+    reset_timings()
+    with patch.object(timing, 'TIMING_ENABLED', True):
+        yield
+    reset_timings()
+
+
+# ============================================================================
+# span() / timed() Tests
+# ============================================================================
+
+class TestSpans:
+    """Tests for recording spans"""
+    
+    def test_span_and_decorator_record_durations(self, enabled):
+        """Test that both APIs add samples to their stage"""
+        @timed('work')
+        def work():
+            time.sleep(0.01)
+            return 'done'
+        
+        assert work() == 'done'
+        with span('block'):
+            time.sleep(0.005)
+        
+        summary = timing_summary()
+        assert summary['work']['count'] == 1
+        assert summary['work']['sum_ms'] >= 10
+        assert summary['block']['count'] == 1
+    
+    def test_failed_calls_are_timed(self, enabled):
+        """Test that exceptions propagate and still record the span"""
+        @timed('failing')
+        def failing():
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError):
+            failing()
+        with pytest.raises(KeyError):
+            with span('failing'):
+                raise KeyError('k')
+        
+        assert timing_summary()['failing']['count'] == 2
+    
+    def test_expression_evaluations_are_timed(self, enabled):
+        """Test that compiled expressions record the safe_eval stage"""
+        from common.safe_eval import SafeEvalError, compile_expression
+        
+        assert compile_expression('value * 2').evaluate({'value': 2}) == 4
+        with pytest.raises(SafeEvalError):
+            compile_expression('value / 0').evaluate({'value': 2})
+        
+        assert timing_summary()['safe_eval']['count'] == 2
+    
+    def test_batch_transforms_are_timed_per_product(self, enabled):
+        """Test that the row engine's batch path records transform_product"""
+        from transformer.handler import FieldMapper
+        
+        mapper = FieldMapper({
+            'mappings': {'product': {
+                'id': {'siesa_field': 'f_codigo', 'type': 'string'},
+                'price': {'siesa_field': 'f_precio', 'type': 'float', 'transformation': 'double'}
+            }},
+            'transformations': {'double': {'type': 'calculation', 'logic': 'value * 2'}}
+        })
+        
+        products = mapper.transform_batch([{'f_codigo': str(i), 'f_precio': i} for i in range(3)])
+        
+        assert [product['price'] for product in products] == [0, 2, 4]
+        assert timing_summary()['transform_product']['count'] == 3
+    
+    def test_disabled_records_nothing(self):
+        """Test that spans are no-ops while timing is disabled"""
+        reset_timings()
+        
+        @timed('quiet')
+        def quiet():
+            return 1
+        
+        with patch.object(timing, 'TIMING_ENABLED', False):
+            quiet()
+            with span('quiet'):
+                pass
+        
+        assert timing_summary() == {}
+
+
+# ============================================================================
+# timing_summary() / report_timings() Tests
+# ============================================================================
+
+class TestSummary:
+    """Tests for per-stage histograms"""
+    
+    def test_percentiles(self, enabled):
+        """Test count, sum and nearest-rank percentiles"""
+        for ms in range(1, 101):
+            timing.record('stage', ms / 1000)
+        
+        stats = timing_summary()['stage']
+        
+        assert stats == {'count': 100, 'sum_ms': 5050.0, 'p50_ms': 50.0, 'p95_ms': 95.0, 'p99_ms': 99.0}
+    
+    def test_samples_are_bounded(self, enabled):
+        """Test that count and sum stay exact once the reservoir is full"""
+        with patch.object(timing, 'MAX_SAMPLES_PER_STAGE', 50):
+            for _ in range(500):
+                timing.record('stage', 0.001)
+            
+            assert len(timing._stages['stage'].samples) == 50
+        
+        assert timing_summary()['stage']['count'] == 500
+        assert timing_summary()['stage']['sum_ms'] == pytest.approx(500.0)
+    
+    def test_report_publishes_and_resets(self, enabled):
+        """Test that the handler report goes to the metrics publisher"""
+        metrics = Mock()
+        timing.record('kong.create_or_update_skus', 0.2)
+        
+        summary = report_timings(metrics, 'test-client')
+        
+        assert summary['kong.create_or_update_skus']['count'] == 1
+        metrics.put_stage_timing.assert_called_once_with(
+            'test-client', 'kong.create_or_update_skus', summary['kong.create_or_update_skus']
+        )
+        assert timing_summary() == {}
+    
+    def test_report_is_empty_when_disabled(self):
+        """Test that handlers add nothing to the response when disabled"""
+        with patch.object(timing, 'TIMING_ENABLED', False):
+            assert report_timings(Mock(), 'test-client') is None
+
+
+@pytest.mark.slow
+def test_disabled_overhead_is_negligible():
+    """Disabled decorator adds well under a microsecond per call"""
+    calls = 200_000
+    
+    def bare(x):
+        return x
+    
+    wrapped = timed('overhead')(bare)
+    
+    def seconds(func):
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            for i in range(calls):
+                func(i)
+            best = min(best, time.perf_counter() - start)
+        return best
+    
+    with patch.object(timing, 'TIMING_ENABLED', False):
+        overhead = (seconds(wrapped) - seconds(bare)) / calls
+    
+    print(f"\nDisabled timing overhead: {overhead * 1e9:.0f} ns/call")
+    # Generous margin: timings are noisy on shared runners
+    assert overhead < 1e-6
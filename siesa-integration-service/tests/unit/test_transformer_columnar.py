@@ -0,0 +1,235 @@
+"""
+Unit tests for the columnar transform engine
+Tests transformer/columnar.py against FieldMapper.transform_product
+"""
+
+import pytest
+import json
+import time
+from unittest.mock import patch
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from transformer.handler import FieldMapper, transform_products
+from common.warning_aggregator import reset_warnings, warning_summary
+from transformer.columnar import MISSING, transform_column, transform_columnar
+from tests.unit.test_field_mapper_benchmark import BENCHMARK_ROWS, MAPPINGS_PATH, synthetic_rows
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def mappings():
+    """Field mappings exercising every conversion and transformation type"""
+    return {
+        'mappings': {
+            'product': {
+                'id': {'siesa_field': 'f_codigo', 'type': 'string', 'required': True},
+                'name': {'siesa_field': 'f_nombre', 'type': 'string', 'required': True},
+                'ean': {'siesa_field': 'f_ean', 'type': 'string', 'validation': '^[0-9]{13}$'},
+                'category': {'siesa_field': 'f_categoria', 'type': 'string', 'transformation': 'category_code'},
+                'price': {'siesa_field': 'f_precio', 'type': 'float', 'transformation': 'price_with_tax'},
+                'stock_quantity': {'siesa_field': 'f_stock', 'type': 'integer', 'required': True},
+                'active': {'siesa_field': 'f_activo', 'type': 'boolean'},
+                'attributes': {'siesa_field': 'f_atributos', 'type': 'object'},
+                'tags': {'siesa_field': 'f_tags', 'type': 'array'}
+            }
+        },
+        'transformations': {
+            'price_with_tax': {'type': 'calculation', 'logic': 'value * 1.19'},
+            'category_code': {
+                'type': 'lookup',
+                'mappings': {'ROPA': 'APPAREL', 'CALZADO': 'FOOTWEAR'}
+            }
+        },
+        'defaults': {'stock_quantity': 0}
+    }
+
+
+@pytest.fixture
+def products():
+    """Siesa rows with repeated, missing, malformed and hostile values"""
+    rows = []
+    for i in range(300):
+        rows.append({
+            'f_codigo': f'P{i % 250}',
+            'f_nombre': ('Camisa', 'Zapato & Cia', '<script>alert(1)</script>', "x'; DROP TABLE t--", None)[i % 5],
+            'f_ean': ('7701234567890', '123', 7701234567890, None)[i % 4],
+            'f_categoria': ('ROPA', 'CALZADO', 'OTRO', None)[i % 4],
+            'f_precio': (100, '42,5', 0.0, -0.0, 'abc', None, 19.99, True)[i % 8],
+            'f_stock': (None, '12', 7, 'n/a', 3.9)[i % 5],
+            'f_activo': ('SI', 'no', 1, 0, None, 'true')[i % 6],
+            'f_atributos': ({'color': 'rojo'}, '{"talla": "M"}', 'not json', None)[i % 4],
+            'f_tags': (['a', 'b'], 'x', None)[i % 3],
+            'f120_custom_color': ('rojo', 'azul')[i % 2]
+        })
+        if i % 7 == 0:
+            rows[-1]['custom:season'] = 'verano'
+    return rows
+
+
+def assert_same_output(actual, expected):
+    """Same values, same types and same key order as the row engine"""
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got == want
+        assert list(got) == list(want)
+        assert json.dumps(got, sort_keys=False, default=str) == json.dumps(want, sort_keys=False, default=str)
+
+
+# ============================================================================
+# transform_columnar() Tests
+# ============================================================================
+
+class TestTransformColumnar:
+    """Parity between the columnar engine and FieldMapper.transform_product"""
+
+    def test_matches_row_engine(self, mappings, products):
+        """Test identical output on mixed, missing and malformed values"""
+        mapper = FieldMapper(mappings)
+
+        expected = [mapper.transform_product(product) for product in products]
+        actual = transform_columnar(mapper, products)
+
+        assert_same_output(actual, expected)
+
+    def test_matches_row_engine_on_kong_mappings(self):
+        """Test identical output with the shipped Kong field mappings"""
+        with open(MAPPINGS_PATH) as f:
+            mapper = FieldMapper(json.load(f))
+        rows = synthetic_rows(2000)
+
+        assert_same_output(transform_columnar(mapper, rows), [mapper.transform_product(row) for row in rows])
+
+    def test_matches_row_engine_on_trusted_input(self, mappings, products):
+        """Test parity when strings were already sanitized by the extractor"""
+        mapper = FieldMapper(mappings, trusted_input=True)
+        rows = [{**product, 'f_nombre': 'Zapato &amp; Cia'} for product in products]
+
+        assert_same_output(transform_columnar(mapper, rows), [mapper.transform_product(row) for row in rows])
+        assert transform_columnar(mapper, rows)[0]['name'] == 'Zapato &amp; Cia'
+
+    def test_hostile_strings_are_dropped(self, mappings, products):
+        """Test that SQL injection and XSS values never reach the output"""
+        mapper = FieldMapper(mappings)
+
+        names = {product.get('name') for product in transform_columnar(mapper, products)}
+
+        assert names == {'Camisa', 'Zapato &amp; Cia', None}
+
+    def test_matches_row_engine_on_absent_fields(self, mappings):
+        """Test fields missing from some products or from the whole extract"""
+        mapper = FieldMapper(mappings)
+        rows = [{'f_codigo': f'P{i}', 'f_stock': i if i % 2 else None} for i in range(6)]
+        rows[3]['f_nombre'] = 'Camisa'
+        rows[4] = {'f120_custom_a': 1, **rows[4], 'custom:b': 2}
+        rows[5] = {'custom:b': 2, **rows[5], 'f120_custom_a': 1}
+
+        expected = [mapper.transform_product(row) for row in rows]
+        row_warnings = warning_summary()
+        reset_warnings()
+
+        assert_same_output(transform_columnar(mapper, rows), expected)
+        assert sorted(warning_summary(), key=str) == sorted(row_warnings, key=str)
+
+    def test_signed_zero_is_not_shared(self, mappings):
+        """Test that 0.0 and -0.0 keep their own sign after deduplication"""
+        mapper = FieldMapper(mappings)
+        rows = [{'f_codigo': 'P1', 'f_precio': 0.0}, {'f_codigo': 'P2', 'f_precio': -0.0}]
+
+        prices = [product['price'] for product in transform_columnar(mapper, rows)]
+
+        assert str(prices) == str([mapper.transform_product(row)['price'] for row in rows])
+
+    def test_mutable_results_are_not_shared(self, mappings):
+        """Test that object and array values are converted per product"""
+        mapper = FieldMapper(mappings)
+        rows = [{'f_codigo': 'P1', 'f_tags': '["x"]'}, {'f_codigo': 'P2', 'f_tags': '["x"]'}]
+
+        first, second = transform_columnar(mapper, rows)
+        first['tags'].append('y')
+
+        assert second['tags'] == ['x']
+
+    def test_warnings_are_counted_per_row(self, mappings):
+        """Test that a bad value shared by many rows counts a warning for each of them"""
+        mapper = FieldMapper(mappings)
+        rows = [{'f_codigo': f'P{i}', 'f_ean': '123'} for i in range(3)]
+
+        transform_columnar(mapper, rows)
+
+        counts = {(entry['field'], entry['reason']): entry['count'] for entry in warning_summary()}
+        assert counts[('ean', 'validation')] == 3
+        assert counts[('name', 'missing_required')] == 3
+
+    def test_warning_counts_match_row_engine(self, mappings, products):
+        """Test that both engines count the same warnings"""
+        mapper = FieldMapper(mappings)
+
+        for product in products:
+            mapper.transform_product(product)
+        row = warning_summary()
+        reset_warnings()
+        transform_columnar(mapper, products)
+
+        assert sorted(warning_summary(), key=str) == sorted(row, key=str)
+
+    def test_transform_column_marks_dropped_fields(self, mappings):
+        """Test that fields the row engine would omit come back as MISSING"""
+        mapper = FieldMapper(mappings)
+        plan = next(plan for plan in mapper.field_plans if plan.canonical_field == 'attributes')
+
+        column = transform_column(plan, [None, 'not json', '{"talla": "M"}'])
+
+        assert column[0] is MISSING
+        assert column[1] is MISSING
+        assert column[2] == {'talla': 'M'}
+
+    def test_transform_products_uses_columnar_engine(self, mappings, products):
+        """Test that TRANSFORM_ENGINE=columnar routes batches through the engine"""
+        mapper = FieldMapper(mappings)
+
+        with patch('transformer.handler.TRANSFORM_ENGINE', 'columnar'), \
+                patch('transformer.handler.transform_columnar', wraps=transform_columnar) as engine:
+            columnar, columnar_errors = transform_products(mapper, products)
+        row, row_errors = transform_products(mapper, products)
+
+        engine.assert_called_once()
+        assert columnar == row
+        assert columnar_errors == row_errors
+
+
+@pytest.mark.slow
+def test_columnar_engine_benchmark():
+    """
+    Columnar engine produces the same output at least 1.5x faster
+
+    Most synthetic values are distinct, so sanitizing them (once per
+    distinct string, in blocks) is most of what remains of the columnar time.
+    """
+    with open(MAPPINGS_PATH) as f:
+        mapper = FieldMapper(json.load(f))
+    rows = synthetic_rows(BENCHMARK_ROWS)
+
+    def rows_per_second(transform, runs=3):
+        best = 0.0
+        for _ in range(runs):
+            start = time.perf_counter()
+            output = transform()
+            best = max(best, len(rows) / (time.perf_counter() - start))
+        return best, output
+
+    row_rate, row_output = rows_per_second(lambda: [mapper.transform_product(row) for row in rows])
+    columnar_rate, columnar_output = rows_per_second(lambda: transform_columnar(mapper, rows))
+
+    assert columnar_output == row_output
+    print(f"\nTransform engines on {BENCHMARK_ROWS} rows: row {row_rate:,.0f} rows/s, "
+          f"columnar {columnar_rate:,.0f} rows/s ({columnar_rate / row_rate:.2f}x)")
+
+    # About 2-2.5x here; the margin allows for noisy shared runners
+    assert columnar_rate > row_rate * 1.5
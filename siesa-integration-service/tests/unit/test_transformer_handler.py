@@ -14,9 +14,17 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
 
+from moto import mock_s3
+import boto3
+from common.provenance import PROVENANCE_FIELD, sign_payload, verified_field
+from common.s3_parts import PartWriter, iter_manifest_records
 from transformer.handler import (
     FieldMapper,
+    TYPE_CONVERTERS,
+    compile_field_plans,
+    transform_products,
     load_field_mappings,
+    get_field_mapper,
     validate_canonical_product,
     lambda_handler
 )
@@ -259,6 +267,91 @@ class TestFieldMapper:
         assert result_active == 'active'
         assert result_inactive == 'inactive'
         assert result_unknown == 'X'  # Returns original if not in table
+    
+    # ========================================================================
+    # compile_field_plans() Tests
+    # ========================================================================
+    
+    def test_compile_field_plans_resolves_rules(self, sample_mappings):
+        """Test that converters, regexes and transformations are resolved once"""
+        sample_mappings['mappings']['product']['price']['transformation'] = 'price_with_tax'
+        sample_mappings['mappings']['product']['name']['validation'] = '^[A-Z]'
+        sample_mappings['mappings']['product']['sku']['transformation'] = 'not_defined'
+        
+        plans = {plan.canonical_field: plan for plan in compile_field_plans(sample_mappings)}
+        
+        assert plans['price'].convert is TYPE_CONVERTERS['float']
+        assert plans['price'].transform(100.0) == 119.0
+        assert plans['name'].pattern.pattern == '^[A-Z]'
+        assert plans['sku'].transform is None
+        assert plans['stock_quantity'].has_default and plans['stock_quantity'].default == 0
+        assert not plans['id'].has_default
+    
+    def test_compile_field_plans_is_immutable(self, sample_mappings):
+        """Test that compiled plans cannot be modified"""
+        plans = compile_field_plans(sample_mappings)
+        
+        assert isinstance(plans, tuple)
+        with pytest.raises(AttributeError):
+            plans[0].required = False
+    
+    def test_transform_product_applies_compiled_transformation(self, sample_mappings):
+        """Test that a field with a transformation goes through the compiled plan"""
+        sample_mappings['mappings']['product']['status'] = {
+            'siesa_field': 'f_estado',
+            'type': 'string',
+            'transformation': 'status_lookup'
+        }
+        mapper = FieldMapper(sample_mappings)
+        
+        result = mapper.transform_product({'f_codigo': 'P1', 'f_nombre': 'N', 'f_estado': 'I'})
+        
+        assert result['status'] == 'inactive'
+    
+    def test_transform_batch_matches_transform_product(self, sample_mappings):
+        """Test that column-evaluated calculations give the per-product result"""
+        sample_mappings['mappings']['product']['price']['transformation'] = 'price_with_tax'
+        mapper = FieldMapper(sample_mappings)
+        products = [
+            {'f_codigo': f'P{i}', 'f_nombre': f'Product {i}', 'f_precio': price}
+            for i, price in enumerate([100.0, '42,5', 0, None, 'abc', 19.99] * 20)
+        ]
+        
+        batch = mapper.transform_batch(products)
+        
+        assert batch == [mapper.transform_product(product) for product in products]
+        assert batch[0]['price'] == 100.0 * 1.19
+        assert list(batch[0]) == list(mapper.transform_product(products[0]))
+    
+    def test_transform_products_falls_back_per_product(self, sample_mappings):
+        """Test that a failing batch is retried one product at a time"""
+        mapper = FieldMapper(sample_mappings)
+        products = [{'f_codigo': 'P1', 'f_nombre': 'N1'}, {'f_codigo': 'P2', 'f_nombre': 'N2'}]
+        
+        with patch.object(FieldMapper, 'transform_batch', side_effect=RuntimeError('boom')):
+            canonical, errors = transform_products(mapper, products)
+        
+        assert [p['id'] for p in canonical] == ['P1', 'P2']
+        assert errors == []
+    
+    def test_failed_batch_warnings_are_counted_once(self, sample_mappings):
+        """Test that warnings recorded before a batch fails are not counted again by the fallback"""
+        from common.warning_aggregator import warning_summary
+        mapper = FieldMapper(sample_mappings)
+        products = [{'f_precio': 100.0}, {'f_precio': 200.0}]
+        transform_batch = FieldMapper.transform_batch
+        
+        def fail_after_mapping(self, siesa_products):
+            transform_batch(self, siesa_products)
+            raise RuntimeError('boom')
+        
+        with patch.object(FieldMapper, 'transform_batch', fail_after_mapping):
+            canonical, errors = transform_products(mapper, products)
+        
+        summary = warning_summary()
+        assert canonical == []
+        assert {'field': 'id', 'reason': 'missing_required', 'count': 2} in summary
+        assert {'field': 'product', 'reason': 'validation', 'count': 2} in summary
 
 
 # ============================================================================
@@ -312,6 +405,92 @@ class TestLoadFieldMappings:
             load_field_mappings('test-bucket', 'invalid.json')
 
 
+@pytest.fixture
+def mappings_bucket(sample_mappings, aws_credentials):
+    """
+    Moto S3 bucket holding a mappings file, patched in as the transformer's client
+    
+    The cache TTL is 0, so every load revalidates with S3.
+    """
+    with mock_s3():
+        s3_client = boto3.client('s3', region_name='us-east-1')
+        s3_client.create_bucket(Bucket='mappings')
+        s3_client.put_object(Bucket='mappings', Key='kong.json', Body=json.dumps(sample_mappings))
+        get_object = Mock(wraps=s3_client.get_object)
+        with patch('transformer.handler.s3') as mock_s3_client, \
+                patch('transformer.handler.MAPPINGS_CACHE_TTL_SECONDS', 0):
+            mock_s3_client.get_object = get_object
+            yield s3_client, get_object
+
+
+class TestFieldMappingsCache:
+    """Tests for cached field mappings"""
+    
+    def test_served_from_cache_within_ttl(self, mappings_bucket, sample_mappings):
+        """Test warm invocations skip S3 while the TTL holds"""
+        _, get_object = mappings_bucket
+        
+        with patch('transformer.handler.MAPPINGS_CACHE_TTL_SECONDS', 300):
+            first = load_field_mappings('mappings', 'kong.json')
+            second = load_field_mappings('mappings', 'kong.json')
+        
+        assert first == sample_mappings
+        assert second is first
+        assert get_object.call_count == 1
+    
+    def test_revalidates_with_etag(self, mappings_bucket):
+        """Test an unchanged object is not downloaded or parsed again"""
+        _, get_object = mappings_bucket
+        
+        first = load_field_mappings('mappings', 'kong.json')
+        with patch('transformer.handler.json.loads') as mock_loads:
+            second = load_field_mappings('mappings', 'kong.json')
+        
+        assert second is first
+        mock_loads.assert_not_called()
+        etag = get_object.call_args_list[1].kwargs['IfNoneMatch']
+        assert etag.startswith('"')
+    
+    def test_reloads_changed_object(self, mappings_bucket, sample_mappings):
+        """Test a new ETag replaces the cached mappings"""
+        s3_client, _ = mappings_bucket
+        
+        load_field_mappings('mappings', 'kong.json')
+        changed = {**sample_mappings, 'defaults': {'status': 'inactive'}}
+        s3_client.put_object(Bucket='mappings', Key='kong.json', Body=json.dumps(changed))
+        
+        assert load_field_mappings('mappings', 'kong.json') == changed
+    
+    def test_mapper_reused_while_unchanged(self, mappings_bucket, sample_mappings):
+        """Test the compiled mapper is rebuilt only when the mappings change"""
+        s3_client, _ = mappings_bucket
+        
+        mapper = get_field_mapper('mappings', 'kong.json')
+        assert get_field_mapper('mappings', 'kong.json') is mapper
+        assert get_field_mapper('mappings', 'kong.json', trusted_input=True) is not mapper
+        
+        # Same content keeps its ETag and the mapper
+        s3_client.put_object(Bucket='mappings', Key='kong.json', Body=json.dumps(sample_mappings))
+        assert get_field_mapper('mappings', 'kong.json') is mapper
+        
+        changed = {**sample_mappings, 'defaults': {'status': 'inactive'}}
+        s3_client.put_object(Bucket='mappings', Key='kong.json', Body=json.dumps(changed))
+        assert get_field_mapper('mappings', 'kong.json') is not mapper
+    
+    def test_local_file_takes_precedence(self, mappings_bucket, sample_mappings, tmp_path):
+        """Test bundled mapping files are read instead of S3"""
+        _, get_object = mappings_bucket
+        (tmp_path / 'kong.json').write_text(json.dumps(sample_mappings))
+        
+        with patch('transformer.handler.FIELD_MAPPINGS_DIR', str(tmp_path)):
+            first = load_field_mappings('mappings', 'kong.json')
+            second = load_field_mappings('mappings', 'kong.json')
+        
+        assert first == sample_mappings
+        assert second is first
+        get_object.assert_not_called()
+
+
 # ============================================================================
 # validate_canonical_product() Tests
 # ============================================================================
@@ -366,6 +545,38 @@ class TestValidateCanonicalProduct:
 class TestLambdaHandler:
     """Tests for lambda_handler function"""
     
+    @patch('transformer.handler.load_field_mappings')
+    def test_lambda_handler_products_manifest(self, mock_load_mappings, sample_mappings, sample_siesa_product,
+                                              aws_credentials):
+        """Test streaming transformation from NDJSON parts to NDJSON parts"""
+        mock_load_mappings.return_value = sample_mappings
+        
+        with mock_s3():
+            s3_client = boto3.client('s3', region_name='us-east-1')
+            s3_client.create_bucket(Bucket='pipeline')
+            
+            writer = PartWriter('pipeline', 'runs/test-client/r1/extract', s3_client=s3_client)
+            writer.write_part([sample_siesa_product, {'f_nombre': 'missing code'}])
+            writer.write_part([{**sample_siesa_product, 'f_codigo': 'PROD002'}])
+            
+            event = {
+                'client_id': 'test-client',
+                'product_type': 'kong',
+                'products_manifest': writer.manifest(),
+                'extraction_timestamp': '2024-01-01T00:00:00Z'
+            }
+            
+            with patch('common.s3_parts.get_s3_client', return_value=s3_client):
+                result = lambda_handler(event, None)
+                canonical = list(iter_manifest_records(result['canonical_manifest']))
+        
+        assert 'canonical_products' not in result
+        assert result['count'] == 2
+        assert result['canonical_manifest']['prefix'] == 'runs/test-client/r1/transform'
+        assert [p['id'] for p in canonical] == ['PROD001', 'PROD002']
+        # Error indexes are global across parts
+        assert result['validation_errors'][0].startswith('Product 1:')
+    
     @patch('transformer.handler.load_field_mappings')
     def test_lambda_handler_success(self, mock_load_mappings, sample_mappings, sample_siesa_product):
         """Test successful lambda execution"""
@@ -388,6 +599,31 @@ class TestLambdaHandler:
         assert result['canonical_products'][0]['id'] == 'PROD001'
         assert 'transformation_timestamp' in result
     
+    @patch('common.provenance.get_signing_key', return_value=b'test-key')
+    @patch('transformer.handler.load_field_mappings')
+    def test_lambda_handler_signed_products(self, mock_load_mappings, mock_key, sample_mappings, sample_siesa_product):
+        """Test that extractor-signed products are not escaped again and the output is signed"""
+        mock_load_mappings.return_value = sample_mappings
+        
+        # As sanitized by the extractor
+        product = {**sample_siesa_product, 'f_nombre': 'Zapato &amp; Cia'}
+        event = sign_payload({
+            'client_id': 'test-client',
+            'product_type': 'kong',
+            'products': [product],
+            'sync_type': 'initial'
+        }, 'products', stage='extract')
+        unsigned = {name: value for name, value in event.items() if name != PROVENANCE_FIELD}
+        
+        result = lambda_handler(event, None)
+        
+        # Escaped once, by the extractor
+        assert result['canonical_products'][0]['name'] == 'Zapato &amp; Cia'
+        assert verified_field(result, 'transform', ('canonical_products',)) == 'canonical_products'
+        
+        # Sanitizing again flags the ';' of the entity and drops the product
+        assert lambda_handler(unsigned, None)['count'] == 0
+    
     @patch('transformer.handler.load_field_mappings')
     def test_lambda_handler_empty_products(self, mock_load_mappings, sample_mappings):
         """Test lambda with empty products list"""
@@ -426,6 +662,7 @@ class TestLambdaHandler:
         
         assert result['count'] == 0  # Invalid product skipped
         assert len(result['validation_errors']) > 0
+        assert {'field': 'id', 'reason': 'missing_required', 'count': 1} in result['validation_warnings']
     
     @patch('transformer.handler.load_field_mappings')
     def test_lambda_handler_s3_error(self, mock_load_mappings):
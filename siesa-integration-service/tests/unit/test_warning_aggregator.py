@@ -0,0 +1,141 @@
+"""
+Unit tests for warning aggregation
+Tests common/warning_aggregator.py
+"""
+
+import pytest
+from unittest.mock import Mock
+
+# Import the module to test
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/lambdas'))
+
+from common.logging_utils import get_structured_logger
+from common.warning_aggregator import (
+    WarningAggregator, record_warning, report_warnings, warning_summary
+)
+
+
+class Exploding:
+    """Argument that fails the test if a message is formatted with it"""
+
+    def __str__(self):
+        raise AssertionError("formatted a suppressed warning")
+
+
+@pytest.fixture
+def log():
+    return Mock()
+
+
+def warning_fields(log):
+    return [call.kwargs for call in log.warning.call_args_list]
+
+
+# ============================================================================
+# WarningAggregator Tests
+# ============================================================================
+
+class TestWarningAggregator:
+    """Tests for WarningAggregator"""
+
+    def test_counts_by_field_and_reason(self, log):
+        aggregator = WarningAggregator(log, max_examples=1, summary_interval=0)
+
+        for _ in range(3):
+            aggregator.add('ean', 'validation', "Validation failed for %s", 'ean')
+        aggregator.add('ean', 'type_conversion', "Type conversion failed for %s", 'ean')
+        aggregator.add('name', 'missing_required', "Missing required field", count=5)
+
+        assert aggregator.summary() == [
+            {'field': 'name', 'reason': 'missing_required', 'count': 5},
+            {'field': 'ean', 'reason': 'validation', 'count': 3},
+            {'field': 'ean', 'reason': 'type_conversion', 'count': 1}
+        ]
+        assert aggregator.total == 9
+
+    def test_logs_only_first_examples(self, log):
+        aggregator = WarningAggregator(log, max_examples=2, summary_interval=0)
+
+        for i in range(100):
+            aggregator.add('ean', 'validation', "Validation failed for %s: %s", 'ean', str(i))
+
+        assert log.warning.call_count == 2
+        assert [call.args[2] for call in log.warning.call_args_list] == ['0', '1']
+        assert [fields['occurrence'] for fields in warning_fields(log)] == [1, 2]
+
+    def test_suppressed_messages_are_not_formatted(self):
+        aggregator = WarningAggregator(get_structured_logger('test.warning_aggregator'), max_examples=0, summary_interval=0)
+
+        aggregator.add('ean', 'validation', "Validation failed: %s", Exploding())
+
+        assert aggregator.total == 1
+
+    def test_logs_periodic_summaries(self, log):
+        aggregator = WarningAggregator(log, max_examples=1, summary_interval=10)
+
+        for _ in range(25):
+            aggregator.add('ean', 'validation', "Validation failed")
+
+        summaries = [fields for fields in warning_fields(log) if 'count' in fields]
+        assert [fields['count'] for fields in summaries] == [10, 20]
+        assert summaries[0]['logged'] == 1
+
+    def test_batched_counts_cross_summary_interval(self, log):
+        aggregator = WarningAggregator(log, max_examples=1, summary_interval=10)
+
+        aggregator.add('ean', 'validation', "Validation failed", count=25)
+
+        assert log.warning.call_count == 2
+        assert warning_fields(log)[1]['count'] == 25
+
+    def test_reset_drops_counts(self, log):
+        aggregator = WarningAggregator(log, max_examples=1)
+        aggregator.add('ean', 'validation', "Validation failed")
+
+        aggregator.reset()
+        aggregator.add('ean', 'validation', "Validation failed")
+
+        assert aggregator.total == 1
+        assert log.warning.call_count == 2
+
+    def test_restore_drops_counts_since_snapshot(self, log):
+        aggregator = WarningAggregator(log, max_examples=1)
+        aggregator.add('ean', 'validation', "Validation failed")
+        snapshot = aggregator.snapshot()
+
+        aggregator.add('ean', 'validation', "Validation failed", count=3)
+        aggregator.add('id', 'missing_required', "Missing required field")
+        aggregator.restore(snapshot)
+
+        assert aggregator.summary() == [{'field': 'ean', 'reason': 'validation', 'count': 1}]
+
+
+# ============================================================================
+# Invocation-level Tests
+# ============================================================================
+
+class TestReportWarnings:
+    """Tests for report_warnings"""
+
+    def test_report_publishes_and_resets(self):
+        record_warning('ean', 'validation', "Validation failed", count=3)
+        record_warning('id', 'missing_required', "Missing required field")
+        metrics = Mock()
+
+        summary = report_warnings(metrics, 'test-client')
+
+        assert summary == [
+            {'field': 'ean', 'reason': 'validation', 'count': 3},
+            {'field': 'id', 'reason': 'missing_required', 'count': 1}
+        ]
+        metrics.put_validation_warnings.assert_any_call('test-client', 'ean', 'validation', 3)
+        metrics.put_validation_warnings.assert_any_call('test-client', 'id', 'missing_required', 1)
+        assert warning_summary() == []
+
+    def test_report_is_empty_without_warnings(self):
+        metrics = Mock()
+
+        assert report_warnings(metrics, 'test-client') is None
+        metrics.put_validation_warnings.assert_not_called()